@@ -78,7 +78,75 @@ def _getWindowingArray(window_size, fade_size):
     return window
 
 
+class OverlapAdd:
+    """
+    在模型所在设备上做重叠相加
+
+    每个 batch 的输出按位置用 index_add_ 一次性累加，窗函数按块单独生成，不修改共享的窗；
+    直到 finish 时才把结果搬回 host
+    """
+
+    def __init__(self, shape, device, window=None, fade_size=0):
+        self.result = torch.zeros(shape, dtype=torch.float32, device=device)
+        # 所有声部/声道的权重都一样，只需要记时间轴
+        self.counter = torch.zeros(shape[-1], dtype=torch.float32, device=device)
+        self.window = window.to(device) if window is not None else None
+        self.fade_size = fade_size
+
+    def chunk_weights(self, starts, lengths, chunk_size, first, last):
+        positions = torch.arange(chunk_size, device=self.result.device)
+        lengths = torch.as_tensor(lengths, device=self.result.device)
+        weights = (positions[None, :] < lengths[:, None]).float()
+        if self.window is not None:
+            windows = self.window[None, :].repeat(len(starts), 1)
+            if self.fade_size > 0:
+                # 第一块不淡入，最后一块不淡出
+                first = torch.as_tensor(first, device=self.result.device)
+                last = torch.as_tensor(last, device=self.result.device)
+                windows[:, : self.fade_size][first] = 1
+                windows[:, -self.fade_size :][last] = 1
+            weights = weights * windows
+        return weights
+
+    def add(self, x, starts, lengths, first=None, last=None):
+        batch, chunk_size = x.shape[0], x.shape[-1]
+        if first is None:
+            first = [False] * batch
+        if last is None:
+            last = [False] * batch
+        weights = self.chunk_weights(starts, lengths, chunk_size, first, last)
+
+        positions = torch.arange(chunk_size, device=self.result.device)
+        starts = torch.as_tensor(starts, device=self.result.device)
+        index = starts[:, None] + positions[None, :]
+        # 超出长度的位置权重是 0，索引夹到合法范围即可
+        index = index.clamp(max=self.result.shape[-1] - 1).flatten()
+
+        x = x.float().reshape(batch, *self.result.shape[:-1], chunk_size)
+        x = x * weights.view(batch, *([1] * (x.dim() - 2)), chunk_size)
+        x = x.movedim(0, -2).reshape(*self.result.shape[:-1], batch * chunk_size)
+        self.result.index_add_(-1, index, x)
+        self.counter.index_add_(0, index, weights.flatten())
+
+    def finish(self):
+        estimated_sources = (self.result / self.counter).cpu().numpy()
+        np.nan_to_num(estimated_sources, copy=False, nan=0.0)
+        return estimated_sources
+
+
 def demix_track(config, model, mix, device, progress=gr.Progress(), progress_desc=""):
+    return demix_tracks(config, model, [mix], device, progress, progress_desc)[0]
+
+
+def demix_tracks(
+    config, model, mixes, device, progress=gr.Progress(), progress_desc=""
+):
+    """
+    一次分离多首歌，不同歌的切块会被装进同一个 batch 送进模型
+
+    每首歌有自己的 OverlapAdd，切块算完后按所属歌曲分回去；一首歌的最后一块处理完就立即结束
+    并把结果搬回 host，所以同时驻留在设备上的累加器最多 batch_size 个
+    """
     C = config.audio.chunk_size
     N = config.inference.num_overlap
     fade_size = C // 10
@@ -86,89 +154,97 @@ def demix_track(config, model, mix, device, progress=gr.Progress(), progress_des
     border = C - step
     batch_size = config.inference.batch_size
 
-    length_init = mix.shape[-1]
-
-    # Do pad from the beginning and end to account floating window results better
-    if length_init > 2 * border and (border > 0):
-        mix = nn.functional.pad(mix, (border, border), mode="reflect")
+    if config.training.target_instrument is not None:
+        instruments = [config.training.target_instrument]
+    else:
+        instruments = config.training.instruments
 
     # windowingArray crossfades at segment boundaries to mitigate clicking artifacts
     windowingArray = _getWindowingArray(C, fade_size)
 
+    results = [None] * len(mixes)
+    overlap_adds = {}
+    padded = [
+        length_init > 2 * border and (border > 0)
+        for length_init in (mix.shape[-1] for mix in mixes)
+    ]
+    total = sum(
+        mix.shape[-1] + (2 * border if pad else 0) for mix, pad in zip(mixes, padded)
+    )
+
+    def run_batch(batch):
+        x = model(torch.stack([item[1] for item in batch], dim=0))
+        for song in dict.fromkeys(item[0] for item in batch):
+            idx = [j for j, item in enumerate(batch) if item[0] == song]
+            overlap_adds[song].add(
+                x[idx],
+                [batch[j][2] for j in idx],
+                [batch[j][3] for j in idx],
+                first=[batch[j][4] for j in idx],
+                last=[batch[j][5] for j in idx],
+            )
+            if batch[idx[-1]][5]:
+                finish(song)
+
+    def finish(song):
+        estimated_sources = overlap_adds.pop(song).finish()
+        if padded[song]:
+            # Remove pad
+            estimated_sources = estimated_sources[..., border:-border]
+        results[song] = {k: v for k, v in zip(instruments, estimated_sources)}
+
     with torch.cuda.amp.autocast(enabled=config.training.use_amp):
         with torch.inference_mode():
-            if config.training.target_instrument is not None:
-                req_shape = (1,) + tuple(mix.shape)
-            else:
-                req_shape = (len(config.training.instruments),) + tuple(mix.shape)
-
-            result = torch.zeros(req_shape, dtype=torch.float32)
-            counter = torch.zeros(req_shape, dtype=torch.float32)
-            i = 0
-            batch_data = []
-            batch_locations = []
             progress_bar = progress.tqdm(
-                list(range(mix.shape[1])), total=mix.shape[1], desc=progress_desc
+                list(range(total)), total=total, desc=progress_desc
             )
+            batch = []
+            for song, mix in enumerate(mixes):
+                # Do pad from the beginning and end to account floating window results better
+                if padded[song]:
+                    mix = nn.functional.pad(mix, (border, border), mode="reflect")
+                mix = mix.to(device)
+                req_shape = (len(instruments),) + tuple(mix.shape)
+                overlap_adds[song] = OverlapAdd(
+                    req_shape, device, windowingArray, fade_size
+                )
+
+                i = 0
+                while i < mix.shape[1]:
+                    part = mix[:, i : i + C]
+                    length = part.shape[-1]
+                    if length < C:
+                        if length > C // 2 + 1:
+                            part = nn.functional.pad(
+                                input=part, pad=(0, C - length), mode="reflect"
+                            )
+                        else:
+                            part = nn.functional.pad(
+                                input=part,
+                                pad=(0, C - length, 0, 0),
+                                mode="constant",
+                                value=0,
+                            )
+                    batch.append(
+                        (song, part, i, length, i == 0, i + step >= mix.shape[1])
+                    )
+                    i += step
 
-            while i < mix.shape[1]:
-                # print(i, i + C, mix.shape[1])
-                part = mix[:, i : i + C].to(device)
-                length = part.shape[-1]
-                if length < C:
-                    if length > C // 2 + 1:
-                        part = nn.functional.pad(
-                            input=part, pad=(0, C - length), mode="reflect"
-                        )
-                    else:
-                        part = nn.functional.pad(
-                            input=part,
-                            pad=(0, C - length, 0, 0),
-                            mode="constant",
-                            value=0,
-                        )
-                batch_data.append(part)
-                batch_locations.append((i, length))
-                i += step
-
-                if len(batch_data) >= batch_size or (i >= mix.shape[1]):
-                    arr = torch.stack(batch_data, dim=0)
-                    x = model(arr)
-
-                    window = windowingArray
-                    if i - step == 0:  # First audio chunk, no fadein
-                        window[:fade_size] = 1
-                    elif i >= mix.shape[1]:  # Last audio chunk, no fadeout
-                        window[-fade_size:] = 1
-
-                    for j in range(len(batch_locations)):
-                        start, l = batch_locations[j]
-                        result[..., start : start + l] += (
-                            x[j][..., :l].cpu() * window[..., :l]
-                        )
-                        counter[..., start : start + l] += window[..., :l]
+                    if len(batch) >= batch_size:
+                        run_batch(batch)
+                        batch = []
 
-                    batch_data = []
-                    batch_locations = []
+                    progress_bar.update(step)
 
-                progress_bar.update(step)
+            if batch:
+                run_batch(batch)
+            # 空音频没有切块
+            for song in list(overlap_adds):
+                finish(song)
 
             progress_bar.close(None)
 
-            estimated_sources = result / counter
-            estimated_sources = estimated_sources.cpu().numpy()
-            np.nan_to_num(estimated_sources, copy=False, nan=0.0)
-
-            if length_init > 2 * border and (border > 0):
-                # Remove pad
-                estimated_sources = estimated_sources[..., border:-border]
-
-    if config.training.target_instrument is None:
-        return {k: v for k, v in zip(config.training.instruments, estimated_sources)}
-    else:
-        return {
-            k: v for k, v in zip([config.training.target_instrument], estimated_sources)
-        }
+    return results
 
 
 def demix_track_demucs(config, model, mix, device, pbar=False):
@@ -177,13 +253,12 @@ def demix_track_demucs(config, model, mix, device, pbar=False):
     N = config.inference.num_overlap
     batch_size = config.inference.batch_size
     step = C // N
-    # print(S, C, N, step, mix.shape, mix.device)
 
     with torch.cuda.amp.autocast(enabled=config.training.use_amp):
         with torch.inference_mode():
             req_shape = (S,) + tuple(mix.shape)
-            result = torch.zeros(req_shape, dtype=torch.float32)
-            counter = torch.zeros(req_shape, dtype=torch.float32)
+            overlap_add = OverlapAdd(req_shape, device)
+            mix = mix.to(device)
             i = 0
             batch_data = []
             batch_locations = []
@@ -194,8 +269,7 @@ def demix_track_demucs(config, model, mix, device, pbar=False):
             )
 
             while i < mix.shape[1]:
-                # print(i, i + C, mix.shape[1])
-                part = mix[:, i : i + C].to(device)
+                part = mix[:, i : i + C]
                 length = part.shape[-1]
                 if length < C:
                     part = nn.functional.pad(
@@ -208,10 +282,11 @@ def demix_track_demucs(config, model, mix, device, pbar=False):
                 if len(batch_data) >= batch_size or (i >= mix.shape[1]):
                     arr = torch.stack(batch_data, dim=0)
                     x = model(arr)
-                    for j in range(len(batch_locations)):
-                        start, l = batch_locations[j]
-                        result[..., start : start + l] += x[j][..., :l].cpu()
-                        counter[..., start : start + l] += 1.0
+                    overlap_add.add(
+                        x,
+                        [start for start, _ in batch_locations],
+                        [l for _, l in batch_locations],
+                    )
                     batch_data = []
                     batch_locations = []
 
@@ -221,9 +296,7 @@ def demix_track_demucs(config, model, mix, device, pbar=False):
             if progress_bar:
                 progress_bar.close()
 
-            estimated_sources = result / counter
-            estimated_sources = estimated_sources.cpu().numpy()
-            np.nan_to_num(estimated_sources, copy=False, nan=0.0)
+            estimated_sources = overlap_add.finish()
 
     if S > 1:
         return {k: v for k, v in zip(config.training.instruments, estimated_sources)}
@@ -14,9 +14,10 @@ import soundfile as sf
 import hashlib
 import torch.nn.functional as F
 from ast import literal_eval
-from ReFlowVaeSVC.slicer import Slicer
+from ddspsvc.slicer import Slicer
 from ReFlowVaeSVC.reflow.extractors import F0_Extractor, Volume_Extractor, Units_Encoder
 from ReFlowVaeSVC.reflow.vocoder import load_model_vocoder
+from ddspsvc.ddsp.core import volume_gate
 from tqdm import tqdm
 
 
@@ -273,11 +274,7 @@ if __name__ == "__main__":
         print("Extracting the volume envelope of the input audio...")
         volume_extractor = Volume_Extractor(hop_size)
         volume = volume_extractor.extract(audio)
-        mask = (volume > 10 ** (float(cmd.threhold) / 20)).astype("float")
-        mask = np.pad(mask, (4, 4), constant_values=(mask[0], mask[-1]))
-        mask = np.array([np.max(mask[n : n + 9]) for n in range(len(mask) - 8)])
-        mask = torch.from_numpy(mask).float().to(device).unsqueeze(-1).unsqueeze(0)
-        mask = upsample(mask, args.data.block_size).squeeze(-1)
+        mask = volume_gate(volume, cmd.threhold, args.data.block_size, device)
         volume = torch.from_numpy(volume).float().to(device).unsqueeze(-1).unsqueeze(0)
 
     else:
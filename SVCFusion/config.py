@@ -105,9 +105,13 @@ class DefaultSystemConfig:
 
     class infer:
         msst_device = "cuda:0"
+        feature_cache_size = 2048
+        msst_cache_size = 4096
 
     class sovits:
         resolve_port_clash = False
+        feature_retrieval_k = 8
+        feature_retrieval_nprobe = 1
 
     class ddsp6:
         pretrained_model_preference = 0
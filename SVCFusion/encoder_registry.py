@@ -0,0 +1,138 @@
+import os
+import threading
+
+import torch
+
+
+def normalize_device(device):
+    """cuda 和 cuda:0 算同一个设备"""
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    device = torch.device(device)
+    if device.type == "cuda" and device.index is None and torch.cuda.is_available():
+        device = torch.device("cuda", torch.cuda.current_device())
+    return str(device)
+
+
+class EncoderRegistry:
+    """
+    进程内共享的语音编码器（ContentVec、HuBERT 等）
+
+    同一个 (编码器, 权重, 设备, dtype) 只加载一次，各模型 load 时 acquire、unload 时 release，
+    引用计数归零才真正释放显存。切换 DDSP 和 Reflow 模型时不会再各自留一份几百 MB 的编码器
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, factory):
+        """返回 key 对应的编码器，不存在时调用 factory() 加载"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [factory(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._entries[key]
+        del entry
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def refcount(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return 0 if entry is None else entry[1]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+encoder_registry = EncoderRegistry()
+
+
+def units_encoder_key(
+    encoder,
+    encoder_ckpt,
+    encoder_sample_rate,
+    encoder_hop_size,
+    device,
+    cnhubertsoft_gate=10,
+    dtype=torch.float32,
+):
+    return (
+        "units_encoder",
+        encoder,
+        os.path.realpath(encoder_ckpt) if encoder_ckpt else encoder_ckpt,
+        encoder_sample_rate,
+        encoder_hop_size,
+        cnhubertsoft_gate if encoder == "cnhubertsoftfish" else None,
+        normalize_device(device),
+        str(dtype),
+    )
+
+
+def acquire_units_encoder(data_args, device):
+    """
+    按 DDSP / Reflow 配置里的 data 段取共享的 Units_Encoder，返回 (key, encoder)
+
+    三种模型的 Units_Encoder 只有批处理支持上的差别，统一用 ddspsvc 的实现，
+    batch 为 1 时结果与各自的实现一致
+    """
+    from ddspsvc.ddsp.vocoder import Units_Encoder
+
+    if data_args.encoder == "cnhubertsoftfish":
+        cnhubertsoft_gate = data_args.cnhubertsoft_gate
+    else:
+        cnhubertsoft_gate = 10
+    key = units_encoder_key(
+        data_args.encoder,
+        data_args.encoder_ckpt,
+        data_args.encoder_sample_rate,
+        data_args.encoder_hop_size,
+        device,
+        cnhubertsoft_gate,
+    )
+    encoder = encoder_registry.acquire(
+        key,
+        lambda: Units_Encoder(
+            data_args.encoder,
+            data_args.encoder_ckpt,
+            data_args.encoder_sample_rate,
+            data_args.encoder_hop_size,
+            cnhubertsoft_gate=cnhubertsoft_gate,
+            device=device,
+        ),
+    )
+    return key, encoder
+
+
+def acquire_speech_encoder(speech_encoder, device, dtype=torch.float32):
+    """取 So-VITS 用的共享 SpeechEncoder，返回 (key, encoder)"""
+    from SoVITS import utils
+
+    key = ("speech_encoder", speech_encoder, normalize_device(device), str(dtype))
+    encoder = encoder_registry.acquire(
+        key, lambda: utils.get_speech_encoder(speech_encoder, device=device)
+    )
+    return key, encoder
+
+
+__all__ = [
+    "EncoderRegistry",
+    "encoder_registry",
+    "normalize_device",
+    "units_encoder_key",
+    "acquire_units_encoder",
+    "acquire_speech_encoder",
+]
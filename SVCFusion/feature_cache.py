@@ -0,0 +1,167 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+import torch
+
+from SVCFusion.config import system_config
+
+
+class FeatureCache:
+    """
+    推理用的磁盘特征缓存，存放 f0/uv、units、音量包络等中间结果
+
+    每条记录是 cache_dir 下的一个 .npz 文件，文件名由 (特征种类, 音频哈希, 提取器, hop, 编码器...) 算出。
+    写入先落到临时文件再 os.replace，进程中途被杀也不会留下半截文件；
+    命中时刷新 mtime，总大小超过上限时按 mtime 从旧到新淘汰（LRU）
+    """
+
+    def __init__(self, cache_dir=os.path.join("tmp", "feature_cache"), max_size=None):
+        self.cache_dir = cache_dir
+        # 单位 MB，None 时读取设置
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kind, *parts):
+        digest = hashlib.md5("_".join(str(p) for p in parts).encode()).hexdigest()
+        return f"{kind}_{digest}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def _max_bytes(self):
+        max_size = self.max_size
+        if max_size is None:
+            max_size = system_config.infer.feature_cache_size
+        return int(float(max_size) * 1024 * 1024)
+
+    def load(self, key):
+        """命中时返回单个数组或数组元组，未命中返回 None"""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = tuple(data[f"arr_{i}"] for i in range(len(data.files)))
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return arrays[0] if len(arrays) == 1 else arrays
+
+    def save(self, key, *arrays):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, *[np.asarray(a) for a in arrays])
+        size = os.path.getsize(tmp_path)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += size - old_size
+        self._evict()
+
+    def get_or_compute(self, key, compute):
+        """读缓存，未命中时调用 compute 计算并写回"""
+        cached = self.load(key)
+        if cached is not None:
+            return cached
+        result = compute()
+        if isinstance(result, tuple):
+            self.save(key, *result)
+        else:
+            self.save(key, result)
+        return result
+
+    def _scan(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict(self):
+        max_bytes = self._max_bytes()
+        with self._lock:
+            if self._size is not None and self._size <= max_bytes:
+                return
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                total -= size
+            self._size = total
+
+    def size(self):
+        with self._lock:
+            if not os.path.exists(self.cache_dir):
+                return 0
+            self._size = sum(size for _, size, _ in self._scan())
+            return self._size
+
+    def clear(self):
+        with self._lock:
+            if os.path.exists(self.cache_dir):
+                for _, _, name in self._scan():
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+            self._size = 0
+
+
+feature_cache = FeatureCache()
+
+
+def encode_units_cached(
+    units_encoder, segments, audio_hash, encoder_tag, sample_rate, hop_size, device
+):
+    """
+    按切片取 units，缓存里没有的切片用 encode_batch 一起编码后写回，
+    结果与逐条编码相同
+
+    返回每个切片 1 x n_i x C 的 units 张量
+    """
+    keys = [
+        FeatureCache.make_key(
+            "units",
+            audio_hash,
+            encoder_tag,
+            sample_rate,
+            hop_size,
+            start_frame,
+            len(audio),
+        )
+        for start_frame, audio in segments
+    ]
+    units = [feature_cache.load(key) for key in keys]
+    missing = [i for i, u in enumerate(units) if u is None]
+    if missing:
+        encoded = units_encoder.encode_batch(
+            [torch.from_numpy(segments[i][1]).float().to(device) for i in missing],
+            sample_rate,
+            hop_size,
+        )
+        for i, u in zip(missing, encoded):
+            units[i] = u[0].cpu().numpy()
+            feature_cache.save(keys[i], units[i])
+    return [torch.from_numpy(u).float().to(device).unsqueeze(0) for u in units]
+
+
+__all__ = [
+    "FeatureCache",
+    "feature_cache",
+    "encode_units_cached",
+]
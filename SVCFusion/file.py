@@ -1,6 +1,8 @@
 import hashlib
 import os
 import shutil
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
 from loguru import logger
@@ -27,12 +29,44 @@ def make_dirs(path, clean: bool = False):
     path.mkdir(parents=True, exist_ok=True)
 
 
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_MEMO_SIZE = 1024
+
+_hash_memo = OrderedDict()
+_hash_memo_lock = threading.Lock()
+
+
+def file_hash(path, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    按块流式计算文件内容的 md5，不会把整个文件读进内存
+
+    结果按 (绝对路径, 大小, mtime) 记忆，文件没变时不会重复读盘；
+    文件被改写后 mtime 或大小变化，自然会重新计算
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    memo_key = (path, stat.st_size, stat.st_mtime_ns)
+    with _hash_memo_lock:
+        if memo_key in _hash_memo:
+            _hash_memo.move_to_end(memo_key)
+            return _hash_memo[memo_key]
+
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
+    digest = md5.hexdigest()
+
+    with _hash_memo_lock:
+        _hash_memo[memo_key] = digest
+        while len(_hash_memo) > HASH_MEMO_SIZE:
+            _hash_memo.popitem(last=False)
+    return digest
+
+
 def getResultFileName(audio_path: str):
     # 计算文件的 md5
-    md5_hash = ""
-    with open(audio_path, "rb") as f:
-        data = f.read()
-        md5_hash = hashlib.md5(data).hexdigest()
+    md5_hash = file_hash(audio_path)
     filename = (
         os.path.basename(audio_path)[::-1].replace(".wav"[::-1], "")[::-1]
         + f"_{md5_hash[:5]}.wav"
@@ -5,7 +5,8 @@ import numpy as np
 import torch
 from tqdm import tqdm
 
-from ReFlowVaeSVC.main import cross_fade, upsample, split
+from ReFlowVaeSVC.main import cross_fade, split
+from ddspsvc.ddsp.core import volume_gate
 from ReFlowVaeSVC.reflow.vocoder import load_model_vocoder
 from ReFlowVaeSVC.reflow.extractors import F0_Extractor, Volume_Extractor, Units_Encoder
 
@@ -134,17 +135,7 @@ class ReflowVAESVCInfer:
             print("Extracting the volume envelope of the input audio...")
             volume_extractor = Volume_Extractor(hop_size)
             volume = volume_extractor.extract(audio)
-            mask = (volume > 10 ** (float(threhold) / 20)).astype("float")
-            mask = np.pad(mask, (4, 4), constant_values=(mask[0], mask[-1]))
-            mask = np.array([np.max(mask[n : n + 9]) for n in range(len(mask) - 8)])
-            mask = (
-                torch.from_numpy(mask)
-                .float()
-                .to(self.model_device)
-                .unsqueeze(-1)
-                .unsqueeze(0)
-            )
-            mask = upsample(mask, self.args.data.block_size).squeeze(-1)
+            mask = volume_gate(volume, threhold, self.args.data.block_size, self.model_device)
             volume = (
                 torch.from_numpy(volume)
                 .float()
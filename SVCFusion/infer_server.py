@@ -0,0 +1,335 @@
+"""
+推理服务：每个模型一个有界请求队列和一组 worker 线程，HTTP 请求异步等待结果
+
+配置文件示例（YAML）:
+
+    host: 0.0.0.0
+    port: 7870
+    models:
+      - name: alice                  # 请求里用的模型名
+        type: DDSP-SVC 6.0           # SVCFusion.models.inited 里的 model_name
+        load_args:                   # 传给模型 load_model 的参数，device 由 devices 决定
+          cascade: exp/alice/model_100000.pt
+        devices: [cuda:0, cuda:1]    # 每个设备各起 workers_per_device 个 worker
+        workers_per_device: 1
+        queue_size: 32               # 排队的请求数上限，满了返回 503
+        params:                      # 该模型的默认推理参数
+          f0: rmvpe
+
+用法: python -m SVCFusion.infer_server -c configs/infer_server.yaml
+"""
+
+import argparse
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from traceback import print_exception
+
+import numpy as np
+
+from SVCFusion.config import YAMLReader
+
+SERVER_TMP_DIR = os.path.join("tmp", "infer_server")
+
+
+class ServerBusy(Exception):
+    """请求队列已满"""
+
+
+class ModelStats:
+    """单个模型的计数和最近 window 个请求的耗时"""
+
+    def __init__(self, window=1000):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.queue_wait = deque(maxlen=window)
+        self.infer_time = deque(maxlen=window)
+
+    def snapshot(self, queue_depth):
+        def percentiles(values):
+            if not values:
+                return {"p50": None, "p95": None}
+            p50, p95 = np.percentile(np.fromiter(values, dtype=float), [50, 95])
+            return {"p50": round(float(p50), 4), "p95": round(float(p95), 4)}
+
+        return {
+            "queue_depth": queue_depth,
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait": percentiles(self.queue_wait),
+            "infer_time": percentiles(self.infer_time),
+        }
+
+
+class InferRequest:
+    def __init__(self, audio, params):
+        self.id = uuid.uuid4().hex
+        self.audio = audio
+        self.params = params
+        self.future = Future()
+        self.submitted_at = time.perf_counter()
+
+
+def default_infer_params(model):
+    """模型推理表单里的默认值，四种模型共用同一套参数名"""
+    params = {}
+    for key, item in model.infer_form.items():
+        if item.get("individual") or "default" not in item:
+            continue
+        default = item["default"]
+        params[key] = default() if callable(default) else default
+    return params
+
+
+class ModelWorkerPool:
+    """
+    一个模型的 worker 池
+
+    每个 worker 线程在自己的设备上持有一份模型实例，从共享的有界队列里取请求；
+    同一设备上的 worker 通过 encoder_registry 共用编码器
+    """
+
+    def __init__(
+        self,
+        name,
+        model_type,
+        load_args,
+        devices=None,
+        workers_per_device=1,
+        queue_size=32,
+        params=None,
+    ):
+        from SVCFusion.models.inited import model_list
+
+        models = {model.model_name: model for model in model_list}
+        if model_type not in models:
+            raise ValueError(
+                f"Unknown model type {model_type}, expected one of {list(models)}"
+            )
+        self.name = name
+        self.model_class = type(models[model_type])
+        self.load_args = load_args
+        self.devices = devices or [None]
+        self.workers_per_device = workers_per_device
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = ModelStats()
+        self.lock = threading.Lock()
+        self.defaults = default_infer_params(models[model_type])
+        self.defaults.update(params or {})
+        self.spks = []
+        self.threads = []
+
+    def start(self):
+        for device in self.devices:
+            for _ in range(self.workers_per_device):
+                model = self.model_class()
+                spks = model.load_model({**self.load_args, "device": device})
+                self.spks = spks or []
+                thread = threading.Thread(
+                    target=self._worker, args=(model,), daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def build_params(self, params):
+        unknown = set(params) - set(self.defaults) - {"spk"}
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: {sorted(unknown)}")
+        result = {**self.defaults, **params}
+        result.setdefault("spk", self.spks[0] if self.spks else None)
+        if self.spks and result["spk"] not in self.spks:
+            raise ValueError(f"Unknown speaker {result['spk']}, expected {self.spks}")
+        result["use_batch"] = False
+        return result
+
+    def submit(self, audio, params):
+        """audio 为 wav 等音频文件的内容，返回结果为输出 wav 内容的 Future"""
+        request = InferRequest(audio, self.build_params(params))
+        try:
+            self.queue.put_nowait(request)
+        except queue.Full:
+            with self.lock:
+                self.stats.rejected += 1
+            raise ServerBusy(f"Too many queued requests for {self.name}")
+        with self.lock:
+            self.stats.submitted += 1
+        return request.future
+
+    def _worker(self, model):
+        while True:
+            request = self.queue.get()
+            if request is None:
+                break
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            started_at = time.perf_counter()
+            with self.lock:
+                self.stats.in_flight += 1
+                self.stats.queue_wait.append(started_at - request.submitted_at)
+            try:
+                result = self._run(model, request)
+            except Exception as e:
+                print_exception(e)
+                with self.lock:
+                    self.stats.in_flight -= 1
+                    self.stats.failed += 1
+                request.future.set_exception(e)
+                continue
+            with self.lock:
+                self.stats.in_flight -= 1
+                self.stats.completed += 1
+                self.stats.infer_time.append(time.perf_counter() - started_at)
+            request.future.set_result(result)
+
+    def _run(self, model, request):
+        os.makedirs(SERVER_TMP_DIR, exist_ok=True)
+        os.makedirs(os.path.join("tmp", "infer_opt"), exist_ok=True)
+        input_path = os.path.join(SERVER_TMP_DIR, request.id + ".wav")
+        with open(input_path, "wb") as f:
+            f.write(request.audio)
+        # hash 决定输出文件名，每个请求各用一个，并发时不会互相覆盖
+        params = {**request.params, "audio": input_path, "hash": request.id}
+        output_path = None
+        try:
+            output_path = model.infer(params, progress=None)
+            with open(output_path, "rb") as f:
+                return f.read()
+        finally:
+            for path in (input_path, output_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def snapshot(self):
+        with self.lock:
+            return self.stats.snapshot(self.queue.qsize())
+
+
+class InferenceService:
+    def __init__(self, model_configs):
+        self.pools = {}
+        for config in model_configs:
+            config = dict(config)
+            name = config.pop("name")
+            self.pools[name] = ModelWorkerPool(
+                name, config.pop("type"), config.pop("load_args"), **config
+            )
+
+    def start(self):
+        for pool in self.pools.values():
+            pool.start()
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+
+    def submit(self, model, audio, params=None):
+        if model not in self.pools:
+            raise KeyError(model)
+        return self.pools[model].submit(audio, params or {})
+
+    def models(self):
+        return {
+            name: {
+                "type": pool.model_class.model_name,
+                "spks": pool.spks,
+                "workers": len(pool.threads),
+                "defaults": pool.defaults,
+            }
+            for name, pool in self.pools.items()
+        }
+
+    def metrics(self):
+        return {name: pool.snapshot() for name, pool in self.pools.items()}
+
+
+def create_app(service):
+    import asyncio
+    import json
+
+    from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+    from fastapi.responses import Response
+
+    app = FastAPI()
+
+    @app.post("/infer")
+    async def infer(
+        model: str = Form(...),
+        params: str = Form("{}"),
+        audio: UploadFile = File(...),
+    ):
+        try:
+            params = json.loads(params)
+            future = service.submit(model, await audio.read(), params)
+        except KeyError:
+            raise HTTPException(404, f"Model {model} is not loaded")
+        except ServerBusy as e:
+            raise HTTPException(503, str(e), headers={"Retry-After": "1"})
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        # 推理在 worker 线程里进行，这里只等待结果，不阻塞事件循环
+        try:
+            wav = await asyncio.wrap_future(future)
+        except Exception as e:
+            raise HTTPException(500, str(e))
+        return Response(wav, media_type="audio/wav")
+
+    @app.get("/models")
+    async def models():
+        return service.models()
+
+    @app.get("/metrics")
+    async def metrics():
+        return service.metrics()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--config", type=str, required=True)
+    parser.add_argument("--host", type=str, default=None)
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    with YAMLReader(args.config) as config:
+        service = InferenceService(config["models"])
+    service.start()
+    try:
+        uvicorn.run(
+            create_app(service),
+            host=args.host or config.get("host", "127.0.0.1"),
+            port=args.port or config.get("port", 7870),
+        )
+    finally:
+        service.close()
+
+
+__all__ = [
+    "ServerBusy",
+    "ModelWorkerPool",
+    "InferenceService",
+    "default_infer_params",
+    "create_app",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
-import hashlib
 import gradio as gr
 import librosa
-from SVCFusion.file import getResultFileName, make_dirs
+from SVCFusion.file import file_hash, getResultFileName, make_dirs
 
 import soundfile as sf
 
@@ -44,11 +43,8 @@ def infer(
         audio = librosa.to_mono(audio)
 
     # get MD5 hash from wav file
-    md5_hash = ""
-    with open(audio_path, "rb") as f:
-        data = f.read()
-        md5_hash = hashlib.md5(data).hexdigest()
-        print("MD5: " + md5_hash)
+    md5_hash = file_hash(audio_path)
+    print("MD5: " + md5_hash)
 
     result, sr, f0 = loaded_model.infer_core(
         audio=audio,
@@ -127,9 +127,19 @@ class _Locale(Locale):
 
         class infer(Locale.settings.infer):
             msst_device_label = "🏃🏽\u200d♂️🔍⚙️🔍📱"
+            feature_cache_size_label = "💾📏"
+            feature_cache_size_info = "💾🎵🔁🗑️"
+            msst_cache_size_label = "✂️🧠📏"
+            msst_cache_size_info = "✂️🧠🔁🗑️"
+            unload_msst_btn_value = "🗑️✂️🧠"
+            unloaded_msst_tip = "✅🗑️ {1} ✂️🧠"
 
         class sovits(Locale.settings.sovits):
             resolve_port_clash_label = "🔄🛠️💻🚀🚫🌐Mbps"
+            feature_retrieval_k_label = "🔍👥🔢"
+            feature_retrieval_k_info = "🔍🎵👥🔀"
+            feature_retrieval_nprobe_label = "🔍🪣🔢"
+            feature_retrieval_nprobe_info = "🪣⬆️🎯🐢"
 
         class ddsp6(Locale.settings.ddsp6):
             pretrained_model_preference_dropdown_label = "🔍👌🏼"
@@ -326,6 +336,8 @@ class _Locale(Locale):
 
     class ddsp6(Locale.ddsp6):
         infer_tip = "🔍🤖🎧🎶"
+        infer_batch_size_label = "📦🔢"
+        infer_batch_size_info = "📦🎵🎵🎵 ➡️ 🚀，📈📦 ➡️ 📈💾"
 
         class model_types(Locale.ddsp6.model_types):
             cascade = "🤔"
@@ -131,11 +131,31 @@ class _Locale(Locale):
 
         class infer(Locale.settings.infer):
             msst_device_label = "Run separation task using device."
+            feature_cache_size_label = "Feature cache size limit (MB)"
+            feature_cache_size_info = (
+                "Caches pitch, volume and encoder features of input audio; "
+                "least recently used entries are removed past the limit"
+            )
+            msst_cache_size_label = "Separation model memory budget (MB)"
+            msst_cache_size_info = (
+                "Keeps loaded separation models for later jobs; least recently used "
+                "models are unloaded past the budget, 0 unloads them after each job"
+            )
+            unload_msst_btn_value = "Unload separation models"
+            unloaded_msst_tip = "Unloaded {1} separation model(s)"
 
         class sovits(Locale.settings.sovits):
             resolve_port_clash_label = (
                 "Try resolving port conflict issues (Windows is applicable)"
             )
+            feature_retrieval_k_label = "Feature retrieval neighbours"
+            feature_retrieval_k_info = (
+                "Number of closest training features blended for each frame"
+            )
+            feature_retrieval_nprobe_label = "Feature retrieval probes"
+            feature_retrieval_nprobe_info = (
+                "Number of index buckets searched; higher is more accurate but slower"
+            )
 
         class ddsp6(Locale.settings.ddsp6):
             pretrained_model_preference_dropdown_label = (
@@ -340,6 +360,8 @@ class _Locale(Locale):
 
     class ddsp6(Locale.ddsp6):
         infer_tip = "Inferential DDSP Model"
+        infer_batch_size_label = "Inference batch size"
+        infer_batch_size_info = "Slices of similar length are inferred together in one batch. Larger is faster but uses more VRAM."
 
         class model_types(Locale.ddsp6.model_types):
             cascade = "Cascaded model"
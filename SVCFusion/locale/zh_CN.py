@@ -217,9 +217,19 @@ class _Locale(Locale):
 
         class infer(Locale.settings.infer):
             msst_device_label = "运行分离任务使用设备"
+            feature_cache_size_label = "特征缓存大小上限（MB）"
+            feature_cache_size_info = "缓存输入音频的音高、音量和编码器特征，超过上限时删除最久未使用的缓存"
+            msst_cache_size_label = "分离模型常驻内存上限（MB）"
+            msst_cache_size_info = "保留已加载的分离模型供下次使用，超过上限时卸载最久未使用的模型，设为 0 则用完即卸载"
+            unload_msst_btn_value = "卸载分离模型"
+            unloaded_msst_tip = "已卸载 {1} 个分离模型"
 
         class sovits(Locale.settings.sovits):
             resolve_port_clash_label = "尝试解决端口冲突问题（Windows 可用）"
+            feature_retrieval_k_label = "特征检索近邻数"
+            feature_retrieval_k_info = "每帧取多少个最相近的训练集特征加权混合"
+            feature_retrieval_nprobe_label = "特征检索搜索桶数"
+            feature_retrieval_nprobe_info = "检索时搜索的聚类桶数量，越大越准确但越慢"
 
         class ddsp6(Locale.settings.ddsp6):
             pretrained_model_preference_dropdown_label = "底模偏好"
@@ -482,6 +492,8 @@ class _Locale(Locale):
 
     class ddsp6(Locale.ddsp6):
         infer_tip = "推理 DDSP 模型"
+        infer_batch_size_label = "推理批次大小"
+        infer_batch_size_info = "把长度相近的切片合成一批推理，越大越快，越大越占显存"
 
         class model_types(Locale.ddsp6.model_types):
             cascade = "级联模型"
@@ -7,9 +7,11 @@ from traceback import print_exception
 
 import torch
 import torchaudio
+from ddspsvc.ddsp.core import resample
 from SVCFusion.const_vars import EMPTY_WAV_PATH
+from SVCFusion.file import file_hash
 from SVCFusion.i18n import I
-from SVCFusion.uvr import getVocalAndInstrument
+from SVCFusion.uvr import getVocalAndInstrument, getVocalAndInstrumentBatch
 import gradio as gr
 
 common_infer_form = {
@@ -178,24 +180,46 @@ def infer_fn_proxy(fn):
             params["audio"] = params["audio_batch"]
         result = []
         inst_list = []
-        for audio in params["audio"]:
-            processed_vocal = False
-            processed_inst = False
+        use_separation = (
+            params["use_vocal_separation"]
+            or params["use_de_reverb"]
+            or params["use_harmonic_remove"]
+        )
 
+        load_errors = {}
+        for audio in params["audio"]:
             try:
                 wf, sr = torchaudio.load(audio)
                 # 重采样到 44100,单声道
                 if wf.size(0) > 1:
                     wf = wf.mean(0, keepdim=True)
-                if sr != 44100:
-                    wf = torchaudio.transforms.Resample(sr, 44100)(wf)
+                wf = resample(wf, sr, 44100)
                 torchaudio.save(audio, wf, 44100)
+            except Exception as e:
+                load_errors[audio] = e
+
+        if use_separation and len(params["audio"]) > 1:
+            # 批量模式下先把所有歌一起分离，下面逐首处理时直接命中缓存
+            try:
+                getVocalAndInstrumentBatch(
+                    [audio for audio in params["audio"] if audio not in load_errors],
+                    use_vocal_fetch=params["use_vocal_separation"],
+                    use_de_reverb=params["use_de_reverb"],
+                    use_harmonic_remove=params["use_harmonic_remove"],
+                    progress=progress,
+                )
+            except Exception as e:
+                print_exception(e)
+
+        for audio in params["audio"]:
+            processed_vocal = False
+            processed_inst = False
+
+            try:
+                if audio in load_errors:
+                    raise load_errors[audio]
 
-                if (
-                    params["use_vocal_separation"]
-                    or params["use_de_reverb"]
-                    or params["use_harmonic_remove"]
-                ):
+                if use_separation:
                     vocal, inst = getVocalAndInstrument(
                         audio,
                         use_vocal_fetch=params["use_vocal_separation"],
@@ -210,8 +234,11 @@ def infer_fn_proxy(fn):
                 new_params = {}
                 new_params.update(params)
                 new_params["audio"] = audio
+                # 用音频内容代替路径参与哈希，同一文件换个名字也能命中
                 new_params["hash"] = hashlib.md5(
-                    json.dumps(new_params).encode()
+                    json.dumps(
+                        {**new_params, "audio": file_hash(audio)}, sort_keys=True
+                    ).encode()
                 ).hexdigest()
 
                 res = fn(new_params, progress=progress)
@@ -1,5 +1,4 @@
 import gc
-import hashlib
 import os
 from shutil import rmtree
 from SVCFusion.exec import executable
@@ -13,6 +12,7 @@ import yaml
 
 from SVCFusion.config import YAMLReader, applyChanges, system_config
 from SVCFusion.dataset_utils import DrawArgs, auto_normalize_dataset
+from SVCFusion.file import file_hash
 from SVCFusion.i18n import I
 from SVCFusion.model_utils import get_pretrain_models_form_item, load_pretrained
 from .common import (
@@ -22,9 +22,16 @@ from .common import (
     ddsp_based_preprocess_form,
 )
 from ddspsvc.reflow.vocoder import load_model_vocoder
-from ddspsvc.ddsp.vocoder import F0_Extractor, Volume_Extractor, Units_Encoder
-from ddspsvc.ddsp.core import upsample
-from ddspsvc.main_reflow import cross_fade, split
+from ddspsvc.ddsp.vocoder import F0_Extractor, Volume_Extractor
+from SVCFusion.encoder_registry import acquire_units_encoder, encoder_registry
+from ddspsvc.ddsp.core import volume_gate
+from ddspsvc.main_reflow import split
+from SVCFusion.segment_utils import (
+    SegmentStitcher,
+    bucket_segments,
+    pad_frames_batch,
+)
+from SVCFusion.feature_cache import FeatureCache, encode_units_cached, feature_cache
 import gradio as gr
 from ddspsvc.draw import main as draw_main
 
@@ -84,9 +91,11 @@ class DDSPModel:
         if self.vocoder is not None:
             del self.vocoder
             self.vocoder = None
-        if self.units_encoder is not None:
-            del self.units_encoder
-            self.units_encoder = None
+        if self.units_encoder_key is not None:
+            # 编码器是共享的，只释放本模型的引用
+            encoder_registry.release(self.units_encoder_key)
+            self.units_encoder_key = None
+        self.units_encoder = None
         if self.args is not None:
             del self.args
             self.args = None
@@ -113,17 +122,8 @@ class DDSPModel:
         self.model_device = device
 
         # load units encoder
-        if self.args.data.encoder == "cnhubertsoftfish":
-            cnhubertsoft_gate = self.args.data.cnhubertsoft_gate
-        else:
-            cnhubertsoft_gate = 10
-        self.units_encoder = Units_Encoder(
-            self.args.data.encoder,
-            self.args.data.encoder_ckpt,
-            self.args.data.encoder_sample_rate,
-            self.args.data.encoder_hop_size,
-            cnhubertsoft_gate=cnhubertsoft_gate,
-            device=device,
+        self.units_encoder_key, self.units_encoder = acquire_units_encoder(
+            self.args.data, device
         )
 
         config_path = os.path.join(os.path.dirname(path), "config.yaml")
@@ -231,30 +231,13 @@ class DDSPModel:
             self.args.data.block_size * sample_rate / self.args.data.sampling_rate
         )
 
-        f0 = None
-
         # get MD5 hash from wav file
-        md5_hash = ""
-        with open(input_file, "rb") as f:
-            data = f.read()
-            md5_hash = hashlib.md5(data).hexdigest()
-            print("MD5: " + md5_hash)
-
-        cache_dir_path = os.path.join("tmp", "f0_cache")
-        cache_file_path = os.path.join(
-            cache_dir_path,
-            f"{f0_extractor}_{hop_size}_{self.args.data.f0_min}_{self.args.data.f0_max}_{md5_hash}.npy",
-        )
+        md5_hash = file_hash(input_file)
+        print("MD5: " + md5_hash)
 
-        is_cache_available = os.path.exists(cache_file_path)
-        if is_cache_available:
-            # f0 cache load
-            print("Loading pitch curves for input audio from cache directory...")
-            f0 = np.load(cache_file_path, allow_pickle=False)
-        if type(f0) == type(None):
+        def extract_f0():
             # extract f0
             print("Pitch extractor type: " + f0_extractor)
-
             pitch_extractor = F0_Extractor(
                 f0_extractor,
                 sample_rate,
@@ -263,13 +246,21 @@ class DDSPModel:
                 float(self.args.data.f0_max),
             )
             print("Extracting the pitch curve of the input audio...")
-            f0 = pitch_extractor.extract(
+            return pitch_extractor.extract(
                 audio, uv_interp=True, device=self.model_device
             )
-            if not not md5_hash:
-                # f0 cache save
-                os.makedirs(cache_dir_path, exist_ok=True)
-                np.save(cache_file_path, f0, allow_pickle=False)
+
+        f0 = feature_cache.get_or_compute(
+            FeatureCache.make_key(
+                "f0",
+                md5_hash,
+                f0_extractor,
+                hop_size,
+                self.args.data.f0_min,
+                self.args.data.f0_max,
+            ),
+            extract_f0,
+        )
         f0 = (
             torch.from_numpy(f0)
             .float()
@@ -291,18 +282,11 @@ class DDSPModel:
         # extract volume
         print("Extracting the volume envelope of the input audio...")
         volume_extractor = Volume_Extractor(hop_size)
-        volume = volume_extractor.extract(audio)
-        mask = (volume > 10 ** (float(threhold) / 20)).astype("float")
-        mask = np.pad(mask, (4, 4), constant_values=(mask[0], mask[-1]))
-        mask = np.array([np.max(mask[n : n + 9]) for n in range(len(mask) - 8)])
-        mask = (
-            torch.from_numpy(mask)
-            .float()
-            .to(self.model_device)
-            .unsqueeze(-1)
-            .unsqueeze(0)
+        volume = feature_cache.get_or_compute(
+            FeatureCache.make_key("volume", md5_hash, hop_size),
+            lambda: volume_extractor.extract(audio),
         )
-        mask = upsample(mask, self.args.data.block_size).squeeze(-1)
+        mask = volume_gate(volume, threhold, self.args.data.block_size, self.model_device)
 
         volume = (
             torch.from_numpy(volume)
@@ -357,74 +341,149 @@ class DDSPModel:
             exit(0)
 
         # forward and save the output
-        result = np.zeros(0)
-        current_length = 0
         print("Start cutting")
         is_small_audio = audio.size > 10 * sample_rate
         segments = (
             split(audio, sample_rate, hop_size) if is_small_audio else [(0, audio)]
         )
         print("Cut the input audio into " + str(len(segments)) + " slices")
+        batch_size = max(int(params.get("infer_batch_size", 1)), 1)
+        buckets = bucket_segments(segments, batch_size)
+        print("Batch size: " + str(batch_size) + ", batches: " + str(len(buckets)))
+        seg_outputs = [None] * len(segments)
         with torch.no_grad():
             pgs = (
-                progress.tqdm(segments, desc=I.ddsp6.infer_tip)
+                progress.tqdm(buckets, desc=I.ddsp6.infer_tip)
                 if type(progress) is not type(None)
-                else segments
+                else buckets
             )
-            for segment in pgs:
-                start_frame = segment[0]
-                seg_input = (
-                    torch.from_numpy(segment[1])
-                    .float()
-                    .unsqueeze(0)
-                    .to(self.model_device)
-                )
-                seg_units = self.units_encoder.encode(seg_input, sample_rate, hop_size)
-                seg_f0 = f0[:, start_frame : start_frame + seg_units.size(1), :]
-                seg_volume = volume[:, start_frame : start_frame + seg_units.size(1), :]
-
-                seg_output = self.model(
-                    seg_units,
-                    seg_f0,
-                    seg_volume,
+            for bucket in pgs:
+                batch_outputs = self.infer_segments(
+                    [segments[i] for i in bucket],
+                    md5_hash,
+                    f0,
+                    volume,
+                    mask,
+                    sample_rate,
+                    hop_size,
                     spk_id=spk_id,
-                    spk_mix_dict=None,
                     aug_shift=formant_shift_key,
-                    vocoder=self.vocoder,
-                    infer=True,
-                    return_wav=True,
                     infer_step=infer_step,
                     method=method,
                     t_start=t_start,
                 )
-                seg_output *= mask[
-                    :,
-                    start_frame * self.args.data.block_size : (
-                        start_frame + seg_units.size(1)
-                    )
-                    * self.args.data.block_size,
-                ]
-                seg_output = seg_output.squeeze().cpu().numpy()
-
-                silent_length = (
-                    round(start_frame * self.args.data.block_size) - current_length
+                for i, seg_output in zip(bucket, batch_outputs):
+                    seg_outputs[i] = seg_output
+
+            stitcher = SegmentStitcher(
+                SegmentStitcher.estimate_length(
+                    segments, hop_size, self.args.data.block_size
                 )
-                if silent_length >= 0:
-                    result = np.append(result, np.zeros(silent_length))
-                    result = np.append(result, seg_output)
-                else:
-                    result = cross_fade(
-                        result, seg_output, current_length + silent_length
-                    )
-                current_length = current_length + silent_length + len(seg_output)
+            )
+            for segment, seg_output in zip(segments, seg_outputs):
+                start_frame = segment[0]
+                stitcher.add(round(start_frame * self.args.data.block_size), seg_output)
             gc.collect()
             torch.cuda.empty_cache()
-            sf.write("tmp/infer_opt/" + params["hash"] + ".wav", result, sample_rate)
+            sf.write(
+                "tmp/infer_opt/" + params["hash"] + ".wav",
+                stitcher.result(),
+                sample_rate,
+            )
             return "tmp/infer_opt/" + params["hash"] + ".wav"
 
+    def encoder_tag(self):
+        data = self.args.data
+        return (
+            f"{data.encoder}_{data.encoder_ckpt}_"
+            f"{data.encoder_sample_rate}_{data.encoder_hop_size}"
+        )
+
+    def infer_segments(
+        self,
+        segments,
+        audio_hash,
+        f0,
+        volume,
+        mask,
+        sample_rate,
+        hop_size,
+        spk_id,
+        aug_shift,
+        infer_step,
+        method,
+        t_start,
+    ):
+        """
+        一批长度相近的切片逐条取 units（与单条推理一致），补齐后一次性送进
+        reflow 采样器，再按各自的真实长度裁掉补齐部分，返回每个切片的输出音频
+        """
+        block_size = self.args.data.block_size
+        n_frames = [int(len(segment[1]) // hop_size) + 1 for segment in segments]
+
+        seg_units = pad_frames_batch(
+            encode_units_cached(
+                self.units_encoder,
+                segments,
+                audio_hash,
+                self.encoder_tag(),
+                sample_rate,
+                hop_size,
+                self.model_device,
+            ),
+            max(n_frames),
+        )
+        seg_f0 = pad_frames_batch(
+            [f0[:, s : s + n, :] for (s, _), n in zip(segments, n_frames)],
+            seg_units.size(1),
+        )
+        seg_volume = pad_frames_batch(
+            [volume[:, s : s + n, :] for (s, _), n in zip(segments, n_frames)],
+            seg_units.size(1),
+            value=0,
+        )
+
+        seg_output = self.model(
+            seg_units,
+            seg_f0,
+            seg_volume,
+            spk_id=spk_id,
+            spk_mix_dict=None,
+            aug_shift=aug_shift,
+            vocoder=self.vocoder,
+            infer=True,
+            return_wav=True,
+            infer_step=infer_step,
+            method=method,
+            t_start=t_start,
+        )
+
+        outputs = []
+        for i, ((start_frame, _), n) in enumerate(zip(segments, n_frames)):
+            output = seg_output[i : i + 1, : n * block_size]
+            output = (
+                output
+                * mask[:, start_frame * block_size : (start_frame + n) * block_size]
+            )
+            outputs.append(output.squeeze().cpu().numpy())
+        return outputs
+
     def __init__(self) -> None:
         self.infer_form.update(common_infer_form)
         self.infer_form.update(ddsp_based_infer_form)
+        self.infer_form.update(
+            {
+                "infer_batch_size": {
+                    "type": "slider",
+                    "max": 32,
+                    "min": 1,
+                    "default": 1,
+                    "step": 1,
+                    "label": I.ddsp6.infer_batch_size_label,
+                    "info": I.ddsp6.infer_batch_size_info,
+                },
+            }
+        )
 
         self.train_form.update(
             {
@@ -545,4 +604,5 @@ class DDSPModel:
         self.vocoder = None
         self.args = None
         self.units_encoder = None
+        self.units_encoder_key = None
         self.model_device = None
@@ -1,5 +1,4 @@
 import gc
-import hashlib
 import os
 from shutil import rmtree
 from SVCFusion.exec import executable
@@ -10,12 +9,17 @@ import yaml
 
 from SVCFusion.config import YAMLReader, applyChanges
 from SVCFusion.dataset_utils import DrawArgs, auto_normalize_dataset
+from SVCFusion.file import file_hash
 from SVCFusion.i18n import I
 from SVCFusion.model_utils import get_pretrain_models_form_item, load_pretrained
 from .common import common_infer_form, ddsp_based_infer_form, common_preprocess_form
-from ReFlowVaeSVC.main import cross_fade, upsample, split
+from ReFlowVaeSVC.main import split
+from ddspsvc.ddsp.core import volume_gate
+from SVCFusion.segment_utils import SegmentStitcher
+from SVCFusion.feature_cache import FeatureCache, encode_units_cached, feature_cache
 from ReFlowVaeSVC.reflow.vocoder import load_model_vocoder
-from ReFlowVaeSVC.reflow.extractors import F0_Extractor, Volume_Extractor, Units_Encoder
+from ReFlowVaeSVC.reflow.extractors import F0_Extractor, Volume_Extractor
+from SVCFusion.encoder_registry import acquire_units_encoder, encoder_registry
 from ddspsvc.draw import main as draw_main
 from SVCFusion.exec import exec, start_with_cmd
 
@@ -76,9 +80,11 @@ class ReflowVAESVCModel:
         if self.vocoder is not None:
             del self.vocoder
             self.vocoder = None
-        if self.units_encoder is not None:
-            del self.units_encoder
-            self.units_encoder = None
+        if self.units_encoder_key is not None:
+            # 编码器是共享的，只释放本模型的引用
+            encoder_registry.release(self.units_encoder_key)
+            self.units_encoder_key = None
+        self.units_encoder = None
         if self.args is not None:
             del self.args
             self.args = None
@@ -94,27 +100,7 @@ class ReflowVAESVCModel:
     def load_model(self, params):
         device = params["device"]
 
-        # 回收资源
-        if self.model is not None:
-            del self.model
-            self.model = None
-        if self.vocoder is not None:
-            del self.vocoder
-            self.vocoder = None
-        if self.units_encoder is not None:
-            del self.units_encoder
-            self.units_encoder = None
-        if self.args is not None:
-            del self.args
-            self.args = None
-        torch.cuda.empty_cache()
-        gc.collect()
-
-        self.model = None
-        self.vocoder = None
-        self.args = None
-        self.units_encoder = None
-        self.model_device = None
+        self.unload_model()
 
         if device is None:
             device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -124,6 +110,10 @@ class ReflowVAESVCModel:
         )
 
         self.model_device = device
+        # 原来在每次 infer 里重新加载，且 cnhubertsoftfish 时根本没有加载
+        self.units_encoder_key, self.units_encoder = acquire_units_encoder(
+            self.args.data, device
+        )
         config_path = os.path.join(os.path.dirname(params["cascade"]), "config.yaml")
         with YAMLReader(config_path) as config:
             self.spks = config.get("spks", [I.default_spk_name])
@@ -220,24 +210,10 @@ class ReflowVAESVCModel:
             audio = librosa.to_mono(audio)
 
         # get MD5 hash from wav file
-        md5_hash = ""
-        with open(input_file, "rb") as f:
-            data = f.read()
-            md5_hash = hashlib.md5(data).hexdigest()
-            print("MD5: " + md5_hash)
-
-        cache_dir_path = os.path.join("tmp", "f0_cache")
-        cache_file_path = os.path.join(
-            cache_dir_path,
-            f"{f0_extractor}_{hop_size}_{self.args.data.f0_min}_{self.args.data.f0_max}_{md5_hash}.npy",
-        )
+        md5_hash = file_hash(input_file)
+        print("MD5: " + md5_hash)
 
-        is_cache_available = os.path.exists(cache_file_path)
-        if is_cache_available:
-            # f0 cache load
-            print("Loading pitch curves for input audio from cache directory...")
-            f0 = np.load(cache_file_path, allow_pickle=False)
-        else:
+        def extract_f0():
             # extract f0
             print("Pitch extractor type: " + f0_extractor)
             pitch_extractor = F0_Extractor(
@@ -248,14 +224,21 @@ class ReflowVAESVCModel:
                 float(self.args.data.f0_max),
             )
             print("Extracting the pitch curve of the input audio...")
-            f0 = pitch_extractor.extract(
+            return pitch_extractor.extract(
                 audio, uv_interp=True, device=self.model_device
             )
 
-            # f0 cache save
-            os.makedirs(cache_dir_path, exist_ok=True)
-            np.save(cache_file_path, f0, allow_pickle=False)
-
+        f0 = feature_cache.get_or_compute(
+            FeatureCache.make_key(
+                "f0",
+                md5_hash,
+                f0_extractor,
+                hop_size,
+                self.args.data.f0_min,
+                self.args.data.f0_max,
+            ),
+            extract_f0,
+        )
         # key change
         input_f0 = (
             torch.from_numpy(f0)
@@ -275,34 +258,14 @@ class ReflowVAESVCModel:
 
         # source speaker id
         if source_spk_id is None:
-            # load units encoder
-            if self.args.data.encoder == "cnhubertsoftfish":
-                cnhubertsoft_gate = self.args.data.cnhubertsoft_gate
-            else:
-                cnhubertsoft_gate = 10
-                self.units_encoder = Units_Encoder(
-                    self.args.data.encoder,
-                    self.args.data.encoder_ckpt,
-                    self.args.data.encoder_sample_rate,
-                    self.args.data.encoder_hop_size,
-                    cnhubertsoft_gate=cnhubertsoft_gate,
-                    device=self.model_device,
-                )
             # extract volume
             print("Extracting the volume envelope of the input audio...")
             volume_extractor = Volume_Extractor(hop_size)
-            volume = volume_extractor.extract(audio)
-            mask = (volume > 10 ** (float(threhold) / 20)).astype("float")
-            mask = np.pad(mask, (4, 4), constant_values=(mask[0], mask[-1]))
-            mask = np.array([np.max(mask[n : n + 9]) for n in range(len(mask) - 8)])
-            mask = (
-                torch.from_numpy(mask)
-                .float()
-                .to(self.model_device)
-                .unsqueeze(-1)
-                .unsqueeze(0)
+            volume = feature_cache.get_or_compute(
+                FeatureCache.make_key("volume", md5_hash, hop_size),
+                lambda: volume_extractor.extract(audio),
             )
-            mask = upsample(mask, self.args.data.block_size).squeeze(-1)
+            mask = volume_gate(volume, threhold, self.args.data.block_size, self.model_device)
             volume = (
                 torch.from_numpy(volume)
                 .float()
@@ -341,12 +304,20 @@ class ReflowVAESVCModel:
             exit(0)
 
         # forward and save the output
-        result = np.zeros(0)
-        current_length = 0
         segments = split(audio, sample_rate, hop_size)
         print("Cut the input audio into " + str(len(segments)) + " slices")
+        stitcher = SegmentStitcher(
+            SegmentStitcher.estimate_length(
+                segments, hop_size, self.args.data.block_size
+            )
+        )
         with torch.no_grad():
-            for segment in progress.tqdm(segments, I.reflow.infer_tip):
+            pgs = (
+                progress.tqdm(segments, I.reflow.infer_tip)
+                if type(progress) is not type(None)
+                else segments
+            )
+            for segment in pgs:
                 start_frame = segment[0]
                 seg_input = (
                     torch.from_numpy(segment[1])
@@ -355,8 +326,14 @@ class ReflowVAESVCModel:
                     .to(self.model_device)
                 )
                 if source_spk_id is None:
-                    seg_units = self.units_encoder.encode(
-                        seg_input, sample_rate, hop_size
+                    (seg_units,) = encode_units_cached(
+                        self.units_encoder,
+                        [segment],
+                        md5_hash,
+                        self.encoder_tag(),
+                        sample_rate,
+                        hop_size,
+                        self.model_device,
                     )
                     seg_f0 = output_f0[
                         :, start_frame : start_frame + seg_units.size(1), :
@@ -412,22 +389,23 @@ class ReflowVAESVCModel:
 
                 seg_output = seg_output.squeeze().cpu().numpy()
 
-                silent_length = (
-                    round(start_frame * self.args.data.block_size) - current_length
-                )
-                if silent_length >= 0:
-                    result = np.append(result, np.zeros(silent_length))
-                    result = np.append(result, seg_output)
-                else:
-                    result = cross_fade(
-                        result, seg_output, current_length + silent_length
-                    )
-                current_length = current_length + silent_length + len(seg_output)
+                stitcher.add(round(start_frame * self.args.data.block_size), seg_output)
             gc.collect()
             torch.cuda.empty_cache()
-            sf.write("tmp/infer_opt/" + params["hash"] + ".wav", result, sample_rate)
+            sf.write(
+                "tmp/infer_opt/" + params["hash"] + ".wav",
+                stitcher.result(),
+                sample_rate,
+            )
             return "tmp/infer_opt/" + params["hash"] + ".wav"
 
+    def encoder_tag(self):
+        data = self.args.data
+        return (
+            f"{data.encoder}_{data.encoder_ckpt}_"
+            f"{data.encoder_sample_rate}_{data.encoder_hop_size}"
+        )
+
     def __init__(self) -> None:
         self.infer_form.update(common_infer_form)
         self.infer_form.update(ddsp_based_infer_form)
@@ -550,4 +528,5 @@ class ReflowVAESVCModel:
         self.vocoder = None
         self.args = None
         self.units_encoder = None
+        self.units_encoder_key = None
         self.model_device = None
@@ -13,12 +13,14 @@ import time
 
 import torch
 import torchaudio
+from ddspsvc.ddsp.core import resample
 from SoVITS.inference import infer_tool
 from SoVITS.inference.infer_tool import Svc
 from SVCFusion.config import JSONReader, YAMLReader, applyChanges, system_config
 from SVCFusion.const_vars import WORK_DIR_PATH
 from SVCFusion.dataset_utils import auto_normalize_dataset
 from SVCFusion.exec import exec, start_with_cmd
+from SVCFusion.feature_cache import feature_cache
 from SVCFusion.i18n import I
 from SVCFusion.model_utils import get_pretrain_models_form_item, load_pretrained
 from SVCFusion.ui.FormTypes import FormDictInModelClass
@@ -320,6 +322,7 @@ class SoVITSModel:
 
     def unload_model(self):
         if self.svc_model:
+            self.svc_model.unload_model()
             del self.svc_model
         self.svc_model = None
         torch.cuda.empty_cache()
@@ -327,6 +330,7 @@ class SoVITSModel:
 
     def load_model(self, args):
         print(args)
+        self.unload_model()
 
         main_path = args["main"]
         cluster_path = args["cluster"]
@@ -361,6 +365,9 @@ class SoVITSModel:
             only_diffusion=args["only_diffusion"],
             spk_mix_enable=False,
             feature_retrieval=args["feature_retrieval"],
+            feature_cache=feature_cache,
+            retrieval_k=int(system_config.sovits.feature_retrieval_k),
+            retrieval_nprobe=int(system_config.sovits.feature_retrieval_nprobe),
         )
 
         with JSONReader(os.path.dirname(main_path) + "/config.json") as config:
@@ -467,13 +474,11 @@ class SoVITSModel:
 
     def infer(self, params, progress=gr.Progress()):
         wf, sr = torchaudio.load(params["audio"])
-        # 重采样到单声道44100hz 保存到 tmp/时间戳_md5前3位.wav
-        resampled_filename = f"tmp/{int(time.time())}.wav"
+        # 重采样到单声道44100hz 保存到 tmp/时间戳_hash.wav，并发推理时文件名不冲突
+        resampled_filename = f"tmp/{int(time.time())}_{params['hash']}.wav"
         torchaudio.save(
             uri=resampled_filename,
-            src=torchaudio.functional.resample(
-                waveform=wf, orig_freq=sr, new_freq=44100
-            ),
+            src=resample(wf, sr, 44100),
             sample_rate=44100,
         )
 
@@ -500,9 +505,6 @@ class SoVITSModel:
             "loudness_envelope_adjustment": 1,
         }
         infer_tool.format_wav(params["audio"])
-        self.svc_model.audio16k_resample_transform = torchaudio.transforms.Resample(
-            self.svc_model.target_sample, 16000
-        ).to(self.svc_model.dev)
         audio = self.svc_model.slice_inference(**kwarg)
         gc.collect()
         torch.cuda.empty_cache()
@@ -0,0 +1,108 @@
+import numpy as np
+import torch
+
+
+def bucket_segments(segments, batch_size, max_pad_ratio=0.1):
+    """
+    把 split 切出来的片段按长度分桶，返回每个桶的片段下标
+
+    同一桶里最长的片段不超过最短片段的 (1 + max_pad_ratio) 倍，
+    这样 pad 成一个 batch 时浪费的算力最少。batch_size 为 1 时退化为逐条推理
+    """
+    order = sorted(range(len(segments)), key=lambda i: len(segments[i][1]))
+    buckets = []
+    bucket = []
+    for i in order:
+        if bucket and (
+            len(bucket) >= batch_size
+            or len(segments[i][1])
+            > len(segments[bucket[0]][1]) * (1 + max_pad_ratio)
+        ):
+            buckets.append(bucket)
+            bucket = []
+        bucket.append(i)
+    if bucket:
+        buckets.append(bucket)
+    return buckets
+
+
+def pad_frames_batch(frames, n_frames, value=None):
+    """
+    把一组 1 x n_i x C 的帧序列 pad 到 B x n_frames x C
+
+    value 为 None 时重复最后一帧（用于 f0），否则用常数填充（用于音量）
+    """
+    result = []
+    for x in frames:
+        pad_len = n_frames - x.size(1)
+        if pad_len > 0:
+            if value is None:
+                tail = x[:, -1:, :].expand(-1, pad_len, -1)
+            else:
+                tail = torch.full(
+                    (x.size(0), pad_len, x.size(2)),
+                    value,
+                    dtype=x.dtype,
+                    device=x.device,
+                )
+            x = torch.cat((x, tail), 1)
+        result.append(x[:, :n_frames, :])
+    return torch.cat(result, 0)
+
+
+class SegmentStitcher:
+    """
+    把各切片的输出写进一块预分配的 float32 缓冲区，重叠部分原地做线性交叉淡化
+
+    行为与 ``cross_fade`` + ``np.append`` 的拼接方式一致，但不会每个切片都重新分配整段结果
+    """
+
+    def __init__(self, length=0):
+        self.buffer = np.zeros(max(int(length), 0), dtype=np.float32)
+        self.current_length = 0
+
+    @staticmethod
+    def estimate_length(segments, hop_size, block_size):
+        # 按切片的起始帧和帧数预估最终长度
+        length = 0
+        for start_frame, audio in segments:
+            n_frames = int(len(audio) // hop_size) + 1
+            length = max(
+                length, round(start_frame * block_size) + n_frames * block_size
+            )
+        return length
+
+    def _reserve(self, length):
+        if length <= len(self.buffer):
+            return
+        buffer = np.zeros(max(length, 2 * len(self.buffer)), dtype=np.float32)
+        buffer[: self.current_length] = self.buffer[: self.current_length]
+        self.buffer = buffer
+
+    def add(self, start, segment):
+        end = start + len(segment)
+        self._reserve(end)
+        if start >= self.current_length:
+            # 中间的空隙在缓冲区里本来就是 0
+            self.buffer[start:end] = segment
+        else:
+            fade_end = min(self.current_length, end)
+            fade_len = fade_end - start
+            k = np.linspace(0, 1.0, num=fade_len, endpoint=True, dtype=np.float32)
+            fade = self.buffer[start:fade_end]
+            fade *= 1 - k
+            fade += k * segment[:fade_len]
+            self.buffer[fade_end:end] = segment[fade_len:]
+            if end < self.current_length:
+                self.buffer[end : self.current_length] = 0
+        self.current_length = end
+
+    def result(self):
+        return self.buffer[: self.current_length]
+
+
+__all__ = [
+    "SegmentStitcher",
+    "bucket_segments",
+    "pad_frames_batch",
+]
@@ -3,6 +3,7 @@ from SVCFusion.i18n import I
 from SVCFusion.config import system_config
 from SVCFusion.locale import text_to_locale
 from SVCFusion.ui.Form import Form
+from SVCFusion.uvr import msst_registry
 
 import gradio as gr
 
@@ -53,7 +54,25 @@ class Settings:
                         "label": I.settings.sovits.resolve_port_clash_label,
                         "info": I.settings.sovits.resolve_port_clash_label,
                         "default": lambda: system_config.sovits.resolve_port_clash,
-                    }
+                    },
+                    "feature_retrieval_k": {
+                        "type": "slider",
+                        "label": I.settings.sovits.feature_retrieval_k_label,
+                        "info": I.settings.sovits.feature_retrieval_k_info,
+                        "max": 32,
+                        "min": 1,
+                        "step": 1,
+                        "default": lambda: system_config.sovits.feature_retrieval_k,
+                    },
+                    "feature_retrieval_nprobe": {
+                        "type": "slider",
+                        "label": I.settings.sovits.feature_retrieval_nprobe_label,
+                        "info": I.settings.sovits.feature_retrieval_nprobe_info,
+                        "max": 64,
+                        "min": 1,
+                        "step": 1,
+                        "default": lambda: system_config.sovits.feature_retrieval_nprobe,
+                    },
                 },
                 "callback": self.get_save_config_fn("sovits"),
             },
@@ -90,7 +109,25 @@ class Settings:
                     "msst_device": {
                         "type": "device_chooser",
                         "info": I.settings.infer.msst_device_label,
-                    }
+                    },
+                    "feature_cache_size": {
+                        "type": "slider",
+                        "label": I.settings.infer.feature_cache_size_label,
+                        "info": I.settings.infer.feature_cache_size_info,
+                        "max": 65536,
+                        "min": 0,
+                        "step": 128,
+                        "default": lambda: system_config.infer.feature_cache_size,
+                    },
+                    "msst_cache_size": {
+                        "type": "slider",
+                        "label": I.settings.infer.msst_cache_size_label,
+                        "info": I.settings.infer.msst_cache_size_info,
+                        "max": 32768,
+                        "min": 0,
+                        "step": 256,
+                        "default": lambda: system_config.infer.msst_cache_size,
+                    },
                 },
                 "callback": self.get_save_config_fn("infer"),
             },
@@ -108,3 +145,11 @@ class Settings:
             models=self.form,
             submit_btn_text=I.settings.save_btn_value,
         )
+
+        unload_msst_btn = gr.Button(I.settings.infer.unload_msst_btn_value)
+        unload_msst_btn.click(self.unload_msst_models)
+
+    def unload_msst_models(self):
+        loaded = msst_registry.loaded()
+        msst_registry.unload()
+        gr.Info(I.settings.infer.unloaded_msst_tip.replace("{1}", str(len(loaded))))
@@ -7,7 +7,7 @@ import gradio as gr
 from fap.utils.file import AUDIO_EXTENSIONS
 from SVCFusion.i18n import I
 from SVCFusion.ui.Form import Form
-from SVCFusion.uvr import getVocalAndInstrument
+from SVCFusion.uvr import getVocalAndInstrument, getVocalAndInstrumentBatch
 
 
 class VocalSeparation:
@@ -68,6 +68,25 @@ class VocalSeparation:
         error_files = []
         no_support_files = []
         success_files = []
+
+        audio_files = [
+            item
+            for item in os.listdir(input_path)
+            if os.path.isfile(os.path.join(input_path, item))
+            and Path(item.lower()).suffix in AUDIO_EXTENSIONS
+        ]
+        try:
+            # 所有文件一起分离，下面逐个处理时直接命中缓存
+            getVocalAndInstrumentBatch(
+                [os.path.join(input_path, item) for item in audio_files],
+                True,
+                use_de_reverb,
+                use_harmonic_remove,
+                progress,
+            )
+        except Exception as e:
+            print_exception(e)
+
         for item in progress.tqdm(
             os.listdir(input_path), desc=I.vocal_separation.batch_progress_desc
         ):
@@ -81,6 +100,7 @@ class VocalSeparation:
                 if Path(item_path.lower()).suffix in AUDIO_EXTENSIONS:
                     vocal, inst = getVocalAndInstrument(
                         os.path.join(input_path, item),
+                        True,
                         use_de_reverb,
                         use_harmonic_remove,
                         progress,
@@ -1,15 +1,19 @@
 import gc
-import hashlib
+import threading
+from collections import OrderedDict
 import os
 from pathlib import Path
 import traceback
 import gradio as gr
+import soundfile as sf
 
 from Music_Source_Separation_Training import inference as msst_inference
+from Music_Source_Separation_Training.utils import get_model_from_config
 
 from SoVITS import logger
 import torch
 from SVCFusion.config import system_config
+from SVCFusion.file import file_hash
 from SVCFusion.i18n import I
 from vr import AudioPre, AudioPreDeEcho
 
@@ -95,17 +99,6 @@ def uvr(
             torch.cuda.empty_cache()
 
 
-class MSSTArgs:
-    input_folder = None
-    store_dir = None
-    model_type = None
-
-    def __init__(self, input_folder, store_dir, model_type) -> None:
-        self.input_folder = input_folder
-        self.store_dir = store_dir
-        self.model_type = model_type
-
-
 model_type_to_info = {
     "bs_roformer": {
         "config": "Music_Source_Separation_Training/configs/model_bs_roformer_ep_368_sdr_12.9628.yaml",
@@ -134,6 +127,9 @@ model_type_to_info = {
     },
 }
 
+# 批量分离时一组歌曲的总时长上限（秒），一组的所有分轨会同时留在内存里
+MAX_GROUP_SECONDS = 30 * 60
+
 job_to_model_type = {
     "vocal": "bs_roformer",
     "kim_vocal": "kim_vocals_mel_band_roformer",
@@ -142,64 +138,109 @@ job_to_model_type = {
 }
 
 
-def run_msst(
-    inp_path,
-    inp_hash,
-    vocal_opt_path,
-    inst_opt_path,
-    progress=gr.Progress(track_tqdm=True),
-    real_type="bs_roformer",
-    model_type="bs_roformer",
-    progress_desc: str = "",
-    save_inst=True,
-):
-    vocal_path = f"./tmp/msst_opt/{inp_hash}_Vocals.wav"
-    inst_path = f"./tmp/msst_opt/{inp_hash}_Instrument.wav"
-
-    args = MSSTArgs(
-        input_folder=inp_path,
-        store_dir=f"./tmp/msst_opt/{inp_hash}",
-        model_type="bs_roformer",
-    )
-    msst_model, bsroformer_config = msst_inference.get_model_from_config(
-        real_type,
-        model_type_to_info[model_type]["config"],
-    )
-    model_path = model_type_to_info[model_type]["model"]
-    print("Start from checkpoint: {}".format(model_path))
-
-    if torch.cuda.is_available():
-        device = torch.device(system_config.infer.msst_device)
-    else:
+class MSSTModelRegistry:
+    """
+    分离模型常驻缓存
+
+    按 (model_type, device) 缓存已经加载好的模型，显存/内存占用超过 msst_cache_size (MB)
+    时按最近最少使用淘汰。msst_cache_size 为 0 时用完即卸载，与旧行为一致
+    """
+
+    def __init__(self):
+        self.models = OrderedDict()
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def get_device():
+        if torch.cuda.is_available():
+            return torch.device(system_config.infer.msst_device)
         logger.info(
             "CUDA is not avilable. Run inference on CPU. It will be very slow..."
         )
-        device = torch.device("cpu")
-
-    state_dict = torch.load(model_path, map_location=device)
-    if args.model_type == "htdemucs":
-        # Fix for htdemucs pround etrained models
-        if "state" in state_dict:
-            state_dict = state_dict["state"]
-    msst_model.load_state_dict(state_dict)
-    msst_model.to(device)
-
-    msst_inference.run_folder(
-        model=msst_model,
-        args=args,
-        vocal_opt_path=vocal_opt_path,
-        inst_opt_path=inst_opt_path,
-        config=bsroformer_config,
-        device=device,
-        progress=progress,
-        save_inst=save_inst,
-        progress_desc=progress_desc,
-    )
-    del msst_model
-    torch.cuda.empty_cache()
-    gc.collect()
+        return torch.device("cpu")
+
+    @staticmethod
+    def model_size(model):
+        return sum(
+            t.numel() * t.element_size()
+            for t in list(model.parameters()) + list(model.buffers())
+        )
+
+    @staticmethod
+    def budget():
+        return int(float(system_config.infer.msst_cache_size) * 1024 * 1024)
+
+    def load(self, real_type, model_type, device):
+        msst_model, config = get_model_from_config(
+            real_type,
+            model_type_to_info[model_type]["config"],
+        )
+        model_path = model_type_to_info[model_type]["model"]
+        print("Start from checkpoint: {}".format(model_path))
+
+        state_dict = torch.load(model_path, map_location=device)
+        if real_type == "htdemucs":
+            # Fix for htdemucs pround etrained models
+            if "state" in state_dict:
+                state_dict = state_dict["state"]
+        msst_model.load_state_dict(state_dict)
+        msst_model.to(device)
+        msst_model.eval()
+        return msst_model, config
+
+    def get(self, real_type, model_type, device=None):
+        if device is None:
+            device = self.get_device()
+        key = (model_type, str(device))
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                model, config, _ = self.models[key]
+                return model, config, device
+
+            model, config = self.load(real_type, model_type, device)
+            self.models[key] = (model, config, self.model_size(model))
+            self.evict(keep=key)
+            return model, config, device
+
+    def release(self, model_type):
+        # 预算为 0 时不常驻
+        if self.budget() <= 0:
+            self.unload(model_type)
+
+    def evict(self, keep=None):
+        budget = self.budget()
+        total = sum(size for _, _, size in self.models.values())
+        evicted = False
+        for key in list(self.models.keys()):
+            if total <= budget:
+                break
+            if key == keep:
+                continue
+            total -= self.models.pop(key)[2]
+            evicted = True
+        if evicted:
+            self.free_memory()
+
+    def unload(self, model_type=None):
+        """卸载指定类型的模型，不传则全部卸载"""
+        with self.lock:
+            for key in list(self.models.keys()):
+                if model_type is None or key[0] == model_type:
+                    del self.models[key]
+            self.free_memory()
+
+    def loaded(self):
+        with self.lock:
+            return [key[0] for key in self.models]
 
-    return vocal_path, inst_path
+    @staticmethod
+    def free_memory():
+        gc.collect()
+        torch.cuda.empty_cache()
+
+
+msst_registry = MSSTModelRegistry()
 
 
 def getVocalAndInstrument(
@@ -208,8 +249,54 @@ def getVocalAndInstrument(
     use_de_reverb=True,
     use_harmonic_remove=True,
     progress=gr.Progress(),
+    subtype="FLOAT",
+):
+    """
+    按 kim_vocal -> deverb -> karaoke 的顺序串联分离
+
+    各阶段之间直接传递内存里的张量，只把最终人声和 kim_vocal 阶段的伴奏写盘，
+    subtype 默认 FLOAT，即按 float32 原样写出不再量化
+    """
+    return getVocalAndInstrumentBatch(
+        [inp_path],
+        use_vocal_fetch=use_vocal_fetch,
+        use_de_reverb=use_de_reverb,
+        use_harmonic_remove=use_harmonic_remove,
+        progress=progress,
+        subtype=subtype,
+    )[0]
+
+
+def group_by_duration(paths, max_seconds):
+    """按顺序把音频分组，每组总时长不超过 max_seconds（单个超长的自成一组）"""
+    groups = []
+    total = 0
+    for k, path in paths:
+        duration = msst_inference.mixture_duration(path)
+        if not groups or total + duration > max_seconds:
+            groups.append([])
+            total = 0
+        groups[-1].append(k)
+        total += duration
+    return groups
+
+
+def getVocalAndInstrumentBatch(
+    inp_paths,
+    use_vocal_fetch=True,
+    use_de_reverb=True,
+    use_harmonic_remove=True,
+    progress=gr.Progress(),
+    subtype="FLOAT",
+    max_group_seconds=MAX_GROUP_SECONDS,
 ):
-    inp_hash = hashlib.md5(inp_path.encode()).hexdigest()
+    """
+    getVocalAndInstrument 的批量版本，返回每个输入的 (人声路径, 伴奏路径)
+
+    每组歌曲的切块一起拼 batch 送进模型，短歌不会让 batch 空着；
+    一组的总时长不超过 max_group_seconds，整组跑完写盘后再开始下一组，内存不随队列长度增长
+    """
+    inp_hashes = [file_hash(inp_path) for inp_path in inp_paths]
 
     jobs = []
     if use_vocal_fetch:
@@ -219,24 +306,75 @@ def getVocalAndInstrument(
     if use_harmonic_remove:
         jobs.append("karaoke")
 
-    vocal_path = f"./tmp/msst_opt/vocal/{inp_hash}_Vocals.wav"
-    inst_path = f"./tmp/msst_opt/kim_vocal/{inp_hash}_Instrument.wav"
-    real_inst_path = inst_path
-    last_vocal = inp_path
-    for job in jobs:
-        vocal_path = f"./tmp/msst_opt/{job}/{inp_hash}_Vocals.wav"
-        inst_path = f"./tmp/msst_opt/{job}/{inp_hash}_Instrument.wav"
-        if not os.path.exists(vocal_path) and not os.path.exists(inst_path):
-            run_msst(
-                inp_path=last_vocal,
-                inp_hash=inp_hash,
-                vocal_opt_path=vocal_path,
-                inst_opt_path=inst_path,
+    def get_vocal_path(inp_hash, index):
+        # 同一阶段的结果还取决于它前面跑过哪些阶段
+        chain = "_".join(jobs[: index + 1])
+        return f"./tmp/msst_opt/{chain}/{inp_hash}_Vocals.wav"
+
+    def get_inst_path(inp_hash):
+        return f"./tmp/msst_opt/kim_vocal/{inp_hash}_Instrument.wav"
+
+    if not jobs:
+        return [(p, get_inst_path(h)) for p, h in zip(inp_paths, inp_hashes)]
+
+    def get_resume(inp_hash):
+        # 从后往前找已经有缓存的阶段，从它之后接着算
+        for index in range(len(jobs) - 1, -1, -1):
+            if os.path.exists(get_vocal_path(inp_hash, index)) and (
+                "kim_vocal" not in jobs[: index + 1]
+                or os.path.exists(get_inst_path(inp_hash))
+            ):
+                return index
+        return -1
+
+    resumes = [get_resume(inp_hash) for inp_hash in inp_hashes]
+    pending = [
+        (k, inp_paths[k]) for k, resume in enumerate(resumes) if resume < len(jobs) - 1
+    ]
+    for group in group_by_duration(pending, max_group_seconds):
+        current = {}
+        for index, job in enumerate(jobs):
+            todo = [k for k in group if resumes[k] < index]
+            if not todo:
+                continue
+            for k in todo:
+                if k not in current:
+                    current[k] = msst_inference.load_mixture(
+                        get_vocal_path(inp_hashes[k], resumes[k])
+                        if resumes[k] >= 0
+                        else inp_paths[k]
+                    )
+
+            model_type = job_to_model_type[job]
+            real_type = model_type_to_info[model_type]["real_type"]
+            msst_model, config, device = msst_registry.get(real_type, model_type)
+            outputs = msst_inference.separate_mixtures(
+                msst_model,
+                [current[k] for k in todo],
+                config,
+                device,
+                real_type,
                 progress=progress,
-                real_type=model_type_to_info[job_to_model_type[job]]["real_type"],
-                model_type=job_to_model_type[job],
                 progress_desc=I.vocal_separation.job_to_progress_desc[job],
             )
-        last_vocal = vocal_path
-    print("result", vocal_path, real_inst_path)
-    return vocal_path, real_inst_path
+            msst_registry.release(model_type)
+
+            for k, res in zip(todo, outputs):
+                current[k], inst = list(res.values())[-1]
+                if job == "kim_vocal":
+                    inst_path = get_inst_path(inp_hashes[k])
+                    os.makedirs(os.path.dirname(inst_path), exist_ok=True)
+                    sf.write(inst_path, inst.numpy().T, 44100, subtype=subtype)
+            del outputs
+
+        for k in group:
+            vocal_path = get_vocal_path(inp_hashes[k], len(jobs) - 1)
+            os.makedirs(os.path.dirname(vocal_path), exist_ok=True)
+            sf.write(vocal_path, current.pop(k).numpy().T, 44100, subtype=subtype)
+
+    result = []
+    for inp_hash in inp_hashes:
+        vocal_path = get_vocal_path(inp_hash, len(jobs) - 1)
+        print("result", vocal_path, get_inst_path(inp_hash))
+        result.append((vocal_path, get_inst_path(inp_hash)))
+    return result
@@ -1,32 +1,70 @@
+import numpy as np
 import torch
-from sklearn.cluster import KMeans
 
 
-def get_cluster_model(ckpt_path):
-    checkpoint = torch.load(ckpt_path)
-    kmeans_dict = {}
-    for spk, ckpt in checkpoint.items():
-        km = KMeans(ckpt["n_features_in_"])
-        km.__dict__["n_features_in_"] = ckpt["n_features_in_"]
-        km.__dict__["_n_threads"] = ckpt["_n_threads"]
-        km.__dict__["cluster_centers_"] = ckpt["cluster_centers_"]
-        kmeans_dict[spk] = km
-    return kmeans_dict
+class ClusterModel:
+    """
+    按说话人保存的 kmeans 聚类中心，常驻在推理设备上
+
+    最近中心用 ||c||^2 - 2 x·c 的矩阵乘法求，特征不用再拷回 CPU 交给 sklearn
+    """
+
+    def __init__(self, centers, device="cpu", chunk_size=4096):
+        self.device = torch.device(device)
+        self.chunk_size = chunk_size
+        self.centers = {}
+        self.center_norms = {}
+        for spk, c in centers.items():
+            c = torch.as_tensor(np.asarray(c), dtype=torch.float32).to(self.device)
+            self.centers[spk] = c
+            self.center_norms[spk] = (c * c).sum(1)
+
+    def predict(self, x, speaker):
+        """
+        x: torch.Tensor [t, C]
+        return 每帧最近的聚类中心下标 [t]
+        """
+        centers = self.centers[speaker]
+        norms = self.center_norms[speaker]
+        x = x.to(self.device, torch.float32)
+        labels = [
+            torch.argmin(norms - 2 * (x[i : i + self.chunk_size] @ centers.T), dim=1)
+            for i in range(0, x.shape[0], self.chunk_size)
+        ]
+        if not labels:
+            return torch.zeros(0, dtype=torch.long, device=self.device)
+        return torch.cat(labels)
+
+    def center_result(self, x, speaker):
+        return self.centers[speaker][self.predict(x, speaker)]
+
+
+def get_cluster_model(ckpt_path, device="cpu"):
+    checkpoint = torch.load(ckpt_path, map_location="cpu")
+    return ClusterModel(
+        {spk: ckpt["cluster_centers_"] for spk, ckpt in checkpoint.items()}, device
+    )
+
+
+def _apply(fn, x):
+    # 兼容旧的 numpy 输入输出
+    if isinstance(x, np.ndarray):
+        return fn(torch.from_numpy(x)).cpu().numpy()
+    return fn(x)
 
 
 def get_cluster_result(model, x, speaker):
     """
-    x: np.array [t, 256]
+    x: np.array or torch.Tensor [t, 256]
     return cluster class result
     """
-    return model[speaker].predict(x)
+    return _apply(lambda x: model.predict(x, speaker), x)
 
 
 def get_cluster_center_result(model, x, speaker):
-    """x: np.array [t, 256]"""
-    predict = model[speaker].predict(x)
-    return model[speaker].cluster_centers_[predict]
+    """x: np.array or torch.Tensor [t, 256]"""
+    return _apply(lambda x: model.center_result(x, speaker), x)
 
 
 def get_center(model, x, speaker):
-    return model[speaker].cluster_centers_[x]
+    return _apply(lambda x: model.centers[speaker][x.to(model.device)], x)
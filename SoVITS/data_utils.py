@@ -1,9 +1,13 @@
+import json
+import math
 import os
 import random
 
 import numpy as np
 import torch
 import torch.utils.data
+from scipy.io.wavfile import read
+from torch.nn.utils.rnn import pad_sequence
 
 from SoVITS.modules.mel_processing import spectrogram_torch
 from SoVITS.utils import load_filepaths_and_text, load_wav_to_torch
@@ -15,6 +19,14 @@ from . import utils
 
 """Multi speaker version"""
 
+# random_slice 只保留这么多帧，分桶时按截断后的长度算
+MAX_SLICE_FRAMES = 800
+SLICE_FRAMES = 790
+
+
+def slice_frames(n_frames):
+    return SLICE_FRAMES if n_frames > MAX_SLICE_FRAMES else n_frames
+
 
 class TextAudioSpeakerLoader(torch.utils.data.Dataset):
     """
@@ -128,9 +140,9 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
                 center=False,
             )[0]
 
-        if spec.shape[1] > 800:
-            start = random.randint(0, spec.shape[1] - 800)
-            end = start + 790
+        if spec.shape[1] > MAX_SLICE_FRAMES:
+            start = random.randint(0, spec.shape[1] - MAX_SLICE_FRAMES)
+            end = start + SLICE_FRAMES
             spec, c, f0, uv = (
                 spec[:, start:end],
                 c[:, start:end],
@@ -151,60 +163,311 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
     def __len__(self):
         return len(self.audiopaths)
 
+    def get_frame_lengths(self):
+        """
+        每条数据 random_slice 之后的帧数，给 DistributedBucketSampler 分桶用
 
-class TextAudioCollate:
-    def __call__(self, batch):
-        batch = [b for b in batch if b is not None]
+        只读 wav 头，不加载特征
+        """
+        lengths = []
+        for p in self.audiopaths:
+            _, data = read(p[0].replace("\\", "/"), mmap=True)
+            lengths.append(slice_frames(len(data) // self.hop_length))
+            del data
+        return lengths
+
+
+SHARD_VERSION = 1
+
+
+def get_shard_dir(filelist):
+    return os.path.splitext(filelist)[0] + "_shards"
+
+
+def pack_feature_shards(filelist, hparams, shard_dir=None):
+    """
+    把 filelist 里逐文件存放的 wav/.spec.pt/.soft.pt/.f0.npy/.vol.npy 打包成每个说话人一组 shard
 
-        input_lengths, ids_sorted_decreasing = torch.sort(
-            torch.LongTensor([x[0].shape[1] for x in batch]), dim=0, descending=True
+    每个字段一个 float32 的 {spk}.{field}.bin，按帧首尾相接（spec/units 为 帧 x 维度，
+    audio 为 帧数 * hop 个采样点）；units 已经按 f0 长度对齐，所有字段已裁到相同帧数。
+    每条数据的偏移写在 index.json 里
+    """
+    shard_dir = shard_dir or get_shard_dir(filelist)
+    os.makedirs(shard_dir, exist_ok=True)
+    loader = TextAudioSpeakerLoader(filelist, hparams, vol_aug=False)
+    filenames = [p[0].replace("\\", "/") for p in load_filepaths_and_text(filelist)]
+
+    files = {}
+    dims = {}
+    n_frames = {}
+    items = []
+    try:
+        for filename in filenames:
+            c, f0, spec, audio_norm, _, uv, volume = loader.get_audio(filename)
+            spk = filename.split("/")[-2]
+            fields = {
+                "audio": audio_norm[0],
+                "spec": spec.T,
+                "units": c.T,
+                "f0": f0,
+                "uv": uv,
+                "volume": volume,
+            }
+            if spk not in files:
+                files[spk] = {
+                    field: open(os.path.join(shard_dir, f"{spk}.{field}.bin"), "wb")
+                    for field, data in fields.items()
+                    if data is not None
+                }
+                n_frames[spk] = 0
+            for field, data in fields.items():
+                if data is None:
+                    continue
+                data = data.detach().cpu().numpy().astype(np.float32)
+                dims[field] = list(data.shape[1:])
+                files[spk][field].write(np.ascontiguousarray(data).tobytes())
+            items.append([filename, spk, n_frames[spk], int(f0.shape[0])])
+            n_frames[spk] += int(f0.shape[0])
+    finally:
+        for spk_files in files.values():
+            for f in spk_files.values():
+                f.close()
+
+    index = {
+        "version": SHARD_VERSION,
+        "hop_length": hparams.data.hop_length,
+        "dims": dims,
+        "shards": n_frames,
+        "items": items,
+    }
+    with open(os.path.join(shard_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    return shard_dir
+
+
+def _is_newer(path, timestamp):
+    try:
+        return os.path.getmtime(path) > timestamp
+    except OSError:
+        # 打包后删掉原文件也可以
+        return False
+
+
+def load_shard_index(filelist, hparams):
+    """
+    shard 存在且与 filelist、hop_length 一致，并且没有比它更新的特征文件时返回 index，否则返回 None
+    """
+    path = os.path.join(get_shard_dir(filelist), "index.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        index = json.load(f)
+    filenames = [p[0].replace("\\", "/") for p in load_filepaths_and_text(filelist)]
+    if (
+        index.get("version") != SHARD_VERSION
+        or index["hop_length"] != hparams.data.hop_length
+        or [item[0] for item in index["items"]] != filenames
+        or (hparams.model.vol_embedding and "volume" not in index["dims"])
+    ):
+        return None
+    packed_at = os.path.getmtime(path)
+    for filename in filenames:
+        if any(
+            _is_newer(p, packed_at)
+            for p in (
+                filename,
+                filename.replace(".wav", ".spec.pt"),
+                filename + ".soft.pt",
+                filename + ".f0.npy",
+                filename + ".vol.npy",
+            )
+        ):
+            return None
+    return index
+
+
+class ShardedAudioSpeakerLoader(TextAudioSpeakerLoader):
+    """
+    从 pack_feature_shards 打包好的 shard 读数据，每条只是在 np.memmap 上切片
+
+    不再逐条打开五个文件、反序列化 f0，也不用每次重新对齐 units；
+    各个 DataLoader worker 共享系统的页缓存，不用像 all_in_mem 那样各自拷贝一份
+    """
+
+    def __init__(self, audiopaths, hparams, index=None, vol_aug: bool = True):
+        super().__init__(audiopaths, hparams, all_in_mem=False, vol_aug=vol_aug)
+        self.shard_dir = get_shard_dir(audiopaths)
+        index = index or load_shard_index(audiopaths, hparams)
+        if index is None:
+            raise ValueError(f"No up-to-date feature shards for {audiopaths}")
+        self.dims = index["dims"]
+        self.shard_frames = index["shards"]
+        # 与 TextAudioSpeakerLoader 一样按固定种子打乱
+        self.items = index["items"]
+        random.seed(1234)
+        random.shuffle(self.items)
+        self._shards = {}
+
+    def __getstate__(self):
+        # memmap 不随 dataset 一起 pickle 给 worker，由各 worker 自己打开
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
+
+    def _shard(self, spk, field):
+        key = (spk, field)
+        if key not in self._shards:
+            n = self.shard_frames[spk]
+            if field == "audio":
+                n *= self.hop_length
+            self._shards[key] = np.memmap(
+                os.path.join(self.shard_dir, f"{spk}.{field}.bin"),
+                dtype=np.float32,
+                mode="r",
+                shape=(n, *self.dims[field]),
+            )
+        return self._shards[key]
+
+    def get_item(self, index):
+        _, spk, offset, n_frames = self.items[index]
+        end = offset + n_frames
+
+        def frames(field):
+            return torch.from_numpy(np.array(self._shard(spk, field)[offset:end]))
+
+        audio_norm = torch.from_numpy(
+            np.array(
+                self._shard(spk, "audio")[
+                    offset * self.hop_length : end * self.hop_length
+                ]
+            )
+        ).unsqueeze(0)
+        volume = frames("volume") if self.vol_emb else None
+        return (
+            frames("units").T.contiguous(),
+            frames("f0"),
+            frames("spec").T.contiguous(),
+            audio_norm,
+            torch.LongTensor([self.spk_map[spk]]),
+            frames("uv"),
+            volume,
         )
 
-        max_c_len = max([x[0].size(1) for x in batch])
-        max_wav_len = max([x[3].size(1) for x in batch])
+    def __getitem__(self, index):
+        return self.random_slice(*self.get_item(index))
+
+    def __len__(self):
+        return len(self.items)
 
-        lengths = torch.LongTensor(len(batch))
+    def get_frame_lengths(self):
+        return [slice_frames(item[3]) for item in self.items]
 
-        c_padded = torch.FloatTensor(len(batch), batch[0][0].shape[0], max_c_len)
-        f0_padded = torch.FloatTensor(len(batch), max_c_len)
-        spec_padded = torch.FloatTensor(len(batch), batch[0][2].shape[0], max_c_len)
-        wav_padded = torch.FloatTensor(len(batch), 1, max_wav_len)
-        spkids = torch.LongTensor(len(batch), 1)
-        uv_padded = torch.FloatTensor(len(batch), max_c_len)
-        volume_padded = torch.FloatTensor(len(batch), max_c_len)
 
-        c_padded.zero_()
-        spec_padded.zero_()
-        f0_padded.zero_()
-        wav_padded.zero_()
-        uv_padded.zero_()
-        volume_padded.zero_()
+class DistributedBucketSampler(torch.utils.data.Sampler):
+    """
+    按帧数分桶的 batch sampler，同一个 batch 里的数据长度相近，补零少
+
+    每个 epoch 用 seed + epoch 打乱后切成若干个窗口，窗口内按长度排序切出全局 batch
+    （batch_size * num_replicas 条），每张卡取其中连续的一段，各卡同一步的长度也相近。
+    最后打乱 batch 顺序。多卡时每张卡得到的 batch 数相同，不足的从开头补齐
+    """
 
-        for i in range(len(ids_sorted_decreasing)):
-            row = batch[ids_sorted_decreasing[i]]
+    def __init__(
+        self,
+        lengths,
+        batch_size,
+        num_replicas=None,
+        rank=None,
+        shuffle=True,
+        seed=0,
+        bucket_batches=32,
+    ):
+        if num_replicas is None:
+            num_replicas = (
+                torch.distributed.get_world_size()
+                if torch.distributed.is_initialized()
+                else 1
+            )
+        if rank is None:
+            rank = (
+                torch.distributed.get_rank()
+                if torch.distributed.is_initialized()
+                else 0
+            )
+        self.lengths = torch.as_tensor(lengths, dtype=torch.long)
+        self.batch_size = batch_size
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.shuffle = shuffle
+        self.seed = seed
+        self.bucket_batches = bucket_batches
+        self.epoch = 0
+        self.global_batch_size = batch_size * num_replicas
+        self.num_batches = math.ceil(len(self.lengths) / self.global_batch_size)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _global_batches(self):
+        g = torch.Generator()
+        g.manual_seed(self.seed + self.epoch)
+        n = len(self.lengths)
+        if self.shuffle:
+            indices = torch.randperm(n, generator=g)
+        else:
+            indices = torch.arange(n)
+        # 补齐到 global_batch_size 的整数倍，每张卡拿到的 batch 数、batch 大小都一样
+        total = self.num_batches * self.global_batch_size
+        if total > n:
+            indices = torch.cat([indices, indices.repeat(math.ceil(total / n))])[:total]
+
+        window = self.global_batch_size * self.bucket_batches
+        batches = []
+        for i in range(0, total, window):
+            chunk = indices[i : i + window]
+            # 稳定排序，等长的数据保持打乱后的顺序
+            chunk = chunk[torch.sort(self.lengths[chunk], stable=True).indices]
+            batches.extend(chunk.split(self.global_batch_size))
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches), generator=g)]
+        return batches
+
+    def __iter__(self):
+        start = self.rank * self.batch_size
+        for batch in self._global_batches():
+            yield batch[start : start + self.batch_size].tolist()
 
-            c = row[0]
-            c_padded[i, :, : c.size(1)] = c
-            lengths[i] = c.size(1)
+    def __len__(self):
+        return self.num_batches
 
-            f0 = row[1]
-            f0_padded[i, : f0.size(0)] = f0
 
-            spec = row[2]
-            spec_padded[i, :, : spec.size(1)] = spec
+class TextAudioCollate:
+    """按 units 帧数降序排序，每个字段用一次 pad_sequence 补零"""
 
-            wav = row[3]
-            wav_padded[i, :, : wav.size(1)] = wav
+    def __call__(self, batch):
+        batch = [b for b in batch if b is not None]
+        batch = sorted(batch, key=lambda x: x[0].shape[1], reverse=True)
+        lengths = torch.LongTensor([x[0].shape[1] for x in batch])
 
-            spkids[i, 0] = row[4]
+        def pad_frames(i):
+            # [C, T] -> [B, C, T_max]
+            return pad_sequence([x[i].T for x in batch], batch_first=True).transpose(
+                1, 2
+            )
 
-            uv = row[5]
-            uv_padded[i, : uv.size(0)] = uv
-            volume = row[6]
-            if volume is not None:
-                volume_padded[i, : volume.size(0)] = volume
-            else:
-                volume_padded = None
+        def pad_1d(i):
+            return pad_sequence([x[i] for x in batch], batch_first=True)
+
+        c_padded = pad_frames(0)
+        f0_padded = pad_1d(1)
+        spec_padded = pad_frames(2)
+        wav_padded = pad_frames(3)
+        spkids = torch.stack([x[4] for x in batch]).view(len(batch), 1)
+        uv_padded = pad_1d(5)
+        if any(x[6] is None for x in batch):
+            volume_padded = None
+        else:
+            volume_padded = pad_1d(6)
         return (
             c_padded,
             f0_padded,
@@ -0,0 +1,119 @@
+import json
+import os
+import pickle
+import threading
+
+import faiss
+import numpy as np
+
+INDEX_DIR_NAME = "feature_index"
+SOURCE_FILE_NAME = "source.json"
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def save_feature_index(indexes, index_dir, source_path=None):
+    """
+    把 {spk_id: faiss index} 逐个写成 faiss 原生格式的 index_dir/{spk_id}.index
+
+    source_path 为转换来源的 feature_and_index.pkl，会记录它的大小和修改时间，来源变了就重新转换
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    for spk_id, index in indexes.items():
+        path = os.path.join(index_dir, f"{spk_id}.index")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, path)
+    if source_path is not None:
+        with open(os.path.join(index_dir, SOURCE_FILE_NAME), "w") as f:
+            json.dump(_source_stamp(source_path), f)
+
+
+def _is_stale(index_dir, pkl_path):
+    try:
+        with open(os.path.join(index_dir, SOURCE_FILE_NAME)) as f:
+            return json.load(f) != _source_stamp(pkl_path)
+    except (OSError, ValueError):
+        return True
+
+
+class FeatureIndex:
+    """
+    特征检索用的 faiss 索引
+
+    每个说话人一个 faiss 原生格式的索引文件，切换说话人时才 mmap 打开对应文件，
+    不再把整个 pickle 反序列化进内存，也不用 reconstruct_n 还原整个训练特征矩阵。
+    旧的 feature_and_index.pkl 第一次加载时会转换到同目录的 feature_index/ 下
+    """
+
+    def __init__(self, path, k=8, nprobe=1):
+        if os.path.isdir(path):
+            self.index_dir = path
+        else:
+            self.index_dir = os.path.join(os.path.dirname(path), INDEX_DIR_NAME)
+            if _is_stale(self.index_dir, path):
+                with open(path, "rb") as f:
+                    save_feature_index(pickle.load(f), self.index_dir, path)
+        self.k = k
+        self.nprobe = nprobe
+        self.indexes = {}
+        self._lock = threading.Lock()
+
+    def set_params(self, k=None, nprobe=None):
+        if k is not None:
+            self.k = k
+        if nprobe is not None:
+            self.nprobe = nprobe
+            with self._lock:
+                for index in self.indexes.values():
+                    self._apply_nprobe(index)
+
+    def _apply_nprobe(self, index):
+        try:
+            faiss.extract_index_ivf(index).nprobe = self.nprobe
+        except RuntimeError:
+            # 不是 IVF 索引，没有 nprobe
+            pass
+
+    def get(self, spk_id):
+        with self._lock:
+            index = self.indexes.get(spk_id)
+            if index is None:
+                path = os.path.join(self.index_dir, f"{spk_id}.index")
+                if not os.path.exists(path):
+                    raise RuntimeError(
+                        f"No feature index found for speaker {spk_id} in {self.index_dir}"
+                    )
+                index = faiss.read_index(
+                    path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                )
+                self._apply_nprobe(index)
+                self.indexes[spk_id] = index
+            return index
+
+    def retrieve(self, spk_id, feats):
+        """
+        feats: np.array [t, C]
+        return 每帧 k 个近邻特征按距离加权的结果 [t, C]
+
+        所有帧一次 search_and_reconstruct 取回近邻及其特征向量
+        """
+        index = self.get(spk_id)
+        feats = np.ascontiguousarray(feats, dtype=np.float32)
+        k = min(self.k, index.ntotal)
+        score, ix, neighbors = index.search_and_reconstruct(feats, k)
+        # nprobe 较小时可能凑不够 k 个近邻，缺的位置 id 为 -1
+        missing = ix < 0
+        neighbors[missing] = 0
+        weight = np.square(1 / score)
+        weight[missing] = 0
+        total = weight.sum(axis=1, keepdims=True)
+        np.divide(weight, total, out=weight, where=total > 0)
+        result = np.einsum("tk,tkc->tc", weight, neighbors)
+        # 一个近邻都没找到的帧保留原特征，避免除零得到 NaN
+        empty = total[:, 0] <= 0
+        result[empty] = feats[empty]
+        return result
@@ -3,10 +3,10 @@ import logging
 
 import soundfile
 import torch
-import torchaudio
 from flask import Flask, request, send_file
 from flask_cors import CORS
 
+from ddspsvc.ddsp.core import resample
 from SoVITS.inference.infer_tool import RealTimeVC, Svc
 
 app = Flask(__name__)
@@ -31,7 +31,7 @@ def voice_change_model():
     # 模型推理
     if raw_infer:
         # out_audio, out_sr = svc_model.infer(speaker_id, f_pitch_change, input_wav_path)
-        out_audio, out_sr = svc_model.infer(
+        out_audio, _, _ = svc_model.infer(
             speaker_id,
             f_pitch_change,
             input_wav_path,
@@ -40,9 +40,7 @@ def voice_change_model():
             noice_scale=0.4,
             f0_filter=False,
         )
-        tar_audio = torchaudio.functional.resample(
-            out_audio, svc_model.target_sample, daw_sample
-        )
+        tar_audio = resample(out_audio, svc_model.target_sample, daw_sample)
     else:
         out_audio = svc.process(
             svc_model,
@@ -54,7 +52,7 @@ def voice_change_model():
             noice_scale=0.4,
             f0_filter=False,
         )
-        tar_audio = torchaudio.functional.resample(
+        tar_audio = resample(
             torch.from_numpy(out_audio), svc_model.target_sample, daw_sample
         )
     # 返回音频
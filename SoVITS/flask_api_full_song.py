@@ -1,14 +1,55 @@
 import io
+import struct
 
 import numpy as np
 import soundfile
-from flask import Flask, request, send_file
+from flask import Flask, Response, request, send_file, stream_with_context
 
-from SoVITS.inference import infer_tool, slicer
+from SoVITS.inference import infer_tool
 
 app = Flask(__name__)
 
 
+def convert_stream(audio_path, spk, tran):
+    """逐段产出转换结果，段间的交叉淡化已在 slice_inference_stream 里做完"""
+    infer_tool.format_wav(audio_path)
+    for chunk in svc_model.slice_inference_stream(
+        audio_path,
+        spk,
+        tran,
+        slice_db=-40,
+        cluster_infer_ratio=0,
+        auto_predict_f0=False,
+        noice_scale=0.4,
+    ):
+        svc_model.clear_empty()
+        yield chunk
+
+
+def wav_stream_header(sample_rate, channels=1, sample_width=2):
+    # 总长度未知，RIFF 和 data 的大小按流式 wav 的惯例填 0xFFFFFFFF
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        0xFFFFFFFF,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        channels,
+        sample_rate,
+        sample_rate * channels * sample_width,
+        channels * sample_width,
+        sample_width * 8,
+        b"data",
+        0xFFFFFFFF,
+    )
+
+
+def to_pcm16(chunk):
+    return (np.clip(chunk, -1, 1) * 32767).astype("<i2").tobytes()
+
+
 @app.route("/wav2wav", methods=["POST"])
 def wav2wav():
     request_form = request.form
@@ -16,40 +57,54 @@ def wav2wav():
     tran = int(float(request_form.get("tran", 0)))  # 音调
     spk = request_form.get("spk", 0)  # 说话人(id或者name都可以,具体看你的config)
     wav_format = request_form.get("wav_format", "wav")  # 范围文件格式
-    infer_tool.format_wav(audio_path)
-    chunks = slicer.cut(audio_path, db_thresh=-40)
-    audio_data, audio_sr = slicer.chunks2audio(audio_path, chunks)
-
-    audio = []
-    for slice_tag, data in audio_data:
-        print(f"#=====segment start, {round(len(data) / audio_sr, 3)}s======")
-
-        length = int(np.ceil(len(data) / audio_sr * svc_model.target_sample))
-        if slice_tag:
-            print("jump empty segment")
-            _audio = np.zeros(length)
-        else:
-            # padd
-            pad_len = int(audio_sr * 0.5)
-            data = np.concatenate([np.zeros([pad_len]), data, np.zeros([pad_len])])
-            raw_path = io.BytesIO()
-            soundfile.write(raw_path, data, audio_sr, format="wav")
-            raw_path.seek(0)
-            out_audio, out_sr = svc_model.infer(spk, tran, raw_path)
-            svc_model.clear_empty()
-            _audio = out_audio.cpu().numpy()
-            pad_len = int(svc_model.target_sample * 0.5)
-            _audio = _audio[pad_len:-pad_len]
-
-        audio.extend(list(infer_tool.pad_array(_audio, length)))
+
+    audio = infer_tool.AudioWriter()
+    for chunk in convert_stream(audio_path, spk, tran):
+        audio.append(chunk)
     out_wav_path = io.BytesIO()
-    soundfile.write(out_wav_path, audio, svc_model.target_sample, format=wav_format)
+    soundfile.write(
+        out_wav_path, audio.result(), svc_model.target_sample, format=wav_format
+    )
     out_wav_path.seek(0)
     return send_file(
         out_wav_path, download_name=f"temp.{wav_format}", as_attachment=True
     )
 
 
+@app.route("/wav2wav_stream", methods=["POST"])
+def wav2wav_stream():
+    """
+    与 /wav2wav 参数相同，每段转换完就以 chunked 方式发出，按原曲顺序
+
+    stream_format 为 wav（默认）时先发一个长度未知的 wav 头再发 16 位 PCM，
+    为 pcm 时只发裸 PCM，采样率见 X-Sample-Rate 响应头
+    """
+    request_form = request.form
+    audio_path = request_form.get("audio_path", None)
+    tran = int(float(request_form.get("tran", 0)))
+    spk = request_form.get("spk", 0)
+    stream_format = request_form.get("stream_format", "wav")
+    if stream_format not in ("wav", "pcm"):
+        return f"Unsupported stream_format {stream_format}", 400
+    sample_rate = svc_model.target_sample
+
+    def generate():
+        if stream_format == "wav":
+            yield wav_stream_header(sample_rate)
+        for chunk in convert_stream(audio_path, spk, tran):
+            yield to_pcm16(chunk)
+
+    if stream_format == "wav":
+        mimetype = "audio/wav"
+    else:
+        mimetype = f"audio/L16;rate={sample_rate};channels=1"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"X-Sample-Rate": str(sample_rate)},
+    )
+
+
 if __name__ == "__main__":
     model_name = "logs/44k/G_60000.pth"  # 模型地址
     config_name = "configs/config.json"  # config地址
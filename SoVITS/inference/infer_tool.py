@@ -1,11 +1,10 @@
 import gc
 import hashlib
-import io
 import json
 import logging
 import os
-import pickle
 import time
+from functools import lru_cache
 from pathlib import Path
 
 import librosa
@@ -16,10 +15,13 @@ import soundfile
 import torch
 import torchaudio
 
+from ddspsvc import slicer
+from ddspsvc.ddsp.core import get_resampler, resample
 from SoVITS import cluster, logger, utils
 from SoVITS.diffusion.unit2mel import load_model_vocoder
-from SoVITS.inference import slicer
+from SoVITS.feature_index import FeatureIndex
 from SoVITS.models import SynthesizerTrn
+from SVCFusion.encoder_registry import acquire_speech_encoder, encoder_registry
 
 logging.getLogger("matplotlib").setLevel(logging.WARNING)
 
@@ -119,6 +121,160 @@ def split_list_by_n(list_collection, n, pre=0):
         yield list_collection[i - pre if i - pre >= 0 else i : i + n]
 
 
+def split_lengths(total, n, pre=0):
+    """split_list_by_n 切出的每段长度，不用真的去切"""
+    i = np.arange(0, total, n)
+    start = np.where(i - pre >= 0, i - pre, i)
+    return np.minimum(i + n, total) - start
+
+
+def count_mix_frames(
+    audio_data, audio_sr, target_sample, hop_size, per_size, lg_size, pad_seconds
+):
+    """按 slice_inference 的切片方式算出整首歌的总帧数"""
+    n_frames = len(audio_data)
+    pad_len = int(audio_sr * pad_seconds)
+    for slice_tag, data in audio_data:
+        if slice_tag:
+            n_frames += int(np.ceil(len(data) / audio_sr * target_sample)) // hop_size
+            continue
+        if per_size != 0:
+            lengths = split_lengths(len(data), per_size, lg_size)
+        else:
+            lengths = np.array([len(data)])
+        per_length = np.ceil(lengths / audio_sr * target_sample).astype(np.int64)
+        n_frames += int(((per_length + 2 * pad_len) // hop_size).sum())
+    return n_frames
+
+
+@lru_cache(maxsize=16)
+def _spk_mix_weights(spk_mix, n_frames):
+    n_spk = len(spk_mix)
+    segments = np.array(
+        [(i, *mix) for i, mixes in enumerate(spk_mix) for mix in mixes],
+        dtype=np.float64,
+    ).reshape(-1, 5)
+    spk_idx = segments[:, 0].astype(np.int64)
+    v_begin, v_end = segments[:, 3], segments[:, 4]
+    if (v_begin < 0.0).any() or (v_end < 0.0).any():
+        raise RuntimeError("mix value must higer Than zero!")
+    begin = (n_frames * segments[:, 1]).astype(np.int64)
+    end = (n_frames * segments[:, 2]).astype(np.int64)
+    length = end - begin
+    if (length <= 0).any():
+        raise RuntimeError("begin Must lower Than end!")
+    same_spk = spk_idx[1:] == spk_idx[:-1]
+    if (same_spk & (begin[1:] != end[:-1])).any():
+        raise RuntimeError("[i]EndTime Must Equal [i+1]BeginTime!")
+
+    # 所有分段一起线性插值
+    seg = np.repeat(np.arange(len(segments)), length)
+    offset = np.arange(len(seg)) - np.repeat(np.cumsum(length) - length, length)
+    frame = begin[seg] + offset
+    value = v_begin[seg] + (v_end - v_begin)[seg] * offset / length[seg]
+    keep = (frame >= 0) & (frame < n_frames)
+    weights = np.zeros((n_spk, n_frames), dtype=np.float32)
+    weights[spk_idx[seg][keep], frame[keep]] = value[keep]
+
+    # 每帧归一化，全为 0 的帧平均分配
+    total = weights.sum(0)
+    silent = total == 0.0
+    weights[:, silent] = 1.0 / n_spk
+    total[silent] = 1.0
+    weights /= total
+    if not (np.abs(weights.sum(0) - 1.0) < 0.0001).all():
+        raise RuntimeError("sum(spk_mix_tensor) not equal 1")
+    weights.flags.writeable = False
+    return weights
+
+
+def plan_spk_mix(spk_mix, n_frames):
+    """
+    把 spkmix.py 格式的角色混合轨道展开成 n_spk x n_frames 的权重矩阵
+
+    spk_mix: {角色ID: [[起始时间, 终止时间, 起始数值, 终止数值], ...]}，角色ID 为 0..n_spk-1
+    同一首歌的切片方式不变时结果会被缓存
+    """
+    key = tuple(
+        tuple(tuple(float(v) for v in mix) for mix in spk_mix[i])
+        for i in range(len(spk_mix))
+    )
+    return _spk_mix_weights(key, int(n_frames))
+
+
+class AudioWriter:
+    """
+    Output buffer backed by a preallocated float32 array.
+
+    Grows by doubling when the initial estimate is too small; crossfades are
+    done in place instead of re-slicing the whole output.
+    """
+
+    def __init__(self, capacity=0):
+        self.buffer = np.zeros(max(int(capacity), 0), dtype=np.float32)
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def _reserve(self, length):
+        if length <= len(self.buffer):
+            return
+        buffer = np.zeros(max(length, 2 * len(self.buffer)), dtype=np.float32)
+        buffer[: self.length] = self.buffer[: self.length]
+        self.buffer = buffer
+
+    def reset(self):
+        self.length = 0
+
+    def append(self, data):
+        end = self.length + len(data)
+        self._reserve(end)
+        self.buffer[self.length : end] = data
+        self.length = end
+
+    def append_zeros(self, n):
+        end = self.length + n
+        self._reserve(end)
+        self.buffer[self.length : end] = 0
+        self.length = end
+
+    def crossfade(self, data, fade_len, drop_tail=0):
+        """
+        Drop the last `drop_tail` samples, linearly crossfade the next
+        `fade_len` samples from the end with the head of `data`, then append
+        the rest of `data`.
+        """
+        start = max(self.length - drop_tail - fade_len, 0)
+        fade_len = min(self.length - drop_tail, fade_len, len(data))
+        if fade_len > 0:
+            k = np.linspace(0, 1, fade_len, dtype=np.float32)
+            fade = self.buffer[start : start + fade_len]
+            fade *= 1 - k
+            fade += k * data[:fade_len]
+        self.length = start + max(fade_len, 0)
+        self.append(data[max(fade_len, 0) :])
+
+    def tail(self, n):
+        return self.buffer[max(self.length - n, 0) : self.length]
+
+    def take(self, keep=0):
+        """
+        Remove and return everything except the last `keep` samples, which
+        stay in the buffer so a later crossfade can still modify them.
+        """
+        n = self.length - keep
+        if n <= 0:
+            return self.buffer[:0].copy()
+        data = self.buffer[:n].copy()
+        self.buffer[:keep] = self.buffer[n : self.length]
+        self.length = keep
+        return data
+
+    def result(self):
+        return self.buffer[: self.length]
+
+
 class F0FilterException(Exception):
     pass
 
@@ -137,8 +293,13 @@ class Svc(object):
         only_diffusion=False,
         spk_mix_enable=False,
         feature_retrieval=False,
+        feature_cache=None,
+        retrieval_k=8,
+        retrieval_nprobe=1,
     ):
         self.net_g_path = net_g_path
+        # 可选的磁盘特征缓存，需要提供 make_key / get_or_compute
+        self.feature_cache = feature_cache
         self.only_diffusion = only_diffusion
         self.shallow_diffusion = shallow_diffusion
         self.feature_retrieval = feature_retrieval
@@ -147,6 +308,7 @@ class Svc(object):
         else:
             self.dev = torch.device(device)
         self.net_g_ms = None
+        self.hubert_key = None
         if not self.only_diffusion:
             self.hps_ms = utils.get_hparams_from_file(config_path, True)
             self.target_sample = self.hps_ms.data.sampling_rate
@@ -200,15 +362,16 @@ class Svc(object):
                 self.shallow_diffusion = self.only_diffusion = False
 
         # load hubert and model
+        # 语音编码器在进程内共享，unload_model 时释放引用
         if not self.only_diffusion:
             self.load_model(spk_mix_enable)
-            self.hubert_model = utils.get_speech_encoder(
-                self.speech_encoder, device=self.dev
+            self.hubert_key, self.hubert_model = acquire_speech_encoder(
+                self.speech_encoder, self.dev
             )
             self.volume_extractor = utils.Volume_Extractor(self.hop_size)
         else:
-            self.hubert_model = utils.get_speech_encoder(
-                self.diffusion_args.data.encoder, device=self.dev
+            self.hubert_key, self.hubert_model = acquire_speech_encoder(
+                self.diffusion_args.data.encoder, self.dev
             )
             self.volume_extractor = utils.Volume_Extractor(
                 self.diffusion_args.data.block_size
@@ -216,12 +379,13 @@ class Svc(object):
 
         if os.path.exists(cluster_model_path):
             if self.feature_retrieval:
-                with open(cluster_model_path, "rb") as f:
-                    self.cluster_model = pickle.load(f)
-                self.big_npy = None
-                self.now_spk_id = -1
+                self.cluster_model = FeatureIndex(
+                    cluster_model_path, k=retrieval_k, nprobe=retrieval_nprobe
+                )
             else:
-                self.cluster_model = cluster.get_cluster_model(cluster_model_path)
+                self.cluster_model = cluster.get_cluster_model(
+                    cluster_model_path, self.dev
+                )
         else:
             self.feature_retrieval = False
 
@@ -272,7 +436,21 @@ class Svc(object):
                 device=self.dev,
                 threshold=cr_threshold,
             )
-        f0, uv = self.f0_predictor_object.compute_f0_uv(wav)
+        if self.feature_cache is not None:
+            wav_hash = hashlib.md5(wav.tobytes()).hexdigest()
+            f0, uv = self.feature_cache.get_or_compute(
+                self.feature_cache.make_key(
+                    "f0_uv",
+                    wav_hash,
+                    f0_predictor,
+                    self.hop_size,
+                    self.target_sample,
+                    cr_threshold,
+                ),
+                lambda: tuple(self.f0_predictor_object.compute_f0_uv(wav)),
+            )
+        else:
+            f0, uv = self.f0_predictor_object.compute_f0_uv(wav)
 
         if f0_filter and sum(f0) == 0:
             raise F0FilterException("No voice detected")
@@ -283,17 +461,33 @@ class Svc(object):
         f0 = f0.unsqueeze(0)
         uv = uv.unsqueeze(0)
 
-        wav = torch.from_numpy(wav).to(self.dev)
-        if not hasattr(self, "audio16k_resample_transform"):
-            self.audio16k_resample_transform = torchaudio.transforms.Resample(
-                self.target_sample, 16000
-            ).to(self.dev)
-        wav16k = self.audio16k_resample_transform(wav[None, :])[0]
+        def encode_units():
+            wav_tensor = torch.from_numpy(wav).to(self.dev)
+            wav16k = get_resampler(self.target_sample, 16000, device=self.dev)(
+                wav_tensor[None, :]
+            )[0]
 
-        c = self.hubert_model.encoder(wav16k)
-        c = utils.repeat_expand_2d(
-            c.squeeze(0), f0.shape[1], self.unit_interpolate_mode
-        )
+            c = self.hubert_model.encoder(wav16k)
+            return utils.repeat_expand_2d(
+                c.squeeze(0), f0.shape[1], self.unit_interpolate_mode
+            )
+
+        if self.feature_cache is not None:
+            c = self.feature_cache.get_or_compute(
+                self.feature_cache.make_key(
+                    "units",
+                    wav_hash,
+                    self.speech_encoder,
+                    self.target_sample,
+                    self.hop_size,
+                    self.unit_interpolate_mode,
+                    f0.shape[1],
+                ),
+                lambda: encode_units().cpu().numpy(),
+            )
+            c = torch.from_numpy(c).to(self.dev)
+        else:
+            c = encode_units()
 
         if cluster_infer_ratio != 0:
             if self.feature_retrieval:
@@ -305,24 +499,16 @@ class Svc(object):
                     raise RuntimeError(
                         "The name you entered is not in the speaker list!"
                     )
-                feature_index = self.cluster_model[speaker_id]
                 feat_np = np.ascontiguousarray(c.transpose(0, 1).cpu().numpy())
-                if self.big_npy is None or self.now_spk_id != speaker_id:
-                    self.big_npy = feature_index.reconstruct_n(0, feature_index.ntotal)
-                    self.now_spk_id = speaker_id
                 print("starting feature retrieval...")
-                score, ix = feature_index.search(feat_np, k=8)
-                weight = np.square(1 / score)
-                weight /= weight.sum(axis=1, keepdims=True)
-                npy = np.sum(self.big_npy[ix] * np.expand_dims(weight, axis=2), axis=1)
+                npy = self.cluster_model.retrieve(speaker_id, feat_np)
                 c = cluster_infer_ratio * npy + (1 - cluster_infer_ratio) * feat_np
                 c = torch.FloatTensor(c).to(self.dev).transpose(0, 1)
                 print("end feature retrieval...")
             else:
                 cluster_c = cluster.get_cluster_center_result(
-                    self.cluster_model, c.cpu().numpy().T, speaker
-                ).T
-                cluster_c = torch.FloatTensor(cluster_c).to(self.dev)
+                    self.cluster_model, c.T, speaker
+                ).T.to(c.dtype)
                 c = cluster_infer_ratio * cluster_c + (1 - cluster_infer_ratio) * c
 
         c = c.unsqueeze(0)
@@ -348,14 +534,55 @@ class Svc(object):
     ):
         torchaudio.set_audio_backend("soundfile")
         wav, sr = torchaudio.load(raw_path)
-        if (
-            not hasattr(self, "audio_resample_transform")
-            or self.audio16k_resample_transform.orig_freq != sr
-        ):
-            self.audio_resample_transform = torchaudio.transforms.Resample(
-                sr, self.target_sample
-            )
-        wav = self.audio_resample_transform(wav).numpy()[0]
+        return self.infer_array(
+            speaker,
+            tran,
+            wav[0],
+            sr,
+            cluster_infer_ratio=cluster_infer_ratio,
+            auto_predict_f0=auto_predict_f0,
+            noice_scale=noice_scale,
+            f0_filter=f0_filter,
+            f0_predictor=f0_predictor,
+            enhancer_adaptive_key=enhancer_adaptive_key,
+            cr_threshold=cr_threshold,
+            k_step=k_step,
+            frame=frame,
+            spk_mix=spk_mix,
+            second_encoding=second_encoding,
+            loudness_envelope_adjustment=loudness_envelope_adjustment,
+        )
+
+    def infer_array(
+        self,
+        speaker,
+        tran,
+        wav,
+        sr,
+        cluster_infer_ratio=0,
+        auto_predict_f0=False,
+        noice_scale=0.4,
+        f0_filter=False,
+        f0_predictor="pm",
+        enhancer_adaptive_key=0,
+        cr_threshold=0.05,
+        k_step=100,
+        frame=0,
+        spk_mix=False,
+        second_encoding=False,
+        loudness_envelope_adjustment=1,
+    ):
+        """
+        Same as `infer`, but takes a mono float waveform (numpy array or
+        tensor, on any device) and its sample rate instead of a file.
+        Returns (audio tensor, audio length, n_frames).
+        """
+        if isinstance(wav, np.ndarray):
+            wav = torch.from_numpy(wav)
+        wav = wav.float()
+        wav = resample(wav, sr, self.target_sample)
+        wav_tensor = wav.to(self.dev)
+        wav = wav.cpu().numpy()
         if spk_mix:
             c, f0, uv = self.get_unit_f0(
                 wav, tran, 0, None, f0_filter, f0_predictor, cr_threshold=cr_threshold
@@ -388,9 +615,9 @@ class Svc(object):
             vol = None
             if not self.only_diffusion:
                 vol = (
-                    self.volume_extractor.extract(
-                        torch.FloatTensor(wav).to(self.dev)[None, :]
-                    )[None, :].to(self.dev)
+                    self.volume_extractor.extract(wav_tensor[None, :])[None, :].to(
+                        self.dev
+                    )
                     if self.vol_embedding
                     else None
                 )
@@ -411,7 +638,7 @@ class Svc(object):
                     else None
                 )
             else:
-                audio = torch.FloatTensor(wav).to(self.dev)
+                audio = wav_tensor
                 audio_mel = None
             if self.dtype != torch.float32:
                 c = c.to(torch.float32)
@@ -426,13 +653,9 @@ class Svc(object):
                     else vol[:, :, None]
                 )
                 if self.shallow_diffusion and second_encoding:
-                    if not hasattr(self, "audio16k_resample_transform"):
-                        self.audio16k_resample_transform = (
-                            torchaudio.transforms.Resample(
-                                self.target_sample, 16000
-                            ).to(self.dev)
-                        )
-                    audio16k = self.audio16k_resample_transform(audio[None, :])[0]
+                    audio16k = get_resampler(
+                        self.target_sample, 16000, device=self.dev
+                    )(audio[None, :])[0]
                     c = self.hubert_model.encoder(audio16k)
                     c = utils.repeat_expand_2d(
                         c.squeeze(0), f0.shape[1], self.unit_interpolate_mode
@@ -478,6 +701,13 @@ class Svc(object):
 
     def unload_model(self):
         # unload model
+        if self.hubert_key is not None:
+            encoder_registry.release(self.hubert_key)
+            self.hubert_key = None
+            self.hubert_model = None
+        if getattr(self, "net_g_ms", None) is None:
+            gc.collect()
+            return
         self.net_g_ms = self.net_g_ms.to("cpu")
         del self.net_g_ms
         if hasattr(self, "enhancer"):
@@ -486,7 +716,7 @@ class Svc(object):
             del self.enhancer
         gc.collect()
 
-    def slice_inference(
+    def slice_inference_stream(
         self,
         raw_audio_path,
         spk,
@@ -507,6 +737,12 @@ class Svc(object):
         second_encoding=False,
         loudness_envelope_adjustment=1,
     ):
+        """
+        Same as `slice_inference`, but yields the converted audio as float32
+        chunks in order as soon as each slice is done. Crossfades between
+        clips are applied before a chunk is yielded, so concatenating the
+        chunks gives exactly the `slice_inference` result.
+        """
         if use_spk_mix:
             if len(self.spk2id) == 1:
                 spk = self.spk2id.keys()[0]
@@ -519,66 +755,22 @@ class Svc(object):
         lg_size_r = int(lg_size * lgr_num)
         lg_size_c_l = (lg_size - lg_size_r) // 2
         lg_size_c_r = lg_size - lg_size_r - lg_size_c_l
-        lg = np.linspace(0, 1, lg_size_r) if lg_size != 0 else 0
 
         if use_spk_mix:
             assert len(self.spk2id) == len(spk)
-            audio_length = 0
-            for slice_tag, data in audio_data:
-                aud_length = int(np.ceil(len(data) / audio_sr * self.target_sample))
-                if slice_tag:
-                    audio_length += aud_length // self.hop_size
-                    continue
-                if per_size != 0:
-                    datas = split_list_by_n(data, per_size, lg_size)
-                else:
-                    datas = [data]
-                for k, dat in enumerate(datas):
-                    pad_len = int(audio_sr * pad_seconds)
-                    per_length = int(np.ceil(len(dat) / audio_sr * self.target_sample))
-                    a_length = per_length + 2 * pad_len
-                    audio_length += a_length // self.hop_size
-            audio_length += len(audio_data)
-            spk_mix_tensor = torch.zeros(size=(len(spk), audio_length)).to(self.dev)
-            for i in range(len(spk)):
-                last_end = None
-                for mix in spk[i]:
-                    if mix[3] < 0.0 or mix[2] < 0.0:
-                        raise RuntimeError("mix value must higer Than zero!")
-                    begin = int(audio_length * mix[0])
-                    end = int(audio_length * mix[1])
-                    length = end - begin
-                    if length <= 0:
-                        raise RuntimeError("begin Must lower Than end!")
-                    step = (mix[3] - mix[2]) / length
-                    if last_end is not None:
-                        if last_end != begin:
-                            raise RuntimeError("[i]EndTime Must Equal [i+1]BeginTime!")
-                    last_end = end
-                    if step == 0.0:
-                        spk_mix_data = torch.zeros(length).to(self.dev) + mix[2]
-                    else:
-                        spk_mix_data = torch.arange(mix[2], mix[3], step).to(self.dev)
-                    if len(spk_mix_data) < length:
-                        num_pad = length - len(spk_mix_data)
-                        spk_mix_data = torch.nn.functional.pad(
-                            spk_mix_data, [0, num_pad], mode="reflect"
-                        ).to(self.dev)
-                    spk_mix_tensor[i][begin:end] = spk_mix_data[:length]
-
-            spk_mix_ten = torch.sum(spk_mix_tensor, dim=0).unsqueeze(0).to(self.dev)
-            # spk_mix_tensor[0][spk_mix_ten<0.001] = 1.0
-            for i, x in enumerate(spk_mix_ten[0]):
-                if x == 0.0:
-                    spk_mix_ten[0][i] = 1.0
-                    spk_mix_tensor[:, i] = 1.0 / len(spk)
-            spk_mix_tensor = spk_mix_tensor / spk_mix_ten
-            if not ((torch.sum(spk_mix_tensor, dim=0) - 1.0) < 0.0001).all():
-                raise RuntimeError("sum(spk_mix_tensor) not equal 1")
-            spk = spk_mix_tensor
+            audio_length = count_mix_frames(
+                audio_data,
+                audio_sr,
+                self.target_sample,
+                self.hop_size,
+                per_size,
+                lg_size,
+                pad_seconds,
+            )
+            spk = torch.tensor(plan_spk_mix(spk, audio_length), device=self.dev)
 
         global_frame = 0
-        audio = []
+        audio = AudioWriter()
         with logger.Progress() as progress:
             for slice_tag, data in progress.track(audio_data):
                 logger.info(f"segment start, {round(len(data) / audio_sr, 3)}s")
@@ -586,12 +778,12 @@ class Svc(object):
                 length = int(np.ceil(len(data) / audio_sr * self.target_sample))
                 if slice_tag:
                     logger.info("jump empty segment")
-                    _audio = np.zeros(length)
-                    audio.extend(list(pad_array(_audio, length)))
+                    audio.append_zeros(length)
                     global_frame += length // self.hop_size
+                    yield audio.take()
                     continue
                 if per_size != 0:
-                    datas = split_list_by_n(data, per_size, lg_size)
+                    datas = list(split_list_by_n(data, per_size, lg_size))
                 else:
                     datas = [data]
                 for k, dat in enumerate(datas):
@@ -609,13 +801,11 @@ class Svc(object):
                     dat = np.concatenate(
                         [np.zeros([pad_len]), dat, np.zeros([pad_len])]
                     )
-                    raw_path = io.BytesIO()
-                    soundfile.write(raw_path, dat, audio_sr, format="wav")
-                    raw_path.seek(0)
-                    out_audio, out_sr, out_frame = self.infer(
+                    out_audio, out_sr, out_frame = self.infer_array(
                         spk,
                         tran,
-                        raw_path,
+                        dat.astype(np.float32),
+                        audio_sr,
                         cluster_infer_ratio=cluster_infer_ratio,
                         auto_predict_f0=auto_predict_f0,
                         noice_scale=noice_scale,
@@ -634,31 +824,25 @@ class Svc(object):
                     _audio = _audio[pad_len:-pad_len]
                     _audio = pad_array(_audio, per_length)
                     if lg_size != 0 and k != 0:
-                        lg1 = (
-                            audio[-(lg_size_r + lg_size_c_r) : -lg_size_c_r]
-                            if lgr_num != 1
-                            else audio[-lg_size:]
-                        )
-                        lg2 = (
-                            _audio[lg_size_c_l : lg_size_c_l + lg_size_r]
-                            if lgr_num != 1
-                            else _audio[0:lg_size]
+                        # lg_size_c_l and lg_size_c_r are both 0 when lgr_num == 1
+                        audio.crossfade(
+                            _audio[lg_size_c_l:], lg_size_r, drop_tail=lg_size_c_r
                         )
-                        lg_pre = lg1 * (1 - lg) + lg2 * lg
-                        audio = (
-                            audio[0 : -(lg_size_r + lg_size_c_r)]
-                            if lgr_num != 1
-                            else audio[0:-lg_size]
-                        )
-                        audio.extend(lg_pre)
-                        _audio = (
-                            _audio[lg_size_c_l + lg_size_r :]
-                            if lgr_num != 1
-                            else _audio[lg_size:]
-                        )
-                    audio.extend(list(_audio))
+                    else:
+                        audio.append(_audio)
+                    # 下一段的交叉淡化还会改写末尾 lg_size 个采样，先留着
+                    chunk = audio.take(lg_size if k + 1 < len(datas) else 0)
+                    if len(chunk):
+                        yield chunk
 
-        return np.array(audio)
+    def slice_inference(self, raw_audio_path, *args, **kwargs):
+        wav_path = Path(raw_audio_path).with_suffix(".wav")
+        audio = AudioWriter(
+            soundfile.info(str(wav_path)).duration * self.target_sample
+        )
+        for chunk in self.slice_inference_stream(raw_audio_path, *args, **kwargs):
+            audio.append(chunk)
+        return audio.result()
 
 
 class RealTimeVC:
@@ -667,6 +851,7 @@ class RealTimeVC:
         self.last_o = None
         self.chunk_len = 16000  # chunk length
         self.pre_len = 3840  # cross fade length, multiples of 640
+        self.writer = AudioWriter()
 
     # Input and output are 1-dimensional numpy waveform arrays
 
@@ -681,18 +866,14 @@ class RealTimeVC:
         noice_scale=0.4,
         f0_filter=False,
     ):
-        import maad
-
         audio, sr = torchaudio.load(input_wav_path)
         audio = audio.cpu().numpy()[0]
-        temp_wav = io.BytesIO()
         if self.last_chunk is None:
-            input_wav_path.seek(0)
-
-            audio, sr = svc_model.infer(
+            audio, _, _ = svc_model.infer_array(
                 speaker_id,
                 f_pitch_change,
-                input_wav_path,
+                audio,
+                sr,
                 cluster_infer_ratio=cluster_infer_ratio,
                 auto_predict_f0=auto_predict_f0,
                 noice_scale=noice_scale,
@@ -705,13 +886,12 @@ class RealTimeVC:
             return audio[-self.chunk_len :]
         else:
             audio = np.concatenate([self.last_chunk, audio])
-            soundfile.write(temp_wav, audio, sr, format="wav")
-            temp_wav.seek(0)
 
-            audio, sr = svc_model.infer(
+            audio, _, _ = svc_model.infer_array(
                 speaker_id,
                 f_pitch_change,
-                temp_wav,
+                audio,
+                sr,
                 cluster_infer_ratio=cluster_infer_ratio,
                 auto_predict_f0=auto_predict_f0,
                 noice_scale=noice_scale,
@@ -719,7 +899,10 @@ class RealTimeVC:
             )
 
             audio = audio.cpu().numpy()
-            ret = maad.util.crossfade(self.last_o, audio, self.pre_len)
+            self.writer.reset()
+            self.writer.append(self.last_o)
+            self.writer.crossfade(audio, self.pre_len)
+            ret = self.writer.result()
             self.last_chunk = audio[-self.pre_len :]
             self.last_o = audio
-            return ret[self.chunk_len : 2 * self.chunk_len]
+            return ret[self.chunk_len : 2 * self.chunk_len].copy()
@@ -9,7 +9,7 @@ import soundfile
 import torch
 import torchaudio
 
-from SoVITS.inference import slicer
+from ddspsvc import slicer
 from SoVITS.models import SynthesizerTrn
 
 from . import utils
@@ -146,6 +146,20 @@ def main():
         default=False,
         help="是否使用特征检索，如果使用聚类模型将被禁用，且cm与cr参数将会变成特征检索的索引路径与混合比例",
     )
+    parser.add_argument(
+        "-frk",
+        "--retrieval_k",
+        type=int,
+        default=8,
+        help="特征检索时每帧取的近邻数",
+    )
+    parser.add_argument(
+        "-frn",
+        "--retrieval_nprobe",
+        type=int,
+        default=1,
+        help="特征检索时搜索的聚类桶数，越大越准但越慢",
+    )
 
     # 浅扩散设置
     parser.add_argument(
@@ -294,6 +308,8 @@ def main():
         only_diffusion,
         use_spk_mix,
         args.feature_retrieval,
+        retrieval_k=args.retrieval_k,
+        retrieval_nprobe=args.retrieval_nprobe,
     )
 
     infer_tool.mkdir(["raw", "results"])
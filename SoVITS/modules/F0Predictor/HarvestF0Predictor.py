@@ -1,6 +1,7 @@
 import numpy as np
 import pyworld
 
+from ddspsvc.ddsp.core import interp_unvoiced
 from SoVITS.modules.F0Predictor.F0Predictor import F0Predictor
 
 
@@ -20,21 +21,7 @@ class HarvestF0Predictor(F0Predictor):
         vuv_vector[f0 > 0.0] = 1.0
         vuv_vector[f0 <= 0.0] = 0.0
 
-        nzindex = np.nonzero(f0)[0]
-        data = f0[nzindex]
-        nzindex = nzindex.astype(np.float32)
-        time_org = self.hop_length / self.sampling_rate * nzindex
-        time_frame = np.arange(f0.shape[0]) * self.hop_length / self.sampling_rate
-
-        if data.shape[0] <= 0:
-            return np.zeros(f0.shape[0], dtype=np.float32), vuv_vector
-
-        if data.shape[0] == 1:
-            return np.ones(f0.shape[0], dtype=np.float32) * f0[0], vuv_vector
-
-        f0 = np.interp(time_frame, time_org, data, left=data[0], right=data[-1])
-
-        return f0, vuv_vector
+        return interp_unvoiced(f0), vuv_vector
 
     def resize_f0(self, x, target_len):
         source = np.array(x)
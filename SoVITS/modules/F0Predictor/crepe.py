@@ -10,6 +10,8 @@ import torchcrepe
 from torch import nn
 from torch.nn import functional as F
 
+from ddspsvc.ddsp.core import interp_unvoiced
+
 # from:https://github.com/fishaudio/fish-diffusion
 
 
@@ -92,27 +94,10 @@ class BasePitchExtractor:
         vuv_vector = torch.zeros_like(f0)
         vuv_vector[f0 > 0.0] = 1.0
         vuv_vector[f0 <= 0.0] = 0.0
-
-        # 去掉0频率, 并线性插值
-        nzindex = torch.nonzero(f0).squeeze()
-        f0 = torch.index_select(f0, dim=0, index=nzindex).cpu().numpy()
-        time_org = self.hop_length / sampling_rate * nzindex.cpu().numpy()
-        time_frame = np.arange(pad_to) * self.hop_length / sampling_rate
-
         vuv_vector = F.interpolate(vuv_vector[None, None, :], size=pad_to)[0][0]
 
-        if f0.shape[0] <= 0:
-            return torch.zeros(
-                pad_to, dtype=torch.float, device=x.device
-            ), vuv_vector.cpu().numpy()
-        if f0.shape[0] == 1:
-            return torch.ones(pad_to, dtype=torch.float, device=x.device) * f0[
-                0
-            ], vuv_vector.cpu().numpy()
-
-        # 大概可以用 torch 重写?
-        f0 = np.interp(time_frame, time_org, f0, left=f0[0], right=f0[-1])
-        # vuv_vector = np.ceil(scipy.ndimage.zoom(vuv_vector,pad_to/len(vuv_vector),order = 0))
+        # 去掉0频率, 并线性插值
+        f0 = interp_unvoiced(f0.cpu().numpy().astype(np.float64))
 
         return f0, vuv_vector.cpu().numpy()
 
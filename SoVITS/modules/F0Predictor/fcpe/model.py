@@ -3,7 +3,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torch.nn.utils import weight_norm
-from torchaudio.transforms import Resample
+from ddspsvc.ddsp.core import get_resampler
 from torchfcpe import spawn_bundled_infer_model
 
 from .pcmer import PCmer
@@ -225,15 +225,13 @@ class Wav2Mel:
         if sample_rate == self.sampling_rate:
             audio_res = audio
         else:
-            key_str = str(sample_rate)
-            if key_str not in self.resample_kernel:
-                self.resample_kernel[key_str] = Resample(
-                    sample_rate, self.sampling_rate, lowpass_filter_width=128
-                )
-            self.resample_kernel[key_str] = (
-                self.resample_kernel[key_str].to(self.dtype).to(self.device)
-            )
-            audio_res = self.resample_kernel[key_str](audio)
+            audio_res = get_resampler(
+                sample_rate,
+                self.sampling_rate,
+                lowpass_filter_width=128,
+                device=self.device,
+                dtype=self.dtype,
+            )(audio)
 
         # extract
         mel = self.extract_nvstft(
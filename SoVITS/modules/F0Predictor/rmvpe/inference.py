@@ -1,6 +1,6 @@
 import torch
 import torch.nn.functional as F
-from torchaudio.transforms import Resample
+from ddspsvc.ddsp.core import get_resampler
 
 from .constants import *  # noqa: F403
 from .model import E2E0
@@ -10,7 +10,6 @@ from .utils import to_local_average_cents, to_viterbi_cents
 
 class RMVPE:
     def __init__(self, model_path, device=None, dtype=torch.float32, hop_length=160):
-        self.resample_kernel = {}
         if device is None:
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
         else:
@@ -25,7 +24,6 @@ class RMVPE:
         self.mel_extractor = MelSpectrogram(
             N_MELS, SAMPLE_RATE, WINDOW_LENGTH, hop_length, None, MEL_FMIN, MEL_FMAX
         )  # noqa: F405
-        self.resample_kernel = {}
 
     def mel2hidden(self, mel):
         with torch.no_grad():
@@ -54,15 +52,13 @@ class RMVPE:
         if sample_rate == 16000:
             audio_res = audio
         else:
-            key_str = str(sample_rate)
-            if key_str not in self.resample_kernel:
-                self.resample_kernel[key_str] = Resample(
-                    sample_rate, 16000, lowpass_filter_width=128
-                )
-            self.resample_kernel[key_str] = (
-                self.resample_kernel[key_str].to(self.dtype).to(self.device)
-            )
-            audio_res = self.resample_kernel[key_str](audio)
+            audio_res = get_resampler(
+                sample_rate,
+                16000,
+                lowpass_filter_width=128,
+                device=self.device,
+                dtype=self.dtype,
+            )(audio)
         mel_extractor = self.mel_extractor.to(self.device)
         mel = mel_extractor(audio_res, center=True).to(self.dtype)
         hidden = self.mel2hidden(mel)
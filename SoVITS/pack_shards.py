@@ -0,0 +1,28 @@
+import argparse
+
+from . import logger, utils
+from .data_utils import pack_feature_shards
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=str,
+        default="configs/config.json",
+        help="JSON file for configuration",
+    )
+    parser.add_argument(
+        "--filelists",
+        type=str,
+        nargs="+",
+        default=["filelists/train.txt", "filelists/val.txt"],
+        help="filelists to pack, run after preprocessing",
+    )
+
+    args = parser.parse_args()
+    hps = utils.get_hparams_from_file(args.config)
+    for filelist in args.filelists:
+        logger.info(f"Packing {filelist}...")
+        shard_dir = pack_feature_shards(filelist, hps)
+        logger.info(f"Saved feature shards to {shard_dir}")
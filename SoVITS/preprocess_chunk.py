@@ -1,13 +1,15 @@
 import argparse
 import logging
 import os
+import queue
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import librosa
 import numpy as np
 import torch
-import torch.multiprocessing as mp
 
 from SoVITS.diffusion.vocoder import Vocoder
 from SoVITS.modules.mel_processing import spectrogram_torch
@@ -24,84 +26,238 @@ dconfig = du.load_config("configs/sovits_diff.yaml")
 sampling_rate = hps.data.sampling_rate
 hop_length = hps.data.hop_length
 speech_encoder = hps["model"]["speech_encoder"]
+# 纯 CPU 的 f0 提取器，放在 loader 线程池里跑，不占 GPU 线程
+CPU_F0_PREDICTORS = ("pm", "dio", "harvest")
 
 
-def process_one(filename, hmodel, f0p, device, diff=False, mel_extractor=None):
-    wav, sr = librosa.load(filename, sr=sampling_rate)
-    audio_norm = torch.FloatTensor(wav)
-    audio_norm = audio_norm.unsqueeze(0)
-    soft_path = filename + ".soft.pt"
-    if not os.path.exists(soft_path):
-        wav16k = librosa.resample(wav, orig_sr=sampling_rate, target_sr=16000)
-        wav16k = torch.from_numpy(wav16k).to(device)
-        c = hmodel.encoder(wav16k)
-        torch.save(c.cpu(), soft_path)
-
-    f0_path = filename + ".f0.npy"
-    if not os.path.exists(f0_path):
-        f0_predictor = utils.get_f0_predictor(
+class PreprocessEngine:
+    """
+    单进程的三段预处理流水线
+
+    loader 线程池在 CPU 上解码、重采样并算线性谱、音量和 CPU 提取器的 f0；
+    GPU 线程把读好的文件按长度分桶成 batch 提 units，GPU 提取器的 f0 和 mel 用进程内常驻的模型逐条提；
+    writer 线程池负责写文件。每个文件结束时调用 on_done(filename, error)，error 为 None 表示成功
+    """
+
+    def __init__(
+        self, f0p, device, use_diff=False, num_workers=1, batch_size=8, on_done=None
+    ):
+        self.device = device
+        self.use_diff = use_diff
+        self.use_vol = use_diff or hps.model.vol_embedding
+        self.batch_size = batch_size
+        self.on_done = on_done or (lambda filename, error: None)
+
+        self.hmodel = utils.get_speech_encoder(speech_encoder, device=device, log=False)
+        self.f0_predictor = utils.get_f0_predictor(
             f0p,
             sampling_rate=sampling_rate,
             hop_length=hop_length,
-            device=None,
+            device=device,
             threshold=0.05,
         )
-        f0, uv = f0_predictor.compute_f0_uv(wav)
-        np.save(f0_path, np.asanyarray((f0, uv), dtype=object))
+        self.f0_on_loader = f0p in CPU_F0_PREDICTORS
+        if use_diff:
+            self.mel_extractor = Vocoder(
+                dconfig.vocoder.type, dconfig.vocoder.ckpt, device=device
+            )
+        else:
+            self.mel_extractor = None
+        self.volume_extractor = utils.Volume_Extractor(hop_length)
+
+        self.loader = ThreadPoolExecutor(max_workers=num_workers)
+        self.writer = ThreadPoolExecutor(max_workers=num_workers)
+        self.loaded = queue.Queue(maxsize=max(batch_size * 4, num_workers))
+        self.gpu_thread = threading.Thread(target=self._gpu_loop, daemon=True)
+        self.gpu_thread.start()
 
-    spec_path = filename.replace(".wav", ".spec.pt")
-    if not os.path.exists(spec_path):
-        # Process spectrogram
-        # The following code can't be replaced by torch.FloatTensor(wav)
-        # because load_wav_to_torch return a tensor that need to be normalized
+    def submit(self, filename):
+        self.loader.submit(self._load, filename)
 
+    def close(self):
+        """等所有已提交的文件处理完"""
+        self.loader.shutdown(wait=True)
+        self.loaded.put(None)
+        self.gpu_thread.join()
+        self.writer.shutdown(wait=True)
+
+    def _load(self, filename):
+        try:
+            self.loaded.put(self._load_one(filename))
+        except Exception:
+            self.on_done(filename, traceback.format_exc())
+
+    def _load_one(self, filename):
+        wav, sr = librosa.load(filename, sr=sampling_rate)
         if sr != hps.data.sampling_rate:
             raise ValueError(
                 "{} SR doesn't match target {} SR".format(sr, hps.data.sampling_rate)
             )
+        audio_norm = torch.FloatTensor(wav).unsqueeze(0)
+        item = {"filename": filename, "wav": wav, "audio_norm": audio_norm}
+        outputs = {}
+
+        if not os.path.exists(filename + ".soft.pt"):
+            item["wav16k"] = torch.from_numpy(
+                librosa.resample(wav, orig_sr=sampling_rate, target_sr=16000)
+            )
+        item["need_f0"] = not os.path.exists(filename + ".f0.npy")
 
-        # audio_norm = audio / hps.data.max_wav_value
+        spec_path = filename.replace(".wav", ".spec.pt")
+        if not os.path.exists(spec_path):
+            spec = spectrogram_torch(
+                audio_norm,
+                hps.data.filter_length,
+                hps.data.sampling_rate,
+                hps.data.hop_length,
+                hps.data.win_length,
+                center=False,
+            )
+            outputs[spec_path] = torch.squeeze(spec, 0)
+
+        if self.use_vol:
+            volume_path = filename + ".vol.npy"
+            if not os.path.exists(volume_path):
+                outputs[volume_path] = self.volume_extractor.extract(audio_norm).numpy()
+
+        if self.use_diff:
+            item["need_mel"] = not os.path.exists(filename + ".mel.npy")
+            aug_mel_path = filename + ".aug_mel.npy"
+            aug_vol_path = filename + ".aug_vol.npy"
+            if not os.path.exists(aug_mel_path) or not os.path.exists(aug_vol_path):
+                max_amp = float(torch.max(torch.abs(audio_norm))) + 1e-5
+                max_shift = min(1, np.log10(1 / max_amp))
+                log10_vol_shift = random.uniform(-1, max_shift)
+                item["keyshift"] = random.uniform(-5, 5)
+                item["aug_audio"] = audio_norm * (10**log10_vol_shift)
+                if not os.path.exists(aug_vol_path):
+                    outputs[aug_vol_path] = self.volume_extractor.extract(
+                        item["aug_audio"]
+                    ).numpy()
+                item["need_aug_mel"] = not os.path.exists(aug_mel_path)
+
+        item["outputs"] = outputs
+        if item["need_f0"] and self.f0_on_loader:
+            self._extract_f0(item)
+        return item
+
+    def _gpu_loop(self):
+        stop = False
+        while not stop:
+            item = self.loaded.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.loaded.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._run_batch(batch)
 
-        spec = spectrogram_torch(
-            audio_norm,
-            hps.data.filter_length,
-            hps.data.sampling_rate,
-            hps.data.hop_length,
-            hps.data.win_length,
-            center=False,
+    def _run_batch(self, batch):
+        try:
+            self._encode_units([item for item in batch if "wav16k" in item])
+        except Exception:
+            # 整个 batch 失败时逐条重来，找出是哪个文件的问题
+            if len(batch) > 1:
+                for item in batch:
+                    self._run_batch([item])
+                return
+            self.on_done(batch[0]["filename"], traceback.format_exc())
+            return
+        for item in batch:
+            try:
+                self._extract_one(item)
+            except Exception:
+                self.on_done(item["filename"], traceback.format_exc())
+                continue
+            self.writer.submit(self._write, item)
+
+    def _encode_units(self, items):
+        if not items:
+            return
+        # 按长度排序后切 batch，补零最少
+        items = sorted(items, key=lambda item: len(item["wav16k"]))
+        for i in range(0, len(items), self.batch_size):
+            chunk = items[i : i + self.batch_size]
+            units = self.hmodel.encoder_batch(
+                [item["wav16k"].to(self.device) for item in chunk]
+            )
+            for item, c in zip(chunk, units):
+                item["outputs"][item["filename"] + ".soft.pt"] = c.cpu()
+
+    def _extract_f0(self, item):
+        f0, uv = self.f0_predictor.compute_f0_uv(item["wav"])
+        item["outputs"][item["filename"] + ".f0.npy"] = np.asanyarray(
+            (f0, uv), dtype=object
         )
-        spec = torch.squeeze(spec, 0)
-        torch.save(spec, spec_path)
-
-    if diff or hps.model.vol_embedding:
-        volume_path = filename + ".vol.npy"
-        volume_extractor = utils.Volume_Extractor(hop_length)
-        if not os.path.exists(volume_path):
-            volume = volume_extractor.extract(audio_norm)
-            np.save(volume_path, volume.to("cpu").numpy())
-
-    if diff:
-        mel_path = filename + ".mel.npy"
-        if not os.path.exists(mel_path) and mel_extractor is not None:
-            mel_t = mel_extractor.extract(audio_norm.to(device), sampling_rate)
-            mel = mel_t.squeeze().to("cpu").numpy()
-            np.save(mel_path, mel)
-        aug_mel_path = filename + ".aug_mel.npy"
-        aug_vol_path = filename + ".aug_vol.npy"
-        max_amp = float(torch.max(torch.abs(audio_norm))) + 1e-5
-        max_shift = min(1, np.log10(1 / max_amp))
-        log10_vol_shift = random.uniform(-1, max_shift)
-        keyshift = random.uniform(-5, 5)
-        if mel_extractor is not None:
-            aug_mel_t = mel_extractor.extract(
-                audio_norm * (10**log10_vol_shift), sampling_rate, keyshift=keyshift
+        item["need_f0"] = False
+
+    def _extract_one(self, item):
+        filename = item["filename"]
+        outputs = item["outputs"]
+        if item["need_f0"]:
+            self._extract_f0(item)
+        if self.mel_extractor is None:
+            return
+        if item.get("need_mel"):
+            mel_t = self.mel_extractor.extract(
+                item["audio_norm"].to(self.device), sampling_rate
             )
-        aug_mel = aug_mel_t.squeeze().to("cpu").numpy()
-        aug_vol = volume_extractor.extract(audio_norm * (10**log10_vol_shift))
-        if not os.path.exists(aug_mel_path):
-            np.save(aug_mel_path, np.asanyarray((aug_mel, keyshift), dtype=object))
-        if not os.path.exists(aug_vol_path):
-            np.save(aug_vol_path, aug_vol.to("cpu").numpy())
+            outputs[filename + ".mel.npy"] = mel_t.squeeze().to("cpu").numpy()
+        if item.get("need_aug_mel"):
+            aug_mel_t = self.mel_extractor.extract(
+                item["aug_audio"].to(self.device),
+                sampling_rate,
+                keyshift=item["keyshift"],
+            )
+            aug_mel = aug_mel_t.squeeze().to("cpu").numpy()
+            outputs[filename + ".aug_mel.npy"] = np.asanyarray(
+                (aug_mel, item["keyshift"]), dtype=object
+            )
+
+    def _write(self, item):
+        try:
+            for path, data in item["outputs"].items():
+                if path.endswith(".pt"):
+                    torch.save(data, path)
+                else:
+                    np.save(path, data)
+        except Exception:
+            self.on_done(item["filename"], traceback.format_exc())
+            return
+        self.on_done(item["filename"], None)
+
+
+def worker(conn, f0p, device, use_diff, num_workers, batch_size=8):
+    """
+    preprocess_new 启动的工作进程，用 PreprocessEngine 处理从 conn 收到的文件
+
+    每处理完一个文件回发 (filename, error)，error 为 None 表示成功，收到 None 时退出
+    """
+    send_lock = threading.Lock()
+
+    def on_done(filename, error):
+        with send_lock:
+            conn.send((filename, error))
+
+    engine = PreprocessEngine(
+        f0p, device, use_diff, num_workers, batch_size, on_done=on_done
+    )
+    while True:
+        try:
+            filename = conn.recv()
+        except EOFError:
+            filename = None
+        if filename is None:
+            break
+        engine.submit(filename)
+    engine.close()
 
 
 if __name__ == "__main__":
@@ -127,7 +283,13 @@ if __name__ == "__main__":
         "--num_workers",
         type=int,
         default="1",
-        help="Number of workers to use for ThreadPoolExecutor",
+        help="Number of CPU workers for loading and writing files",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=8,
+        help="Number of files encoded together on the GPU",
     )
 
     args = parser.parse_args()
@@ -141,41 +303,19 @@ if __name__ == "__main__":
     logger.info("Using extractor: " + f0p)
     logger.info("Using diff Mode: " + str(args.use_diff))
 
-    if args.use_diff:
-        print("use_diff")
-        print("Loading Mel Extractor...")
-        mel_extractor = Vocoder(
-            dconfig.vocoder.type, dconfig.vocoder.ckpt, device=device
-        )
-        print("Loaded Mel Extractor.")
-    else:
-        mel_extractor = None
-    # filenames = glob(f"{args.in_dir}/*/*.wav", recursive=True)  # [:10]
-    # shuffle(filenames)
-    mp.set_start_method("spawn", force=True)
-
     # 加载 args.filelist 文件
     with open(args.filelist, "r", encoding="utf-8") as f:
-        filenames = f.readlines()
-        filenames = [f.strip() for f in filenames]
-    hmodel = utils.get_speech_encoder(speech_encoder, device=device, log=False)
-    # for file in filenames:
-    #     process_one(file, hmodel, f0p, device, args.use_diff, mel_extractor)
-    #     logger.info("[!!]")
-    with ThreadPoolExecutor(max_workers=args.num_workers) as executor:
-        futures = []
-        for file in filenames:
-            futures.append(
-                executor.submit(
-                    process_one,
-                    filename=file,
-                    hmodel=hmodel,
-                    f0p=f0p,
-                    device=device,
-                    diff=args.use_diff,
-                    mel_extractor=mel_extractor,
-                )
-            )
+        filenames = [f.strip() for f in f.readlines()]
+        filenames = [f for f in filenames if f]
 
-        for future in as_completed(futures):
-            logger.info("[!!]")
+    def on_done(filename, error):
+        if error is not None:
+            logger.error(f"{filename}: {error}")
+        logger.info("[!!]")
+
+    engine = PreprocessEngine(
+        f0p, device, args.use_diff, args.num_workers, args.batch_size, on_done=on_done
+    )
+    for filename in filenames:
+        engine.submit(filename)
+    engine.close()
@@ -1,18 +1,12 @@
 import argparse
-import asyncio
-import os
-import shutil
-import subprocess
-import time
-
-import rich
-import rich.progress
-import torch
+from collections import deque
+from multiprocessing.connection import wait
 
-from . import logger
+import soundfile
+import torch
+import torch.multiprocessing as mp
 
-# PYPATH = ".conda\\python.exe"
-PYPATH = "python"
+from . import logger, preprocess_chunk
 
 
 def timer(func):
@@ -29,125 +23,151 @@ def timer(func):
     return func_wrapper
 
 
-async def exec_it(command, callback):
+def get_duration(filename):
     try:
-        process = await asyncio.create_subprocess_shell(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
+        return soundfile.info(filename).duration
+    except Exception:
+        # 读不到时长的文件排到最后，交给工作进程报错重试
+        return 0.0
+
+
+def read_filelists(*paths):
+    filenames = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            filenames.extend(line.strip() for line in f)
+    return list(dict.fromkeys(f for f in filenames if f))
+
+
+def main(args, device, f0p, use_diff, sub_num_workers, debug):
+    logger.info("Using device: " + str(device))
+    logger.info("Using f0 extractor: " + f0p)
+
+    # 按时长从长到短排队，哪个进程空出来就发下一个文件给它，不会剩一个进程拖着一大块
+    filenames = read_filelists(args.train_filelist, args.val_filelist)
+    filenames.sort(key=get_duration, reverse=True)
+    todo = deque(filenames)
+
+    # 每个工作进程一条独立的管道，某个进程崩溃不会卡住其他进程
+    ctx = mp.get_context("spawn")
+    conns = [None] * args.num_processes
+    workers = [None] * args.num_processes
+
+    def start_worker(i):
+        parent_conn, child_conn = ctx.Pipe()
+        p = ctx.Process(
+            target=preprocess_chunk.worker,
+            args=(
+                child_conn,
+                f0p,
+                str(device),
+                use_diff,
+                sub_num_workers,
+                args.batch_size,
+            ),
+            daemon=True,
         )
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
-            callback(str(line))
-
-        await process.wait()
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error: {e}")
-
-
-def get_callback(
-    name, debug, progress: rich.progress.Progress, taskid: rich.progress.TaskID
-):
-    def real_cb(output):
-        output = output
-        if debug:
-            print(name + ": " + output)
-        if "[!!]" in output:
-            # logger.info(f"{name}: processed 1 file")
-            progress.advance(taskid)
-
-    return real_cb
-
+        p.start()
+        child_conn.close()
+        conns[i] = parent_conn
+        workers[i] = p
+
+    for i in range(args.num_processes):
+        start_worker(i)
+
+    attempts = {}
+    outstanding = [set() for _ in workers]
+    alive = set(range(len(workers)))
+    # 进程崩溃后最多重启的次数，避免一个会让进程崩溃的文件把重启耗尽前无限循环
+    restarts = args.num_processes * (args.max_retries + 1)
+    finished = set()
+    failed = {}
+
+    # 每个进程手上留够凑一个 batch 的文件
+    capacity = sub_num_workers + args.batch_size
+
+    def feed(i):
+        while todo and len(outstanding[i]) < capacity:
+            filename = todo.popleft()
+            try:
+                conns[i].send(filename)
+            except OSError:
+                todo.appendleft(filename)
+                return
+            outstanding[i].add(filename)
 
-async def main(args, device, f0p, use_diff, sub_num_workers, debug):
     with logger.Progress() as progress:
-        # 这个脚本纯粹为了快，并没有做异常处理
-        logger.warning(
-            "NOTICE: This script is only for fast preprocessing, no error handling."
-        )
-        # print(speech_encoder)
-        logger.info("Using device: " + str(device))
-
-        logger.info("Using f0 extractor: " + f0p)
-
-        # 读取 train 和 val 的 filelist 分成 num_processes 块，输出到filelists/{timestramp}/chunk-n.txt 文件夹不存在时创建
-        # Create the directory for filelists
-        timestamp = str(int(time.time()))
-        tmp_path = f"filelists/{timestamp}"
-        os.makedirs(tmp_path, exist_ok=True)
-
-        # Read train and val filelists
-        with open(args.train_filelist, "r", encoding="utf-8") as train_file:
-            train_lines = train_file.readlines()
-
-        with open(args.val_filelist, "r", encoding="utf-8") as val_file:
-            val_lines = val_file.readlines()
-
-        # 计算每个进程需要处理的行数
-        num_train_lines = len(train_lines)
-        num_val_lines = len(val_lines)
-
-        # 确保切割后的行数正确，并处理可能的剩余行
-        lines_per_chunk_train = len(train_lines) // args.num_processes
-        lines_per_chunk_val = len(val_lines) // args.num_processes
-
-        # 分割 train filelist 到 chunks
-        for i in range(args.num_processes):
-            start_idx = i * lines_per_chunk_train
-            end_idx = (
-                start_idx + lines_per_chunk_train
-                if i < args.num_processes - 1
-                else len(train_lines)
-            )
-
-            train_chunk = train_lines[start_idx:end_idx]
-
-            with open(
-                f"filelists/{timestamp}/chunk-{i}.txt", "w", encoding="utf-8"
-            ) as chunk_file:
-                chunk_file.writelines(train_chunk)
-
-        # 分割 val filelist 到 chunks
-        for i in range(args.num_processes):
-            start_idx = i * lines_per_chunk_val
-            end_idx = (
-                start_idx + lines_per_chunk_val
-                if i < args.num_processes - 1
-                else len(val_lines)
-            )
+        taskid = progress.add_task("Preprocessing", total=len(filenames))
+
+        def on_result(i, filename, error):
+            outstanding[i].discard(filename)
+            if error is not None:
+                attempts[filename] = attempts.get(filename, 0) + 1
+                if attempts[filename] <= args.max_retries:
+                    logger.warning(
+                        f"Failed to process {filename}, retrying ({attempts[filename]}/{args.max_retries})"
+                    )
+                    if debug:
+                        print(error)
+                    todo.append(filename)
+                    return
+                failed[filename] = error
+            finished.add(filename)
+            progress.advance(taskid)
 
-            val_chunk = val_lines[start_idx:end_idx]
-
-            with open(
-                f"filelists/{timestamp}/chunk-{i}.txt", "a", encoding="utf-8"
-            ) as chunk_file:
-                chunk_file.writelines(val_chunk)
-        filelists = []
-        for root, dirs, files in os.walk(tmp_path):
-            for file in files:
-                if file.endswith(".txt"):
-                    filelists.append(os.path.join(root, file))
-        tasks = []
-        print(filelists)
-        # exit(0)
-        num_files = num_train_lines + num_val_lines
-        taskid = progress.add_task("Preprocessing", total=num_files)
-        for filelist in filelists:
-            command = f"{PYPATH} -m SoVITS.preprocess_chunk --f0_predictor {f0p} --filelist {filelist}"
-            if use_diff:
-                command += " --use_diff"
-            tasks.append(
-                exec_it(
-                    command,
-                    callback=get_callback(filelist, debug, progress, taskid),
-                )
+        def drain(i):
+            while conns[i].poll():
+                try:
+                    on_result(i, *conns[i].recv())
+                except EOFError:
+                    break
+
+        for i in alive:
+            feed(i)
+        while len(finished) < len(filenames) and alive:
+            ready = wait(
+                [conns[i] for i in alive] + [workers[i].sentinel for i in alive]
             )
-        await asyncio.gather(*tasks)
-
-    # Delete the temporary filelists directory
-    shutil.rmtree(tmp_path)
+            for i in list(alive):
+                if conns[i] in ready:
+                    drain(i)
+                if workers[i].sentinel in ready:
+                    drain(i)
+                    workers[i].join()
+                    # 不知道是哪个文件导致的，正在处理的都算失败一次
+                    for filename in list(outstanding[i]):
+                        on_result(
+                            i,
+                            filename,
+                            f"worker {i} exited with code {workers[i].exitcode}",
+                        )
+                    if restarts > 0 and len(finished) < len(filenames):
+                        restarts -= 1
+                        logger.warning(f"Worker {i} exited, restarting")
+                        start_worker(i)
+                    else:
+                        alive.discard(i)
+            for i in alive:
+                feed(i)
+
+    for filename in filenames:
+        if filename not in finished:
+            failed[filename] = "no worker left"
+    for i in alive:
+        try:
+            conns[i].send(None)
+        except OSError:
+            pass
+    for p in workers:
+        p.join(timeout=10)
+        if p.is_alive():
+            p.terminate()
+
+    if failed:
+        logger.error(f"{len(failed)} file(s) failed to preprocess:")
+        for filename, error in failed.items():
+            last_line = (error.strip().splitlines() or ["unknown error"])[-1]
+            logger.error(f"{filename}: {last_line}")
 
 
 if __name__ == "__main__":
@@ -184,7 +204,19 @@ if __name__ == "__main__":
         "--subprocess_num_workers",
         type=int,
         default=1,
-        help="Number of workers to use for ThreadPoolExecutor",
+        help="Number of CPU workers per process for loading and writing files",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=8,
+        help="Number of files encoded together on the GPU in each process",
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=2,
+        help="Times to retry a file that failed to preprocess",
     )
     parser.add_argument(
         "--debug", action="store_true", help="Whether print subprocess output"
@@ -200,13 +232,11 @@ if __name__ == "__main__":
     use_diff = args.use_diff
     debug = args.debug
     # debug = True
-    asyncio.run(
-        main(
-            args=args,
-            device=device,
-            f0p=f0p,
-            use_diff=use_diff,
-            debug=debug,
-            sub_num_workers=args.subprocess_num_workers,
-        )
+    main(
+        args=args,
+        device=device,
+        f0p=f0p,
+        use_diff=use_diff,
+        debug=debug,
+        sub_num_workers=args.subprocess_num_workers,
     )
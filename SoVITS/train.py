@@ -14,7 +14,13 @@ from torch.utils.data import DataLoader
 from torch.utils.tensorboard import SummaryWriter
 
 from SoVITS import utils
-from SoVITS.data_utils import TextAudioCollate, TextAudioSpeakerLoader
+from SoVITS.data_utils import (
+    DistributedBucketSampler,
+    ShardedAudioSpeakerLoader,
+    TextAudioCollate,
+    TextAudioSpeakerLoader,
+    load_shard_index,
+)
 from SoVITS.models import (
     MultiPeriodDiscriminator,
     SynthesizerTrn,
@@ -80,9 +86,19 @@ def run(rank, n_gpus, hps):
     torch.cuda.set_device(rank)
     collate_fn = TextAudioCollate()
     all_in_mem = hps.train.all_in_mem  # If you have enough memory, turn on this option to avoid disk IO and speed up training.
-    train_dataset = TextAudioSpeakerLoader(
-        hps.data.training_files, hps, all_in_mem=all_in_mem
-    )
+    # 有打包好的 shard 时直接 memmap 读取，不需要 all_in_mem
+    train_index = load_shard_index(hps.data.training_files, hps)
+    if train_index is not None:
+        if rank == 0:
+            logger.info("Using packed feature shards for training data")
+        all_in_mem = False
+        train_dataset = ShardedAudioSpeakerLoader(
+            hps.data.training_files, hps, index=train_index
+        )
+    else:
+        train_dataset = TextAudioSpeakerLoader(
+            hps.data.training_files, hps, all_in_mem=all_in_mem
+        )
     num_workers = (
         hps.train.num_workers
         if hasattr(hps.train, "num_workers")
@@ -92,19 +108,33 @@ def run(rank, n_gpus, hps):
     )
     if all_in_mem:
         num_workers = 1
+    # 按长度分桶组 batch，减少补零
+    train_sampler = DistributedBucketSampler(
+        train_dataset.get_frame_lengths(),
+        hps.train.batch_size,
+        num_replicas=n_gpus,
+        rank=rank,
+        shuffle=True,
+        seed=hps.train.seed,
+    )
     train_loader = DataLoader(
         train_dataset,
         num_workers=num_workers,
-        shuffle=False,
         pin_memory=True,
         persistent_workers=True,
-        batch_size=hps.train.batch_size,
+        batch_sampler=train_sampler,
         collate_fn=collate_fn,
     )
     if rank == 0:
-        eval_dataset = TextAudioSpeakerLoader(
-            hps.data.validation_files, hps, all_in_mem=all_in_mem, vol_aug=False
-        )
+        eval_index = load_shard_index(hps.data.validation_files, hps)
+        if eval_index is not None:
+            eval_dataset = ShardedAudioSpeakerLoader(
+                hps.data.validation_files, hps, index=eval_index, vol_aug=False
+            )
+        else:
+            eval_dataset = TextAudioSpeakerLoader(
+                hps.data.validation_files, hps, all_in_mem=all_in_mem, vol_aug=False
+            )
         eval_loader = DataLoader(
             eval_dataset,
             num_workers=1,
@@ -249,8 +279,10 @@ def train_and_evaluate(
 
     half_type = torch.bfloat16 if hps.train.half_type == "bf16" else torch.float16
 
-    # train_loader.batch_sampler.set_epoch(epoch)
+    train_loader.batch_sampler.set_epoch(epoch)
     global global_step
+    # 统计 log_interval 内的有效帧数和补零后的帧数
+    real_frames = padded_frames = n_steps = 0
 
     net_g.train()
     net_d.train()
@@ -261,6 +293,9 @@ def train_and_evaluate(
     for batch_idx, items in enumerated_train_loader:
         # logger.info(f"finish {progress.} ")
         c, f0, spec, y, spk, lengths, uv, volume = items
+        real_frames += int(lengths.sum())
+        padded_frames += lengths.numel() * spec.size(2)
+        n_steps += 1
         g = spk.cuda(rank, non_blocking=True)
         spec, y = spec.cuda(rank, non_blocking=True), y.cuda(rank, non_blocking=True)
         c = c.cuda(rank, non_blocking=True)
@@ -380,6 +415,13 @@ def train_and_evaluate(
                         "loss/g/lf0": loss_lf0,
                     }
                 )
+                scalar_dict.update(
+                    {
+                        "data/padding_efficiency": real_frames / max(padded_frames, 1),
+                        "data/real_frames_per_step": real_frames / n_steps,
+                    }
+                )
+                real_frames = padded_frames = n_steps = 0
 
                 # scalar_dict.update({"loss/g/{}".format(i): v for i, v in enumerate(losses_gen)})
                 # scalar_dict.update({"loss/d_r/{}".format(i): v for i, v in enumerate(losses_disc_r)})
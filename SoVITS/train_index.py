@@ -3,6 +3,7 @@ import os
 import pickle
 
 from . import utils
+from .feature_index import INDEX_DIR_NAME, save_feature_index
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -31,5 +32,10 @@ if __name__ == "__main__":
         index = utils.train_index(k, args.root_dir)
         result[v] = index
 
-    with open(os.path.join(args.output_dir, "feature_and_index.pkl"), "wb") as f:
+    pkl_path = os.path.join(args.output_dir, "feature_and_index.pkl")
+    with open(pkl_path, "wb") as f:
         pickle.dump(result, f)
+    # 同时写一份 faiss 原生格式，推理时直接 mmap 加载
+    save_feature_index(
+        result, os.path.join(args.output_dir, INDEX_DIR_NAME), pkl_path
+    )
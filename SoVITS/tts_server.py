@@ -2,6 +2,7 @@ import asyncio
 import io
 import os
 import sys
+import threading
 
 import numpy as np
 import soundfile
@@ -9,7 +10,8 @@ from fastapi import FastAPI
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 
-from SoVITS.inference import infer_tool, slicer
+from ddspsvc import slicer
+from SoVITS.inference import infer_tool
 
 from . import logger
 
@@ -18,6 +20,7 @@ app = FastAPI()
 model_name = "logs/44k-1/G_14500.pth"  # 模型地址
 config_name = "logs/44k-1/config-an.json"  # config地址
 svc_model = infer_tool.Svc(model_name, config_name)
+svc_lock = threading.Lock()
 
 
 class RequestBody(BaseModel):
@@ -50,6 +53,17 @@ async def tts(spk, req: RequestBody):
     await tts_process.wait()
     # audio_path = f"tmp/tts-4798745368944844903.wav"
 
+    # 推理放到线程里跑，不阻塞事件循环；模型只有一份，用锁串行
+    await asyncio.to_thread(convert, spk, tran, audio_path, wav_format)
+    return {"status": "success", "src": "/wav/" + str(unique_value)}
+
+
+def convert(spk, tran, audio_path, wav_format):
+    with svc_lock:
+        _convert(spk, tran, audio_path, wav_format)
+
+
+def _convert(spk, tran, audio_path, wav_format):
     infer_tool.format_wav(audio_path)
     chunks = slicer.cut(audio_path, db_thresh=-40)
     audio_data, audio_sr = slicer.chunks2audio(audio_path, chunks)
@@ -78,5 +92,3 @@ async def tts(spk, req: RequestBody):
         audio.extend(list(infer_tool.pad_array(_audio, length)))
     out_wav_path = audio_path
     soundfile.write(out_wav_path, audio, svc_model.target_sample, format=wav_format)
-
-    return {"status": "success", "src": "/wav/" + str(unique_value)}
@@ -1,6 +1,7 @@
 import torch
 from fairseq import checkpoint_utils
 
+from ddspsvc.ddsp.core import fairseq_hubert_batch
 from SoVITS.vencoder.encoder import SpeechEncoder
 
 
@@ -42,3 +43,6 @@ class CNHubertLarge(SpeechEncoder):
         with torch.no_grad():
             logits = self.model.extract_features(**inputs)
         return logits[0].transpose(1, 2)
+
+    def encoder_batch(self, wavs):
+        return [u.transpose(1, 2) for u in fairseq_hubert_batch(self.model, wavs)]
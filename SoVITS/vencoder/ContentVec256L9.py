@@ -1,6 +1,7 @@
 import torch
 from fairseq import checkpoint_utils
 
+from ddspsvc.ddsp.core import fairseq_hubert_batch
 from SoVITS.vencoder.encoder import SpeechEncoder
 
 
@@ -44,3 +45,8 @@ class ContentVec256L9(SpeechEncoder):
             logits = self.model.extract_features(**inputs)
             feats = self.model.final_proj(logits[0])
         return feats.transpose(1, 2)
+
+    def encoder_batch(self, wavs):
+        units = fairseq_hubert_batch(self.model, wavs, output_layer=9)
+        with torch.no_grad():
+            return [self.model.final_proj(u).transpose(1, 2) for u in units]
@@ -1,6 +1,7 @@
 import torch
 from fairseq import checkpoint_utils
 
+from ddspsvc.ddsp.core import fairseq_hubert_batch
 from SoVITS import logger
 from SoVITS.vencoder.encoder import SpeechEncoder
 
@@ -43,3 +44,7 @@ class ContentVec768L12(SpeechEncoder):
         with torch.no_grad():
             logits = self.model.extract_features(**inputs)
         return logits[0].transpose(1, 2)
+
+    def encoder_batch(self, wavs):
+        units = fairseq_hubert_batch(self.model, wavs, output_layer=12)
+        return [u.transpose(1, 2) for u in units]
@@ -12,3 +12,10 @@ class SpeechEncoder(object):
         output: embedding:[batchsize,hidden_dim,wav_frame]
         """
         pass
+
+    def encoder_batch(self, wavs):
+        """
+        input: wavs: list of [signal_length]
+        output: list of embedding:[1,hidden_dim,wav_frame]
+        """
+        return [self.encoder(wav) for wav in wavs]
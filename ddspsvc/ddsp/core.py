@@ -1,9 +1,15 @@
+import threading
+
 import torch
 import torch.nn as nn
 from torch.nn import functional as F
+from torchaudio.transforms import Resample
 
 import numpy as np
 
+RESAMPLE_KERNEL = {}
+_resample_kernel_lock = threading.Lock()
+
 
 def MaskedAvgPool1d(x, kernel_size):
     x = x.unsqueeze(1)
@@ -77,6 +83,199 @@ def upsample(signal, factor):
     return signal.permute(0, 2, 1)
 
 
+def rms_envelope(audio, hop_size):
+    """
+    Frame-wise RMS volume, frame n being the mean of audio**2 over
+    [int(n * hop_size), int((n + 1) * hop_size)) of the reflect-padded signal.
+    Window sums come from one cumulative sum, so hop_size may be fractional.
+    audio: 1d numpy array, or a torch tensor (..., T) computed on its own device
+    """
+    pad = (int(hop_size // 2), int((hop_size + 1) // 2))
+    if isinstance(audio, torch.Tensor):
+        n_frames = int(audio.size(-1) // hop_size) + 1
+        shape = audio.shape[:-1]
+        audio2 = audio.reshape(-1, audio.size(-1)).double() ** 2
+        audio2 = F.pad(audio2, pad, mode="reflect")
+        cumsum = F.pad(torch.cumsum(audio2, -1), (1, 0))
+        frames = torch.arange(n_frames + 1, device=audio.device, dtype=torch.float64)
+        bounds = torch.clamp((frames * hop_size).long(), max=audio2.size(-1))
+        sums = cumsum[:, bounds[1:]] - cumsum[:, bounds[:-1]]
+        volume = sums.clamp(min=0) / (bounds[1:] - bounds[:-1])
+        return volume.sqrt().to(audio.dtype).reshape(*shape, n_frames)
+
+    n_frames = int(len(audio) // hop_size) + 1
+    audio2 = audio**2
+    dtype = audio2.dtype
+    audio2 = np.pad(audio2.astype(np.float64), pad, mode="reflect")
+    cumsum = np.concatenate(([0.0], np.cumsum(audio2)))
+    bounds = np.minimum(
+        (np.arange(n_frames + 1) * hop_size).astype(np.int64), len(audio2)
+    )
+    sums = cumsum[bounds[1:]] - cumsum[bounds[:-1]]
+    volume = np.maximum(sums, 0) / (bounds[1:] - bounds[:-1])
+    return np.sqrt(volume).astype(dtype)
+
+
+def volume_gate(volume, threshold_db, block_size, device="cpu", radius=4):
+    """
+    Sample-level gate for silencing the output: frames whose volume exceeds
+    threshold_db, dilated by radius frames on each side (edges held), then
+    linearly upsampled by block_size as upsample() does.
+    volume: 1d numpy array or tensor of frame volumes
+    returns: float tensor (1, n_frames * block_size) on device
+    """
+    volume = torch.as_tensor(volume).to(device)
+    mask = (volume > 10 ** (float(threshold_db) / 20)).float().view(1, 1, -1)
+    # sliding max over 2 * radius + 1 frames
+    mask = F.pad(mask, (radius, radius), mode="replicate")
+    mask = F.max_pool1d(mask, 2 * radius + 1, stride=1).view(-1)
+    # upsample(): sample k * block_size + r ramps from frame k towards frame k + 1,
+    # written as an outer product instead of a generic interpolate
+    block_size = int(block_size)
+    step = torch.cat((mask[1:], mask[-1:])) - mask
+    ramp = torch.arange(block_size, device=mask.device, dtype=mask.dtype) / block_size
+    return (mask[:, None] + step[:, None] * ramp).view(1, -1)
+
+
+def interp_unvoiced(f0):
+    """
+    Fill unvoiced (zero) frames by linear interpolation between the nearest
+    voiced frames, holding the edge values outside them, like np.interp.
+    f0: numpy array (..., n_frames); leading dims are a batch, rows without
+    any voiced frame are returned unchanged
+    """
+    f0 = np.asarray(f0)
+    n = f0.shape[-1]
+    voiced = f0 != 0
+    index = np.arange(n)
+    prev = np.maximum.accumulate(np.where(voiced, index, -1), axis=-1)
+    next_ = np.flip(
+        np.minimum.accumulate(np.flip(np.where(voiced, index, n), -1), axis=-1), -1
+    )
+    prev, next_ = np.where(prev >= 0, prev, next_), np.where(next_ < n, next_, prev)
+    has_voiced = (prev >= 0) & (prev < n)
+    prev = np.clip(prev, 0, n - 1)
+    next_ = np.clip(next_, 0, n - 1)
+    f0_prev = np.take_along_axis(f0, prev, -1).astype(np.float64)
+    f0_next = np.take_along_axis(f0, next_, -1).astype(np.float64)
+    span = np.maximum(next_ - prev, 1)
+    filled = f0_prev + (index - prev) * (f0_next - f0_prev) / span
+    return np.where(voiced | ~has_voiced, f0, filled).astype(f0.dtype)
+
+
+def align_f0_grid(f0, src_period, hop_size, sample_rate, n_frames, mode="interp"):
+    """
+    Map an f0 curve sampled every `src_period` seconds onto the model frame
+    grid (hop_size / sample_rate seconds per frame).
+    mode="nearest": pick the closest source frame (crepe)
+    mode="interp": fill unvoiced frames, interpolate linearly, then re-apply
+        the voicing decision on the new grid (rmvpe, fcpe)
+    f0: numpy array (..., T); leading dims are a batch aligned in one call
+    """
+    f0 = np.asarray(f0)
+    if mode == "nearest":
+        index = np.round(np.arange(n_frames) * hop_size / sample_rate / src_period)
+        index = np.minimum(index.astype(np.int64), f0.shape[-1] - 1)
+        return f0[..., index]
+    if mode != "interp":
+        raise ValueError(f" [x] Unknown f0 grid alignment: {mode}")
+
+    uv = f0 == 0
+    f0 = interp_unvoiced(f0)
+    origin_time = src_period * np.arange(f0.shape[-1])
+    target_time = hop_size / sample_rate * np.arange(n_frames)
+    if f0.shape[-1] < 2:
+        f0 = np.repeat(f0[..., :1].astype(np.float64), n_frames, -1)
+        uv = np.repeat(uv[..., :1], n_frames, -1)
+        f0[uv] = 0
+        return f0
+
+    # 源网格是等间隔的，所有行共用同一组插值下标和权重
+    left = np.clip(np.searchsorted(origin_time, target_time, "right") - 1, 0, None)
+    left = np.minimum(left, f0.shape[-1] - 2)
+    right = left + 1
+    weight = (target_time - origin_time[left]) / (
+        origin_time[right] - origin_time[left]
+    )
+    weight = np.clip(weight, 0, 1)
+
+    def interp(x):
+        x = x.astype(np.float64)
+        return x[..., left] + weight * (x[..., right] - x[..., left])
+
+    f0 = interp(f0)
+    f0[interp(uv) > 0.5] = 0
+    return f0
+
+
+def fairseq_hubert_batch(model, wavs, output_layer=None):
+    """
+    fairseq HuBERT 系模型的批量前向，返回每条的 [1, wav_frame, hidden_dim]
+
+    卷积特征提取逐条做（default 模式的 GroupNorm 沿时间统计，补零会改变结果），
+    之后把帧补齐，带 padding_mask 一起过 transformer
+    """
+    with torch.no_grad():
+        features = [
+            model.forward_features(wav.view(1, -1)).transpose(1, 2)[0] for wav in wavs
+        ]
+        lengths = torch.tensor([len(f) for f in features], device=features[0].device)
+        x = torch.nn.utils.rnn.pad_sequence(features, batch_first=True)
+        padding_mask = (
+            torch.arange(x.shape[1], device=x.device)[None, :] >= lengths[:, None]
+        )
+        x = model.layer_norm(x)
+        if model.post_extract_proj is not None:
+            x = model.post_extract_proj(x)
+        x, _ = model.encoder(
+            x,
+            padding_mask=padding_mask,
+            layer=None if output_layer is None else output_layer - 1,
+        )
+    return [x[i : i + 1, :n] for i, n in enumerate(lengths.tolist())]
+
+
+def get_resampler(
+    orig_freq, new_freq, lowpass_filter_width=6, device="cpu", dtype=None
+):
+    """
+    Process-wide Resample modules, one per
+    (orig_freq, new_freq, lowpass_filter_width, dtype, device), so the
+    windowed-sinc kernel is built once instead of on every call.
+    The returned module is shared: use it, don't move or modify it.
+    """
+    device = torch.device(device)
+    key = (int(orig_freq), int(new_freq), lowpass_filter_width, dtype, str(device))
+    resampler = RESAMPLE_KERNEL.get(key)
+    if resampler is None:
+        with _resample_kernel_lock:
+            resampler = RESAMPLE_KERNEL.get(key)
+            if resampler is None:
+                resampler = Resample(
+                    int(orig_freq),
+                    int(new_freq),
+                    lowpass_filter_width=lowpass_filter_width,
+                )
+                if dtype is not None:
+                    resampler = resampler.to(dtype)
+                resampler = resampler.to(device)
+                RESAMPLE_KERNEL[key] = resampler
+    return resampler
+
+
+def resample(audio, orig_freq, new_freq, lowpass_filter_width=6):
+    """Resample a tensor (..., T) with the cached kernel for its device and dtype"""
+    if orig_freq == new_freq:
+        return audio
+    return get_resampler(
+        orig_freq,
+        new_freq,
+        lowpass_filter_width=lowpass_filter_width,
+        device=audio.device,
+        dtype=audio.dtype,
+    )(audio)
+
+
 def remove_above_fmax(amplitudes, pitch, fmax, level_start=1):
     n_harm = amplitudes.shape[-1]
     pitches = pitch * torch.arange(level_start, n_harm + level_start).to(pitch)
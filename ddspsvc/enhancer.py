@@ -3,7 +3,7 @@ import torch
 import torch.nn.functional as F
 from ddspsvc.nsf_hifigan.nvSTFT import STFT
 from ddspsvc.nsf_hifigan.models import load_model
-from torchaudio.transforms import Resample
+from ddspsvc.ddsp.core import get_resampler
 
 
 class Enhancer:
@@ -17,7 +17,6 @@ class Enhancer:
         else:
             raise ValueError(f" [x] Unknown enhancer: {enhancer_type}")
 
-        self.resample_kernel = {}
         self.enhancer_sample_rate = self.enhancer.sample_rate()
         self.enhancer_hop_size = self.enhancer.hop_size()
 
@@ -54,12 +53,12 @@ class Enhancer:
         if sample_rate == adaptive_sample_rate:
             audio_res = audio
         else:
-            key_str = str(sample_rate) + str(adaptive_sample_rate)
-            if key_str not in self.resample_kernel:
-                self.resample_kernel[key_str] = Resample(
-                    sample_rate, adaptive_sample_rate, lowpass_filter_width=128
-                ).to(self.device)
-            audio_res = self.resample_kernel[key_str](audio)
+            audio_res = get_resampler(
+                sample_rate,
+                adaptive_sample_rate,
+                lowpass_filter_width=128,
+                device=self.device,
+            )(audio)
 
         n_frames = int(audio_res.size(-1) // self.enhancer_hop_size + 1)
 
@@ -89,12 +88,12 @@ class Enhancer:
 
         # resample the enhanced output
         if adaptive_sample_rate != enhancer_sample_rate:
-            key_str = str(adaptive_sample_rate) + str(enhancer_sample_rate)
-            if key_str not in self.resample_kernel:
-                self.resample_kernel[key_str] = Resample(
-                    adaptive_sample_rate, enhancer_sample_rate, lowpass_filter_width=128
-                ).to(self.device)
-            enhanced_audio = self.resample_kernel[key_str](enhanced_audio)
+            enhanced_audio = get_resampler(
+                adaptive_sample_rate,
+                enhancer_sample_rate,
+                lowpass_filter_width=128,
+                device=self.device,
+            )(enhanced_audio)
 
         # pad the silence frames
         if start_frame > 0:
@@ -8,7 +8,7 @@ from flask import Flask, request, send_file
 from flask_cors import CORS
 
 from ddspsvc.ddsp.vocoder import load_model, F0_Extractor, Volume_Extractor, Units_Encoder
-from ddspsvc.ddsp.core import upsample
+from ddspsvc.ddsp.core import volume_gate
 from ddspsvc.enhancer import Enhancer
 
 
@@ -110,11 +110,7 @@ class SvcDDSP:
         # extract volume
         volume_extractor = Volume_Extractor(hop_size)
         volume = volume_extractor.extract(audio)
-        mask = (volume > 10 ** (float(self.threhold) / 20)).astype('float')
-        mask = np.pad(mask, (4, 4), constant_values=(mask[0], mask[-1]))
-        mask = np.array([np.max(mask[n : n + 9]) for n in range(len(mask) - 8)])
-        mask = torch.from_numpy(mask).float().to(self.device).unsqueeze(-1).unsqueeze(0)
-        mask = upsample(mask, self.args.data.block_size).squeeze(-1)
+        mask = volume_gate(volume, self.threhold, self.args.data.block_size, self.device)
         volume = torch.from_numpy(volume).float().to(self.device).unsqueeze(-1).unsqueeze(0)
 
         # extract units
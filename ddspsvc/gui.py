@@ -6,14 +6,13 @@ import pickle
 from ddspsvc.enhancer import Enhancer
 import numpy as np
 from torch.nn import functional as F
-from torchaudio.transforms import Resample
 from ddspsvc.ddsp.vocoder import (
     load_model,
     F0_Extractor,
     Volume_Extractor,
     Units_Encoder,
 )
-from ddspsvc.ddsp.core import upsample
+from ddspsvc.ddsp.core import get_resampler, volume_gate
 import time
 from . import gui_locale
 
@@ -136,11 +135,7 @@ class SvcDDSP:
         # extract volume
         volume_extractor = Volume_Extractor(hop_size)
         volume = volume_extractor.extract(audio)
-        mask = (volume > 10 ** (float(threhold) / 20)).astype("float")
-        mask = np.pad(mask, (4, 4), constant_values=(mask[0], mask[-1]))
-        mask = np.array([np.max(mask[n : n + 9]) for n in range(len(mask) - 8)])
-        mask = torch.from_numpy(mask).float().to(self.device).unsqueeze(-1).unsqueeze(0)
-        mask = upsample(mask, self.args.data.block_size).squeeze(-1)
+        mask = volume_gate(volume, threhold, self.args.data.block_size, self.device)
         volume = (
             torch.from_numpy(volume).float().to(self.device).unsqueeze(-1).unsqueeze(0)
         )
@@ -235,7 +230,6 @@ class GUI:
             "fcpe",
         ]  # F0预测器
         self.f_safe_prefix_pad_length: float = 0.0
-        self.resample_kernel = {}
         self.stream = None
         self.input_devices = None
         self.output_devices = None
@@ -604,12 +598,12 @@ class GUI:
         """
 
         if _model_sr != self.config.samplerate:
-            key_str = str(_model_sr) + "_" + str(self.config.samplerate)
-            if key_str not in self.resample_kernel:
-                self.resample_kernel[key_str] = Resample(
-                    _model_sr, self.config.samplerate, lowpass_filter_width=128
-                ).to(self.device)
-            _audio = self.resample_kernel[key_str](_audio)
+            _audio = get_resampler(
+                _model_sr,
+                self.config.samplerate,
+                lowpass_filter_width=128,
+                device=self.device,
+            )(_audio)
         temp_wav = _audio[
             -self.block_frame
             - self.crossfade_frame
@@ -13,7 +13,7 @@ from ddspsvc.ddsp.vocoder import (
     Volume_Extractor,
     Units_Encoder,
 )
-from ddspsvc.ddsp.core import upsample
+from ddspsvc.ddsp.core import volume_gate
 from ddspsvc.diffusion.vocoder import load_model_vocoder
 from tqdm import tqdm
 
@@ -266,11 +266,7 @@ if __name__ == "__main__":
     print("Extracting the volume envelope of the input audio...")
     volume_extractor = Volume_Extractor(hop_size)
     volume = volume_extractor.extract(audio)
-    mask = (volume > 10 ** (float(cmd.threhold) / 20)).astype("float")
-    mask = np.pad(mask, (4, 4), constant_values=(mask[0], mask[-1]))
-    mask = np.array([np.max(mask[n : n + 9]) for n in range(len(mask) - 8)])
-    mask = torch.from_numpy(mask).float().to(device).unsqueeze(-1).unsqueeze(0)
-    mask = upsample(mask, args.data.block_size).squeeze(-1)
+    mask = volume_gate(volume, cmd.threhold, args.data.block_size, device)
     volume = torch.from_numpy(volume).float().to(device).unsqueeze(-1).unsqueeze(0)
 
     # load units encoder
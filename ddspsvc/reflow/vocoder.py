@@ -5,7 +5,7 @@ import torch.nn as nn
 import torch.nn.functional as F
 from ddspsvc.nsf_hifigan.nvSTFT import STFT
 from ddspsvc.nsf_hifigan.models import load_model, load_config
-from torchaudio.transforms import Resample
+from ddspsvc.ddsp.core import get_resampler
 from .reflow import RectifiedFlow
 from .naive_v2_diff import NaiveV2Diff
 from ddspsvc.ddsp.vocoder import CombSubSuperFast
@@ -67,7 +67,6 @@ class Vocoder:
         else:
             raise ValueError(f" [x] Unknown vocoder: {vocoder_type}")
 
-        self.resample_kernel = {}
         self.vocoder_sample_rate = self.vocoder.sample_rate()
         self.vocoder_hop_size = self.vocoder.hop_size()
         self.dimension = self.vocoder.dimension()
@@ -77,12 +76,12 @@ class Vocoder:
         if sample_rate == self.vocoder_sample_rate or sample_rate == 0:
             audio_res = audio
         else:
-            key_str = str(sample_rate)
-            if key_str not in self.resample_kernel:
-                self.resample_kernel[key_str] = Resample(
-                    sample_rate, self.vocoder_sample_rate, lowpass_filter_width=128
-                ).to(self.device)
-            audio_res = self.resample_kernel[key_str](audio)
+            audio_res = get_resampler(
+                sample_rate,
+                self.vocoder_sample_rate,
+                lowpass_filter_width=128,
+                device=self.device,
+            )(audio)
 
         # extract
         mel = self.vocoder.extract(audio_res, keyshift=keyshift)  # B, n_frames, bins
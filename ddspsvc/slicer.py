@@ -1,8 +1,20 @@
 import librosa
+import numpy as np
 import torch
 import torchaudio
 
 
+def silence_runs(rms_list, threshold):
+    """
+    Find the runs of consecutive frames whose RMS is below `threshold`.
+    Returns (starts, ends) where each run covers frames [start, end).
+    """
+    silent = np.zeros(len(rms_list) + 2, dtype=np.int8)
+    silent[1:-1] = rms_list < threshold
+    edges = np.flatnonzero(np.diff(silent))
+    return edges[0::2], edges[1::2]
+
+
 class Slicer:
     def __init__(
         self,
@@ -39,6 +51,73 @@ class Slicer:
                 begin * self.hop_size : min(waveform.shape[0], end * self.hop_size)
             ]
 
+    def get_rms(self, samples):
+        return librosa.feature.rms(
+            y=samples, frame_length=self.win_size, hop_length=self.hop_size
+        ).squeeze(0)
+
+    def tag_silence(self, rms_list, silence_start, i, clip_start, offset=0):
+        """
+        Decide what to cut out of the silent run [silence_start, i), where
+        frame `i` is the first voiced frame after it. rms_list[0] is frame
+        `offset`. Returns (tag or None, new clip_start).
+        """
+
+        def argmin(begin, end):
+            return int(rms_list[begin - offset : end - offset].argmin()) + begin
+
+        # Clear recorded silence start if interval is not enough or clip is too short
+        is_leading_silence = silence_start == 0 and i > self.max_sil_kept
+        need_slice_middle = (
+            i - silence_start >= self.min_interval
+            and i - clip_start >= self.min_length
+        )
+        if not is_leading_silence and not need_slice_middle:
+            return None, clip_start
+        # Need slicing. Record the range of silent frames to be removed.
+        if i - silence_start <= self.max_sil_kept:
+            pos = argmin(silence_start, i + 1)
+            if silence_start == 0:
+                return (0, pos), pos
+            return (pos, pos), pos
+        pos_l = argmin(silence_start, silence_start + self.max_sil_kept + 1)
+        pos_r = argmin(i - self.max_sil_kept, i + 1)
+        if silence_start == 0:
+            return (0, pos_r), pos_r
+        if i - silence_start <= self.max_sil_kept * 2:
+            pos = argmin(i - self.max_sil_kept, silence_start + self.max_sil_kept + 1)
+            return (min(pos_l, pos), max(pos_r, pos)), max(pos_r, pos)
+        return (pos_l, pos_r), pos_r
+
+    def tag_trailing_silence(self, rms_list, silence_start, total_frames, offset=0):
+        if total_frames - silence_start < self.min_interval:
+            return None
+        silence_end = min(total_frames, silence_start + self.max_sil_kept)
+        pos = rms_list[silence_start - offset : silence_end + 1 - offset].argmin()
+        return (int(pos) + silence_start, total_frames + 1)
+
+    def get_sil_tags(self, rms_list):
+        """
+        Silent ranges to cut, in frames. Silent runs are found with one
+        vectorized pass; only the runs themselves, not every frame, go
+        through the Python state machine.
+        """
+        total_frames = rms_list.shape[0]
+        sil_tags = []
+        clip_start = 0
+        for silence_start, i in zip(*silence_runs(rms_list, self.threshold)):
+            silence_start, i = int(silence_start), int(i)
+            if i == total_frames:
+                # Deal with trailing silence.
+                tag = self.tag_trailing_silence(rms_list, silence_start, total_frames)
+            else:
+                tag, clip_start = self.tag_silence(
+                    rms_list, silence_start, i, clip_start
+                )
+            if tag is not None:
+                sil_tags.append(tag)
+        return sil_tags
+
     # @timeit
     def slice(self, waveform):
         if len(waveform.shape) > 1:
@@ -47,88 +126,7 @@ class Slicer:
             samples = waveform
         if samples.shape[0] <= self.min_length:
             return {"0": {"slice": False, "split_time": f"0,{len(waveform)}"}}
-        rms_list = librosa.feature.rms(
-            y=samples, frame_length=self.win_size, hop_length=self.hop_size
-        ).squeeze(0)
-        sil_tags = []
-        silence_start = None
-        clip_start = 0
-        for i, rms in enumerate(rms_list):
-            # Keep looping while frame is silent.
-            if rms < self.threshold:
-                # Record start of silent frames.
-                if silence_start is None:
-                    silence_start = i
-                continue
-            # Keep looping while frame is not silent and silence start has not been recorded.
-            if silence_start is None:
-                continue
-            # Clear recorded silence start if interval is not enough or clip is too short
-            is_leading_silence = silence_start == 0 and i > self.max_sil_kept
-            need_slice_middle = (
-                i - silence_start >= self.min_interval
-                and i - clip_start >= self.min_length
-            )
-            if not is_leading_silence and not need_slice_middle:
-                silence_start = None
-                continue
-            # Need slicing. Record the range of silent frames to be removed.
-            if i - silence_start <= self.max_sil_kept:
-                pos = rms_list[silence_start : i + 1].argmin() + silence_start
-                if silence_start == 0:
-                    sil_tags.append((0, pos))
-                else:
-                    sil_tags.append((pos, pos))
-                clip_start = pos
-            elif i - silence_start <= self.max_sil_kept * 2:
-                pos = rms_list[
-                    i - self.max_sil_kept : silence_start + self.max_sil_kept + 1
-                ].argmin()
-                pos += i - self.max_sil_kept
-                pos_l = (
-                    rms_list[
-                        silence_start : silence_start + self.max_sil_kept + 1
-                    ].argmin()
-                    + silence_start
-                )
-                pos_r = (
-                    rms_list[i - self.max_sil_kept : i + 1].argmin()
-                    + i
-                    - self.max_sil_kept
-                )
-                if silence_start == 0:
-                    sil_tags.append((0, pos_r))
-                    clip_start = pos_r
-                else:
-                    sil_tags.append((min(pos_l, pos), max(pos_r, pos)))
-                    clip_start = max(pos_r, pos)
-            else:
-                pos_l = (
-                    rms_list[
-                        silence_start : silence_start + self.max_sil_kept + 1
-                    ].argmin()
-                    + silence_start
-                )
-                pos_r = (
-                    rms_list[i - self.max_sil_kept : i + 1].argmin()
-                    + i
-                    - self.max_sil_kept
-                )
-                if silence_start == 0:
-                    sil_tags.append((0, pos_r))
-                else:
-                    sil_tags.append((pos_l, pos_r))
-                clip_start = pos_r
-            silence_start = None
-        # Deal with trailing silence.
-        total_frames = rms_list.shape[0]
-        if (
-            silence_start is not None
-            and total_frames - silence_start >= self.min_interval
-        ):
-            silence_end = min(total_frames, silence_start + self.max_sil_kept)
-            pos = rms_list[silence_start : silence_end + 1].argmin() + silence_start
-            sil_tags.append((pos, total_frames + 1))
+        sil_tags = self.get_sil_tags(self.get_rms(samples))
         # Apply and return slices.
         if len(sil_tags) == 0:
             return {"0": {"slice": False, "split_time": f"0,{len(waveform)}"}}
@@ -171,6 +169,147 @@ class Slicer:
                 chunk_dict[str(i)] = chunks[i]
             return chunk_dict
 
+    def stream(self, blocks):
+        """
+        Slice a mono waveform that arrives as an iterable of 1-D blocks.
+        Yields (is_silence, audio) pairs as soon as each cut is settled;
+        they are the same as `chunks2audio` gives for `slice` on the whole
+        waveform.
+        """
+        stream = StreamingSlicer(self)
+        for block in blocks:
+            yield from stream.feed(block)
+        yield from stream.finish()
+
+
+class StreamingSlicer:
+    """
+    Incremental state for `Slicer.stream`.
+
+    RMS frames are computed as samples arrive, with the same zero padding
+    librosa applies to the whole waveform. Only the RMS of the open silent
+    run and the audio not yet emitted are kept.
+    """
+
+    def __init__(self, slicer):
+        self.slicer = slicer
+        self.half_win = slicer.win_size // 2
+        # librosa center=True 时补零后的信号中还没分帧的部分
+        self.padded = np.zeros(self.half_win, dtype=np.float32)
+        self.n_frames = 0
+        # rms[0] 对应第 rms_start 帧，有未结束的静音段时从其起点开始保留
+        self.rms = np.zeros(0, dtype=np.float32)
+        self.rms_start = 0
+        self.silence_start = None
+        self.clip_start = 0
+        # audio[0] 对应第 audio_start 个采样，之前的都已输出
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.audio_start = 0
+        self.length = 0
+        self.sil_tags = []
+
+    def feed(self, block):
+        block = np.asarray(block, dtype=np.float32)
+        self.length += len(block)
+        self.audio = np.concatenate([self.audio, block])
+        self.padded = np.concatenate([self.padded, block])
+        self._detect(final=False)
+        if self.length <= self.slicer.min_length:
+            # 与 slice 一致，整段不超过 min_length 时不切，先攒着
+            return []
+        return self._emit(final=False)
+
+    def finish(self):
+        self.padded = np.concatenate(
+            [self.padded, np.zeros(self.half_win, dtype=np.float32)]
+        )
+        self._detect(final=True)
+        if self.length <= self.slicer.min_length:
+            self.sil_tags = []
+        return self._emit(final=True)
+
+    def _next_rms(self):
+        win_size, hop_size = self.slicer.win_size, self.slicer.hop_size
+        n = (len(self.padded) - win_size) // hop_size + 1
+        if n <= 0:
+            return self.rms[:0]
+        rms = librosa.feature.rms(
+            y=self.padded[: (n - 1) * hop_size + win_size],
+            frame_length=win_size,
+            hop_length=hop_size,
+            center=False,
+        ).squeeze(0)
+        self.padded = self.padded[n * hop_size :]
+        return rms
+
+    def _detect(self, final):
+        slicer = self.slicer
+        new_rms = self._next_rms()
+        start = self.n_frames
+        self.n_frames += len(new_rms)
+        if self.silence_start is None:
+            self.rms, self.rms_start = new_rms, start
+        else:
+            self.rms = np.concatenate([self.rms, new_rms])
+
+        starts, ends = silence_runs(new_rms, slicer.threshold)
+        runs = list(zip((starts + start).tolist(), (ends + start).tolist()))
+        if self.silence_start is not None and len(new_rms):
+            if runs and runs[0][0] == start:
+                runs[0] = (self.silence_start, runs[0][1])
+            else:
+                # 新的第一帧有声，之前的静音段到这里结束
+                runs.insert(0, (self.silence_start, start))
+        elif self.silence_start is not None:
+            runs = [(self.silence_start, self.n_frames)]
+
+        self.silence_start = None
+        for silence_start, i in runs:
+            if i == self.n_frames:
+                self.silence_start = silence_start
+                break
+            tag, self.clip_start = slicer.tag_silence(
+                self.rms, silence_start, i, self.clip_start, self.rms_start
+            )
+            if tag is not None:
+                self.sil_tags.append(tag)
+
+        if final and self.silence_start is not None:
+            tag = slicer.tag_trailing_silence(
+                self.rms, self.silence_start, self.n_frames, self.rms_start
+            )
+            if tag is not None:
+                self.sil_tags.append(tag)
+            self.silence_start = None
+        if self.silence_start is None:
+            self.rms, self.rms_start = self.rms[:0], self.n_frames
+        else:
+            self.rms = self.rms[self.silence_start - self.rms_start :]
+            self.rms_start = self.silence_start
+
+    def _take(self, begin, end, is_silence):
+        """输出 [begin, end) 并丢掉 end 之前的音频"""
+        result = []
+        if begin != end:
+            data = self.audio[begin - self.audio_start : end - self.audio_start]
+            result.append((is_silence, data))
+        self.audio = self.audio[end - self.audio_start :]
+        self.audio_start = end
+        return result
+
+    def _emit(self, final):
+        hop_size = self.slicer.hop_size
+        result = []
+        for begin, end in self.sil_tags:
+            begin = min(self.length, begin * hop_size)
+            end = min(self.length, end * hop_size)
+            result += self._take(self.audio_start, begin, False)
+            result += self._take(begin, end, True)
+        self.sil_tags = []
+        if final:
+            result += self._take(self.audio_start, self.length, False)
+        return result
+
 
 def cut(audio_path, db_thresh=-30, min_len=5000, flask_mode=False, flask_sr=None):
     if not flask_mode:
@@ -11,7 +11,6 @@ from transformers import HubertModel, Wav2Vec2FeatureExtractor
 from fairseq import checkpoint_utils
 from ddspsvc_6_1.encoder.hubert.model import HubertSoft
 from torch.nn.modules.utils import consume_prefix_in_state_dict_if_present
-from torchaudio.transforms import Resample
 from .unit2control import Unit2Control
 from .core import (
     frequency_filter,
@@ -20,9 +19,14 @@ from .core import (
     MaskedAvgPool1d,
     MedianPool1d,
 )
+from ddspsvc.ddsp.core import (
+    rms_envelope,
+    align_f0_grid,
+    interp_unvoiced,
+    get_resampler,
+)
 import time
 
-CREPE_RESAMPLE_KERNEL = {}
 F0_KERNEL = {}
 
 
@@ -35,13 +39,6 @@ class F0_Extractor:
         self.hop_size = hop_size
         self.f0_min = f0_min
         self.f0_max = f0_max
-        if f0_extractor == "crepe":
-            key_str = str(sample_rate)
-            if key_str not in CREPE_RESAMPLE_KERNEL:
-                CREPE_RESAMPLE_KERNEL[key_str] = Resample(
-                    sample_rate, 16000, lowpass_filter_width=128
-                )
-            self.resample_kernel = CREPE_RESAMPLE_KERNEL[key_str]
         if f0_extractor == "rmvpe":
             if "rmvpe" not in F0_KERNEL:
                 from encoder.rmvpe import RMVPE
@@ -121,8 +118,9 @@ class F0_Extractor:
         elif self.f0_extractor == "crepe":
             if device is None:
                 device = "cuda" if torch.cuda.is_available() else "cpu"
-            resample_kernel = self.resample_kernel.to(device)
-            wav16k_torch = resample_kernel(
+            wav16k_torch = get_resampler(
+                self.sample_rate, 16000, lowpass_filter_width=128, device=device
+            )(
                 torch.FloatTensor(audio).unsqueeze(0).to(device)
             )
 
@@ -143,22 +141,13 @@ class F0_Extractor:
             f0 = MaskedAvgPool1d(f0, 4)
 
             f0 = f0.squeeze(0).cpu().numpy()
-            f0 = np.array(
-                [
-                    f0[
-                        int(
-                            min(
-                                int(
-                                    np.round(
-                                        n * self.hop_size / self.sample_rate / 0.005
-                                    )
-                                ),
-                                len(f0) - 1,
-                            )
-                        )
-                    ]
-                    for n in range(n_frames - start_frame)
-                ]
+            f0 = align_f0_grid(
+                f0,
+                0.005,
+                self.hop_size,
+                self.sample_rate,
+                n_frames - start_frame,
+                mode="nearest",
             )
             f0 = np.pad(f0, (start_frame, 0))
 
@@ -167,16 +156,9 @@ class F0_Extractor:
             f0 = self.rmvpe.infer_from_audio(
                 audio, self.sample_rate, device=device, thred=0.03, use_viterbi=False
             )
-            uv = f0 == 0
-            if len(f0[~uv]) > 0:
-                f0[uv] = np.interp(np.where(uv)[0], np.where(~uv)[0], f0[~uv])
-            origin_time = 0.01 * np.arange(len(f0))
-            target_time = (
-                self.hop_size / self.sample_rate * np.arange(n_frames - start_frame)
+            f0 = align_f0_grid(
+                f0, 0.01, self.hop_size, self.sample_rate, n_frames - start_frame
             )
-            f0 = np.interp(target_time, origin_time, f0)
-            uv = np.interp(target_time, origin_time, uv.astype(float)) > 0.5
-            f0[uv] = 0
             f0 = np.pad(f0, (start_frame, 0))
 
         # extract f0 using fcpe
@@ -189,16 +171,9 @@ class F0_Extractor:
                 threshold=0.006,
             )
             f0 = f0.squeeze().cpu().numpy()
-            uv = f0 == 0
-            if len(f0[~uv]) > 0:
-                f0[uv] = np.interp(np.where(uv)[0], np.where(~uv)[0], f0[~uv])
-            origin_time = 0.01 * np.arange(len(f0))
-            target_time = (
-                self.hop_size / self.sample_rate * np.arange(n_frames - start_frame)
+            f0 = align_f0_grid(
+                f0, 0.01, self.hop_size, self.sample_rate, n_frames - start_frame
             )
-            f0 = np.interp(target_time, origin_time, f0)
-            uv = np.interp(target_time, origin_time, uv.astype(float)) > 0.5
-            f0[uv] = 0
             f0 = np.pad(f0, (start_frame, 0))
 
         else:
@@ -206,9 +181,7 @@ class F0_Extractor:
 
         # interpolate the unvoiced f0
         if uv_interp:
-            uv = f0 == 0
-            if len(f0[~uv]) > 0:
-                f0[uv] = np.interp(np.where(uv)[0], np.where(~uv)[0], f0[~uv])
+            f0 = interp_unvoiced(f0)
             f0[f0 < self.f0_min] = self.f0_min
         return f0
 
@@ -217,22 +190,8 @@ class Volume_Extractor:
     def __init__(self, hop_size=512):
         self.hop_size = hop_size
 
-    def extract(self, audio):  # audio: 1d numpy array
-        n_frames = int(len(audio) // self.hop_size) + 1
-        audio2 = audio**2
-        audio2 = np.pad(
-            audio2,
-            (int(self.hop_size // 2), int((self.hop_size + 1) // 2)),
-            mode="reflect",
-        )
-        volume = np.array(
-            [
-                np.mean(audio2[int(n * self.hop_size) : int((n + 1) * self.hop_size)])
-                for n in range(n_frames)
-            ]
-        )
-        volume = np.sqrt(volume)
-        return volume
+    def extract(self, audio):  # audio: 1d numpy array or torch tensor
+        return rms_envelope(audio, self.hop_size)
 
 
 class Units_Encoder:
@@ -282,7 +241,6 @@ class Units_Encoder:
         if not is_loaded_encoder:
             raise ValueError(f" [x] Unknown units encoder: {encoder}")
 
-        self.resample_kernel = {}
         self.encoder_sample_rate = encoder_sample_rate
         self.encoder_hop_size = encoder_hop_size
 
@@ -296,12 +254,12 @@ class Units_Encoder:
         if sample_rate == self.encoder_sample_rate:
             audio_res = audio
         else:
-            key_str = str(sample_rate)
-            if key_str not in self.resample_kernel:
-                self.resample_kernel[key_str] = Resample(
-                    sample_rate, self.encoder_sample_rate, lowpass_filter_width=128
-                ).to(self.device)
-            audio_res = self.resample_kernel[key_str](audio)
+            audio_res = get_resampler(
+                sample_rate,
+                self.encoder_sample_rate,
+                lowpass_filter_width=128,
+                device=self.device,
+            )(audio)
 
         # encode
         if audio_res.size(-1) < 400:
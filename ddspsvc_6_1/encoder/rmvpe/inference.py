@@ -1,7 +1,7 @@
 import numpy as np
 import torch
 import torch.nn.functional as F
-from torchaudio.transforms import Resample
+from ddspsvc.ddsp.core import get_resampler
 from .constants import *
 from .model import E2E0, E2E
 from .spec import MelSpectrogram 
@@ -9,14 +9,12 @@ from .utils import to_local_average_f0, to_viterbi_f0
 
 class RMVPE:
     def __init__(self, model_path, hop_length=160):
-        self.resample_kernel = {}
         model = E2E0(4, 1, (2, 2))
         ckpt = torch.load(model_path)
         model.load_state_dict(ckpt['model'], strict=False)
         model.eval()
         self.model = model
         self.mel_extractor = MelSpectrogram(N_MELS, SAMPLE_RATE, WINDOW_LENGTH, hop_length, None, MEL_FMIN, MEL_FMAX)
-        self.resample_kernel = {}
 
     def mel2hidden(self, mel):
         with torch.no_grad():
@@ -39,11 +37,7 @@ class RMVPE:
         if sample_rate == 16000:
             audio_res = audio
         else:
-            key_str = str(sample_rate)
-            if key_str not in self.resample_kernel:
-                self.resample_kernel[key_str] = Resample(sample_rate, 16000, lowpass_filter_width=128)
-            self.resample_kernel[key_str] = self.resample_kernel[key_str].to(device)
-            audio_res = self.resample_kernel[key_str](audio)
+            audio_res = get_resampler(sample_rate, 16000, lowpass_filter_width=128, device=device)(audio)
         mel_extractor = self.mel_extractor.to(device)
         self.model = self.model.to(device)
         mel = mel_extractor(audio_res, center=True)
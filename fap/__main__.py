@@ -1,7 +1,13 @@
+import sys
+from pathlib import Path
+
 import click
 import richuru
 from loguru import logger
 
+# 以脚本方式运行时，切片要用到仓库根目录下的 ddspsvc.slicer
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
 from cli.resample import resample
 from cli.slice_audio import slice_audio, slice_audio_v2
 from cli.convert_to_wav import to_wav
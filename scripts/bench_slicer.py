@@ -0,0 +1,145 @@
+"""
+切片静音检测性能对比：逐帧 Python 状态机 vs 向量化找静音段的 Slicer.get_sil_tags，
+并检查流式切片 Slicer.stream 与整段切片结果一致
+
+用法: python -m scripts.bench_slicer
+"""
+
+import time
+
+import numpy as np
+
+from ddspsvc.slicer import Slicer
+
+
+def reference_sil_tags(slicer, rms_list):
+    # 旧版 Slicer.slice 里的实现
+    sil_tags = []
+    silence_start = None
+    clip_start = 0
+    for i, rms in enumerate(rms_list):
+        if rms < slicer.threshold:
+            if silence_start is None:
+                silence_start = i
+            continue
+        if silence_start is None:
+            continue
+        is_leading_silence = silence_start == 0 and i > slicer.max_sil_kept
+        need_slice_middle = (
+            i - silence_start >= slicer.min_interval
+            and i - clip_start >= slicer.min_length
+        )
+        if not is_leading_silence and not need_slice_middle:
+            silence_start = None
+            continue
+        if i - silence_start <= slicer.max_sil_kept:
+            pos = rms_list[silence_start : i + 1].argmin() + silence_start
+            if silence_start == 0:
+                sil_tags.append((0, pos))
+            else:
+                sil_tags.append((pos, pos))
+            clip_start = pos
+        elif i - silence_start <= slicer.max_sil_kept * 2:
+            pos = rms_list[
+                i - slicer.max_sil_kept : silence_start + slicer.max_sil_kept + 1
+            ].argmin()
+            pos += i - slicer.max_sil_kept
+            pos_l = (
+                rms_list[silence_start : silence_start + slicer.max_sil_kept + 1]
+                .argmin()
+                + silence_start
+            )
+            pos_r = (
+                rms_list[i - slicer.max_sil_kept : i + 1].argmin()
+                + i
+                - slicer.max_sil_kept
+            )
+            if silence_start == 0:
+                sil_tags.append((0, pos_r))
+                clip_start = pos_r
+            else:
+                sil_tags.append((min(pos_l, pos), max(pos_r, pos)))
+                clip_start = max(pos_r, pos)
+        else:
+            pos_l = (
+                rms_list[silence_start : silence_start + slicer.max_sil_kept + 1]
+                .argmin()
+                + silence_start
+            )
+            pos_r = (
+                rms_list[i - slicer.max_sil_kept : i + 1].argmin()
+                + i
+                - slicer.max_sil_kept
+            )
+            if silence_start == 0:
+                sil_tags.append((0, pos_r))
+            else:
+                sil_tags.append((pos_l, pos_r))
+            clip_start = pos_r
+        silence_start = None
+    total_frames = rms_list.shape[0]
+    if (
+        silence_start is not None
+        and total_frames - silence_start >= slicer.min_interval
+    ):
+        silence_end = min(total_frames, silence_start + slicer.max_sil_kept)
+        pos = rms_list[silence_start : silence_end + 1].argmin() + silence_start
+        sil_tags.append((pos, total_frames + 1))
+    return [(int(a), int(b)) for a, b in sil_tags]
+
+
+def make_audio(sample_rate, seconds, rng):
+    # 有声段之间夹着长短不一的静音，开头结尾也是静音
+    audio = rng.standard_normal(int(sample_rate * seconds)).astype(np.float32) * 0.1
+    pos = 0
+    while pos < len(audio):
+        gap = int(rng.exponential(sample_rate * rng.choice([0.2, 3])))
+        audio[pos : pos + gap] *= 1e-4
+        pos += gap + int(rng.exponential(sample_rate * 2))
+    audio[-sample_rate * 3 :] *= 1e-4
+    return audio
+
+
+def timeit(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    sample_rate = 44100
+    rng = np.random.default_rng(0)
+    # 1 小时的音频
+    audio = make_audio(sample_rate, 3600, rng)
+    slicer = Slicer(sr=sample_rate, threshold=-40, min_length=5000)
+    rms_list = slicer.get_rms(audio)
+
+    ref_time, ref = timeit(lambda: reference_sil_tags(slicer, rms_list))
+    new_time, tags = timeit(lambda: slicer.get_sil_tags(rms_list))
+    assert ref == tags
+
+    # 流式切片：随机大小的块，结果应与整段切片后 chunks2audio 的结果一致
+    chunks = slicer.slice(audio)
+    expected = []
+    for v in chunks.values():
+        begin, end = v["split_time"].split(",")
+        if begin != end:
+            expected.append((v["slice"], audio[int(begin) : int(end)]))
+    blocks = np.split(audio, np.sort(rng.integers(0, len(audio), 3000)))
+    stream_time, streamed = timeit(lambda: list(slicer.stream(blocks)), repeat=1)
+    assert len(streamed) == len(expected)
+    for (tag, data), (expected_tag, expected_data) in zip(streamed, expected):
+        assert tag == expected_tag and np.array_equal(data, expected_data)
+
+    print(
+        f"{len(rms_list)} frames, {len(tags)} cuts: loop {ref_time * 1000:.1f} ms, "
+        f"get_sil_tags {new_time * 1000:.1f} ms, "
+        f"stream (incl. rms) {stream_time * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Volume_Extractor 性能对比：逐帧循环 vs 向量化的 rms_envelope
+
+用法: python -m scripts.bench_volume_extractor
+"""
+
+import time
+
+import numpy as np
+import torch
+
+from ddspsvc.ddsp.core import rms_envelope
+
+
+def reference_extract(audio, hop_size):
+    # 旧版 Volume_Extractor.extract 的实现
+    n_frames = int(len(audio) // hop_size) + 1
+    audio2 = audio**2
+    audio2 = np.pad(
+        audio2,
+        (int(hop_size // 2), int((hop_size + 1) // 2)),
+        mode="reflect",
+    )
+    volume = np.array(
+        [
+            np.mean(audio2[int(n * hop_size) : int((n + 1) * hop_size)])
+            for n in range(n_frames)
+        ]
+    )
+    return np.sqrt(volume)
+
+
+def timeit(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    sample_rate = 44100
+    audio = np.random.uniform(-1, 1, sample_rate * 240).astype(np.float32)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    audio_torch = torch.from_numpy(audio).to(device)
+
+    for hop_size in [512, 512 * sample_rate / 48000]:
+        ref_time, ref = timeit(lambda: reference_extract(audio, hop_size), 1)
+        np_time, vol = timeit(lambda: rms_envelope(audio, hop_size))
+        torch_time, vol_torch = timeit(lambda: rms_envelope(audio_torch, hop_size))
+        vol_torch = vol_torch.cpu().numpy()
+
+        assert np.allclose(ref, vol, rtol=1e-5, atol=1e-6)
+        assert np.allclose(ref, vol_torch, rtol=1e-5, atol=1e-6)
+        print(
+            f"hop {hop_size:.2f}: loop {ref_time * 1000:.1f} ms, "
+            f"numpy {np_time * 1000:.1f} ms, torch({device}) {torch_time * 1000:.1f} ms, "
+            f"max diff {np.abs(ref - vol).max():.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()